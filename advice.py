@@ -0,0 +1,298 @@
+# advice.py
+# 한 달 요약 조언: (사용자, 월, 데이터 버전)마다 한 번만 LLM으로 만들고 MONTHLY_ADVICE에 저장한다.
+# 지난달 조언은 미리 만들어 둔다 (cron 또는 ADVICE_PRECOMPUTE=1 로 앱 안의 스레드).
+#
+#   python advice.py precompute               # 지난달
+#   python advice.py precompute --year 2024 --month 7
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import date
+
+import llm
+from db import get_connection
+
+TOP_FOODS = 5
+PRECOMPUTE_CHECK_SECONDS = 3600
+GENERATION_LOCK_STRIPES = 256
+
+# (사용자, 월)마다 락을 만들면 끝없이 늘어나므로 해시로 고른 고정된 락 배열을 나눠 쓴다
+_generation_locks = [threading.Lock() for _ in range(GENERATION_LOCK_STRIPES)]
+
+
+def month_bounds(year, month):
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+
+def previous_month(today=None):
+    today = today or date.today()
+    if today.month == 1:
+        return today.year - 1, 12
+    return today.year, today.month - 1
+
+
+def _archived_path(cursor, year, month):
+    # archive.py가 Parquet로 옮긴 달이면 그 파일 경로 (archive가 advice를 import하므로 여기서 불러온다)
+    import archive
+
+    return archive.archived_months(cursor).get((year, month))
+
+
+def data_version(cursor, user_id, year, month):
+    # 해당 월 FOOD 행이 추가/수정/삭제되면 값이 바뀐다 (행 순서와 무관).
+    # 옮긴 달은 파일 이름도 붙인다: 다시 옮길 때마다 새 파일이다
+    start, end = month_bounds(year, month)
+    cursor.execute(
+        """
+        SELECT COUNT(*), COALESCE(SUM(CRC32(CONCAT_WS('|', DATE, FOOD_INDEX, FOOD_NAME,
+                                                    FOOD_CH, FOOD_PT, FOOD_FAT, FOOD_KCAL))), 0)
+        FROM FOOD
+        WHERE ID = %s AND DATE >= %s AND DATE < %s
+        """,
+        (user_id, start, end),
+    )
+    count, checksum = cursor.fetchone()
+    path = _archived_path(cursor, year, month)
+    if path:
+        return f"{count}-{checksum}-{os.path.basename(path)}"
+    return f"{count}-{checksum}"
+
+
+def _percentage(value, recommended):
+    if not recommended:
+        return None
+    return round(value / recommended * 100, 1)
+
+
+def _archived_summary_rows(cursor, user_id, start, end, path):
+    # 옮긴 달: 파일의 행과 그 뒤에 FOOD에 추가된 행을 합쳐 _food_summary_rows와 같은 모양으로 만든다
+    import archive
+
+    cursor.execute(
+        """
+        SELECT DATE, FOOD_INDEX, FOOD_NAME, FOOD_PT, FOOD_FAT, FOOD_CH, FOOD_KCAL
+        FROM FOOD
+        WHERE ID = %s AND DATE >= %s AND DATE < %s
+        """,
+        (user_id, start, end),
+    )
+    rows = archive.read_file(path, user_id) + list(cursor.fetchall())
+
+    by_date = {}
+    names = Counter()
+    for food_date, _, name, pt, fat, ch, kcal in rows:
+        day = by_date.setdefault(food_date, [food_date, 0, 0.0, 0.0, 0.0, 0.0])
+        day[1] += 1
+        for i, value in enumerate((kcal, ch, pt, fat), start=2):
+            day[i] += float(value or 0)
+        names[name] += 1
+    return list(by_date.values()), names.most_common(TOP_FOODS)
+
+
+def _food_summary_rows(cursor, user_id, start, end):
+    cursor.execute(
+        """
+        SELECT DATE, COUNT(*), SUM(FOOD_KCAL), SUM(FOOD_CH), SUM(FOOD_PT), SUM(FOOD_FAT)
+        FROM FOOD
+        WHERE ID = %s AND DATE >= %s AND DATE < %s
+        GROUP BY DATE
+        """,
+        (user_id, start, end),
+    )
+    days = cursor.fetchall()
+
+    cursor.execute(
+        """
+        SELECT FOOD_NAME, COUNT(*) AS CNT
+        FROM FOOD
+        WHERE ID = %s AND DATE >= %s AND DATE < %s
+        GROUP BY FOOD_NAME
+        ORDER BY CNT DESC
+        LIMIT %s
+        """,
+        (user_id, start, end, TOP_FOODS),
+    )
+    return days, cursor.fetchall()
+
+
+def month_summary(cursor, user_id, year, month):
+    start, end = month_bounds(year, month)
+    path = _archived_path(cursor, year, month)
+    if path:
+        days, top = _archived_summary_rows(cursor, user_id, start, end, path)
+    else:
+        days, top = _food_summary_rows(cursor, user_id, start, end)
+    top_foods = [{"food_name": name, "count": count} for name, count in top]
+
+    cursor.execute(
+        """
+        SELECT AVG(RD_CARBO), AVG(RD_PROTEIN), AVG(RD_FAT)
+        FROM USER_NT
+        WHERE ID = %s AND DATE >= %s AND DATE < %s
+        """,
+        (user_id, start, end),
+    )
+    rd_carbo, rd_protein, rd_fat = cursor.fetchone()
+
+    logged_days = len(days)
+    summary = {
+        "year": year,
+        "month": month,
+        "logged_days": logged_days,
+        "food_count": sum(row[1] for row in days),
+        "top_foods": top_foods,
+    }
+    if not logged_days:
+        return summary
+
+    averages = {
+        "calories": sum(float(row[2] or 0) for row in days) / logged_days,
+        "carbohydrates": sum(float(row[3] or 0) for row in days) / logged_days,
+        "protein": sum(float(row[4] or 0) for row in days) / logged_days,
+        "fat": sum(float(row[5] or 0) for row in days) / logged_days,
+    }
+    summary["daily_average"] = {key: round(value, 1) for key, value in averages.items()}
+    summary["daily_average_percentage"] = {
+        "carbohydrates": _percentage(averages["carbohydrates"], float(rd_carbo or 0)),
+        "protein": _percentage(averages["protein"], float(rd_protein or 0)),
+        "fat": _percentage(averages["fat"], float(rd_fat or 0)),
+    }
+    return summary
+
+
+def _lock_for(key):
+    return _generation_locks[hash(key) % GENERATION_LOCK_STRIPES]
+
+
+def _load_cached(cursor, user_id, year, month, version):
+    cursor.execute(
+        """
+        SELECT SUMMARY, ADVICE FROM MONTHLY_ADVICE
+        WHERE ID = %s AND YEAR = %s AND MONTH = %s AND DATA_VERSION = %s
+        """,
+        (user_id, year, month, version),
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return {"summary": json.loads(row[0]), "advice": row[1]}
+
+
+def _read_advice(user_id, year, month, summarize):
+    # (data_version, 캐시된 응답 또는 None, 요약 또는 None). 읽고 나면 연결을 바로 풀에 돌려준다
+    connection = get_connection()
+    try:
+        with connection.cursor() as cursor:
+            version = data_version(cursor, user_id, year, month)
+            cached = _load_cached(cursor, user_id, year, month, version)
+            if cached is not None:
+                return version, {**cached, "cached": True}, None
+            summary = month_summary(cursor, user_id, year, month) if summarize else None
+            return version, None, summary
+    finally:
+        connection.close()
+
+
+def get_advice(user_id, year, month):
+    _, cached, _ = _read_advice(user_id, year, month, summarize=False)
+    if cached is not None:
+        return cached
+
+    # 같은 (사용자, 월)에 대한 동시 요청은 LLM을 한 번만 호출한다.
+    # 락을 기다리거나 LLM을 기다리는 동안에는 풀 연결을 잡고 있지 않는다
+    with _lock_for((user_id, year, month)):
+        version, cached, summary = _read_advice(user_id, year, month, summarize=True)
+        if cached is not None:
+            return cached
+
+        advice = llm.advise(summary)
+
+        connection = get_connection()
+        try:
+            with connection.cursor() as cursor:
+                # LLM을 기다리는 동안 그 달 음식이 바뀌었으면 지난 데이터의 조언은 캐시하지 않는다
+                if data_version(cursor, user_id, year, month) == version:
+                    cursor.execute(
+                        """
+                        REPLACE INTO MONTHLY_ADVICE (ID, YEAR, MONTH, DATA_VERSION, SUMMARY, ADVICE)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                        """,
+                        (
+                            user_id,
+                            year,
+                            month,
+                            version,
+                            json.dumps(summary, ensure_ascii=False),
+                            advice,
+                        ),
+                    )
+            connection.commit()
+        finally:
+            connection.close()
+        return {"summary": summary, "advice": advice, "cached": False}
+
+
+def precompute_month(year, month):
+    start, end = month_bounds(year, month)
+    connection = get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT DISTINCT ID FROM FOOD WHERE DATE >= %s AND DATE < %s",
+                (start, end),
+            )
+            user_ids = [row[0] for row in cursor.fetchall()]
+    finally:
+        connection.close()
+
+    generated = 0
+    for user_id in user_ids:
+        try:
+            if not get_advice(user_id, year, month)["cached"]:
+                generated += 1
+        except Exception as e:
+            logging.error(f"Advice precompute failed for {user_id} {year}-{month}: {e}")
+    print(f"Advice precomputed for {year}-{month:02d}: {generated} new, {len(user_ids)} users")
+    return generated
+
+
+def _precompute_loop():
+    done = None
+    while True:
+        target = previous_month()
+        if target != done:
+            try:
+                precompute_month(*target)
+                done = target
+            except Exception as e:
+                logging.error(f"Advice precompute failed: {e}")
+        time.sleep(PRECOMPUTE_CHECK_SECONDS)
+
+
+def start_precompute_thread():
+    thread = threading.Thread(target=_precompute_loop, name="advice-precompute", daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monthly advice jobs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("precompute", help="generate advice for a closed month")
+    p.add_argument("--year", type=int)
+    p.add_argument("--month", type=int)
+    args = parser.parse_args()
+
+    year, month = previous_month()
+    precompute_month(args.year or year, args.month or month)
+
+
+if __name__ == "__main__":
+    main()
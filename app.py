@@ -1,228 +1,91 @@
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import AzureChatOpenAI
-from langchain_core.pydantic_v1 import BaseModel, Field
-from langchain_core.output_parsers import JsonOutputParser
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-import mysql.connector
-from mysql.connector import Error
-from dotenv import load_dotenv
 import os
+import advice
+import archive
+import cassette
+import db
 import llm
-import calendar
+import llm_pool
+import storage
+import food_import
+import write_behind
 import pymysql
-import logging
-from datetime import datetime
+import pymysql.cursors
+import csv
+import io
+import json
+from datetime import datetime, date as date_type, timedelta
+
+from nutrition import do, parse_meal
+
+import autocomplete
+import login
+import meal_photos
+import quick_add
+import register
+import rollups
+import send
+import monthly
+import profiling
+import detail
+import delete_food
+import sync
+import upload
 
 app = Flask(__name__)
 CORS(app)  # Enable cross-origin requests
 
-# Load environment variables from .env
-load_dotenv()
-
-# Define db_config
-db_config = {
-    "host": os.getenv("DB_HOST"),
-    "database": os.getenv("DB_NAME"),
-    "user": os.getenv("DB_USER"),
-    "password": os.getenv("DB_PASSWORD"),
-}
-
-
-# Database connection function
-def create_db_connection():
-    try:
-        connection = mysql.connector.connect(
-            host=db_config["host"],
-            database=db_config["database"],
-            user=db_config["user"],
-            password=db_config["password"],
+# 예전에 각각 따로 띄우던 Flask 앱들을 blueprint로 한 프로세스에 올린다.
+# DB 커넥션 풀(db.py), LLM 클라이언트(llm.py), 캐시(cache.py)를 모두 함께 쓴다.
+app.register_blueprint(login.bp)
+app.register_blueprint(register.bp)
+app.register_blueprint(send.bp)
+app.register_blueprint(detail.bp)
+app.register_blueprint(delete_food.bp)
+app.register_blueprint(rollups.bp)
+app.register_blueprint(meal_photos.bp)
+app.register_blueprint(upload.bp)
+app.register_blueprint(profiling.bp)
+
+# 아직 storage.py를 거치지 않고 MySQL을 직접 쓰는 기능. 다른 백엔드에서 등록하면
+# 쓰기와 읽기가 서로 다른 DB로 갈라지므로 아예 등록하지 않는다
+MYSQL_BACKEND = storage.BACKEND == "mysql"
+if MYSQL_BACKEND:
+    app.register_blueprint(monthly.bp)
+    app.register_blueprint(sync.bp)
+    app.register_blueprint(autocomplete.bp)
+    app.register_blueprint(quick_add.bp)
+else:
+    enabled = [
+        name
+        for name, on in (
+            ("WRITE_BEHIND=1", write_behind.ENABLED),
+            ("ADVICE_PRECOMPUTE=1", os.getenv("ADVICE_PRECOMPUTE") == "1"),
         )
-        return connection
-    except Error as e:
-        print(f"Error connecting to MySQL database: {e}")
-        return None
-
-
-@app.route("/api/login", methods=["POST"])
-def login():
-    data = request.json
-    print(f"Received login request for user ID: {data.get('id')}")  # 디버깅 메시지
-
-    connection = create_db_connection()
-    if connection is None:
-        print("Database connection failed")  # 디버깅 메시지
-        return jsonify({"error": "Database connection failed"}), 500
-
-    try:
-        cursor = connection.cursor(dictionary=True)
-        query = "SELECT * FROM USER WHERE ID = %s AND PASSWORD = %s"
-        print(f"Executing query: {query}")  # 디버깅 메시지
-        cursor.execute(query, (data["id"], data["password"]))
-        user = cursor.fetchone()
-
-        if user:
-            print(f"Login successful for user: {user['ID']}")  # 디버깅 메시지
-            user.pop("PASSWORD", None)
-            return jsonify({"message": "Login successful", "user": user}), 200
-        else:
-            print("Invalid credentials")  # 디버깅 메시지
-            return jsonify({"error": "Invalid credentials"}), 401
-
-    except Error as e:
-        print(f"Database error occurred: {str(e)}")  # 디버깅 메시지
-        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
-            print("Database connection closed")  # 디버깅 메시지
-
-
-def insert_test_data():
-    print("Inserting test data...")  # 디버깅 메시지
-
-    # 콘솔에서 사용자 입력 받기
-    user_id = input("Enter user ID: ")
-    user_password = input("Enter user password: ")
-
-    data = {
-        "id": user_id,
-        "password": user_password,
-        "bodyweight": 70,  # 예시 데이터
-        "height": 178,  # 예시 데이터
-        "age": 30,  # 예시 데이터
-    }
-
-    connection = create_db_connection()
-    if connection is None:
-        print("Database connection failed")
-        return
-
-    try:
-        cursor = connection.cursor()
-
-        # 아이디 중복 확인
-        query = "SELECT * FROM USER WHERE ID = %s"
-        cursor.execute(query, (data["id"],))
-        existing_user = cursor.fetchone()
-
-        if existing_user:
-            print(
-                f"User ID {data['id']} already exists. Skipping insertion."
-            )  # 디버깅 메시지
-        else:
-            query = """INSERT INTO USER (ID, PASSWORD, BODY_WEIGHT, HEIGHT, AGE) 
-                       VALUES (%s, %s, %s, %s, %s)"""
-            values = (
-                data["id"],
-                data["password"],
-                data["bodyweight"],
-                data["height"],
-                data["age"],
-            )
-            cursor.execute(query, values)
-            connection.commit()
-            print("Test user inserted successfully")  # 디버깅 메시지
-    except Error as e:
-        print(f"An error occurred: {str(e)}")  # 디버깅 메시지
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
-            print("Database connection closed")  # 디버깅 메시지
-
-
-model = AzureChatOpenAI(
-    azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT"),  # gpt-4o is set by env
-    temperature=1.0,
-)
-
-
-class NutritionInfo(BaseModel):
-    food_name: str = Field(description="The food name")
-    calorie: str = Field(description="The amount of Calories")
-    carbohydrate: str = Field(description="The amount of Carbohydrate")
-    protein: str = Field(description="The amount of Protein")
-    fat: str = Field(description="The amount of Fat")
-
-
-output_parser = JsonOutputParser(pydantic_object=NutritionInfo)
-
-prompt_template = ChatPromptTemplate.from_template(
-    """
-    음식이 입력되면 영양정보를 분석해줘
-    필수 요소는 음식 이름, 칼로리, 탄수화물, 단백질, 지방이야
-    입력: {string}
-    
-    {format_instructions}
-    """
-).partial(format_instructions=output_parser.get_format_instructions())
-
-
-def do(param):
-    print(f"Received input: {param}")  # Debugging 출력 추가
-    prompt_value = prompt_template.invoke({"string": param})
-    model_output = model.invoke(prompt_value)
-    output = output_parser.invoke(model_output)
-    return output
-
-
-def save_to_db(user_id, nutrition_info):
-    connection = create_db_connection()
-    print(1)
-    try:
-        with connection.cursor() as cursor:
-            print(2)
-            sql = """
-                INSERT INTO FOOD (ID, DATE, FOOD_NAME, FOOD_PT, FOOD_FAT, FOOD_CH, FOOD_KCAL)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """
-            cursor.execute(
-                sql,
-                (
-                    user_id,
-                    datetime.now(),
-                    nutrition_info["food_name"],
-                    nutrition_info["protein"],
-                    nutrition_info["fat"],
-                    nutrition_info["carbohydrate"],
-                    nutrition_info["calorie"],
-                ),
-            )
-            print("Data saved to database")  # Debugging 출력 추가
-        connection.commit()
-    finally:
-        connection.close()
-
-
-@app.route("/api/send", methods=["POST"])
-def send():
-    data = request.json
-    user_id = data.get("user_id")
-    food_name = data.get("food_name")
-
-    if not user_id or not food_name:
-        return jsonify({"error": "user_id and food_name are required"}), 400
+        if on
+    ]
+    if enabled:
+        raise RuntimeError(
+            f"STORAGE_BACKEND={storage.BACKEND} does not support {', '.join(enabled)}"
+        )
+    print(
+        f"STORAGE_BACKEND={storage.BACKEND}: monthly, sync, autocomplete, quick add, "
+        "food range export and import are disabled (MySQL only)"
+    )
 
-    nutrition_info = do(food_name)
 
-    # save_to_db(user_id, nutrition_info)
+def mysql_route(rule, **options):
+    # MySQL 백엔드일 때만 등록하는 app.route
+    def decorator(view):
+        if MYSQL_BACKEND:
+            app.route(rule, **options)(view)
+        return view
 
-    return jsonify(nutrition_info)
+    return decorator
 
 
-@app.route("/api/send2", methods=["POST"])
-def send2():
-    data = request.json
-    user_id = data.get("user_id")
-    nutrition_info = data.get("nutrition_info")
-    print(data)
-    try:
-        save_to_db(user_id, nutrition_info)
-        return jsonify({"message": "good"}), 200
-    except:
-        return jsonify({"message": "DB save error"}), 500
+NUTRITION_KEYS = ("calorie", "carbohydrate", "protein", "fat")
 
 
 @app.route("/api/add_food", methods=["POST"])
@@ -236,65 +99,39 @@ def add_food():
     if not user_id or not date or not food_name:
         return jsonify({"error": "필수 정보가 누락되었습니다."}), 400
 
-    # LLM을 통해 음식 영양 정보를 가져옴
-    nutrition_info = do(food_name)
+    nutrition = data.get("NUTRITION")
+    if isinstance(nutrition, dict):
+        # 자동 완성에서 고른 음식: 저장된 영양 정보를 그대로 쓰고 LLM을 부르지 않는다
+        missing = [key for key in NUTRITION_KEYS if nutrition.get(key) in (None, "")]
+        if missing:
+            return jsonify({"error": f"NUTRITION에 {', '.join(missing)} 값이 없습니다."}), 400
+        items = [{"food_name": food_name, **{key: nutrition[key] for key in NUTRITION_KEYS}}]
+    else:
+        # LLM 한 번 호출로 한 끼의 음식들을 각각 분석함 ("김밥 한 줄이랑 라면 하나")
+        items = parse_meal(food_name)
+        if not items:
+            return jsonify({"error": "음식을 인식하지 못했습니다."}), 422
 
     try:
-        connection = pymysql.connect(**db_config)
-        with connection.cursor() as cursor:
-            # FOOD_INDEX를 구함 (해당 날짜의 가장 높은 인덱스를 찾아 +1)
-            cursor.execute(
-                "SELECT MAX(FOOD_INDEX) FROM FOOD WHERE ID = %s AND DATE = %s",
-                (user_id, date),
-            )
-            max_index = cursor.fetchone()[0]
-            food_index = max_index + 1 if max_index is not None else 0
-
-            insert_query = """
-            INSERT INTO FOOD (ID, DATE, FOOD_INDEX, FOOD_NAME, FOOD_CH, FOOD_PT, FOOD_FAT, FOOD_KCAL)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            cursor.execute(
-                insert_query,
-                (
-                    user_id,
-                    date,
-                    food_index,
-                    nutrition_info["food_name"],
-                    nutrition_info["carbohydrate"],
-                    nutrition_info["protein"],
-                    nutrition_info["fat"],
-                    nutrition_info["calorie"],
-                ),
-            )
-            connection.commit()
-
-            added_food_info = {
-                "ID": user_id,
-                "DATE": date,
-                "FOOD_INDEX": food_index,
-                "food_name": nutrition_info["food_name"],
-                "carbohydrates": nutrition_info["carbohydrate"],
-                "protein": nutrition_info["protein"],
-                "fat": nutrition_info["fat"],
-                "calorie": nutrition_info["calorie"],
-            }
-            print(added_food_info)
-            return (
-                jsonify(
-                    {
-                        "message": "음식이 성공적으로 추가되었습니다.",
-                        "data": added_food_info,
-                    }
-                ),
-                201,
-            )
-
-    except pymysql.MySQLError as e:
+        # 모든 음식을 한 트랜잭션에서 연속된 FOOD_INDEX로 추가
+        added_foods = storage.get_storage().add_foods(user_id, date, items)
+    except storage.DatabaseError as e:
         return jsonify({"error": str(e)}), 500
-
-    finally:
-        connection.close()
+    detail.invalidate(user_id, date)
+    quick_add.invalidate(user_id)
+
+    print(added_foods)
+    return (
+        jsonify(
+            {
+                "message": "음식이 성공적으로 추가되었습니다.",
+                # 기존 클라이언트는 data(첫 번째 음식)만 본다
+                "data": added_foods[0],
+                "items": added_foods,
+            }
+        ),
+        201,
+    )
 
 
 @app.route("/api/update_food", methods=["POST"])
@@ -313,389 +150,232 @@ def update_food():
     new_nutrition_info = do(new_food_name)
 
     try:
-        connection = pymysql.connect(**db_config)
-        with connection.cursor() as cursor:
-            update_query = """
-            UPDATE FOOD
-            SET FOOD_NAME = %s, FOOD_CH = %s, FOOD_PT = %s, FOOD_FAT = %s, FOOD_KCAL = %s
-            WHERE ID = %s AND DATE = %s AND FOOD_INDEX = %s
-            """
-            cursor.execute(
-                update_query,
-                (
-                    new_nutrition_info["food_name"],
-                    new_nutrition_info["carbohydrate"],
-                    new_nutrition_info["protein"],
-                    new_nutrition_info["fat"],
-                    new_nutrition_info["calorie"],
-                    user_id,
-                    date,
-                    food_index,
-                ),
-            )
-            connection.commit()
-
-            updated_food_info = {
-                "ID": user_id,
-                "DATE": date,
-                "FOOD_INDEX": food_index,
-                "food_name": new_nutrition_info["food_name"],
-                "carbohydrates": new_nutrition_info["carbohydrate"],
-                "protein": new_nutrition_info["protein"],
-                "fat": new_nutrition_info["fat"],
-                "calorie": new_nutrition_info["calorie"],
-            }
-
-            return (
-                jsonify(
-                    {
-                        "message": "음식이 성공적으로 수정되었습니다.",
-                        "data": updated_food_info,
-                    }
-                ),
-                200,
-            )
-
-    except pymysql.MySQLError as e:
+        updated = storage.get_storage().update_food(user_id, date, food_index, new_nutrition_info)
+    except storage.DatabaseError as e:
         return jsonify({"error": str(e)}), 500
+    if updated:
+        # 다른 음식이 되었으니 예전 사진과의 연결을 푼다
+        upload.release_food(user_id, date, food_index)
+    detail.invalidate(user_id, date)
+    quick_add.invalidate(user_id)
+
+    updated_food_info = {
+        "ID": user_id,
+        "DATE": date,
+        "FOOD_INDEX": food_index,
+        "food_name": new_nutrition_info["food_name"],
+        "carbohydrates": new_nutrition_info["carbohydrate"],
+        "protein": new_nutrition_info["protein"],
+        "fat": new_nutrition_info["fat"],
+        "calorie": new_nutrition_info["calorie"],
+    }
 
-    finally:
-        connection.close()
-
-
-@app.route("/api/register", methods=["GET", "POST", "PUT"])
-def register():
-    if request.method == "GET":
-        print(1)
-        user_id = request.args.get("id")
-        if not user_id:
-            return jsonify({"error": "User ID is required"}), 400
-
-        connection = create_db_connection()
-        print(2)
-        if connection is None:
-            return jsonify({"error": "Database connection failed"}), 500
-
-        try:
-            print(3)
-            cursor = connection.cursor()
-            query_nutrients = (
-                """SELECT RD_PROTEIN, RD_CARBO, RD_FAT FROM USER_NT WHERE ID=%s"""
-            )
-            print(4)
-            cursor.execute(query_nutrients, (user_id,))
-            nutrients_result = cursor.fetchone()
-            print(5)
-            if nutrients_result is None:
-                return jsonify({"error": "User NT not found"}), 404
-
-            rd_protein, rd_carbo, rd_fat = nutrients_result
-            print(6)
-            return (
-                jsonify(
-                    {
-                        "RD_PROTEIN": rd_protein,
-                        "RD_CARBO": rd_carbo,
-                        "RD_FAT": rd_fat,
-                    }
-                ),
-                200,
-            )
-        except Error as e:
-            print(f"Database query error: {e}")
-            return jsonify({"error": "Database query failed"}), 500
-        finally:
-            if connection.is_connected():
-                cursor.close()
-                connection.close()
+    return (
+        jsonify(
+            {
+                "message": "음식이 성공적으로 수정되었습니다.",
+                "data": updated_food_info,
+            }
+        ),
+        200,
+    )
 
-    data = request.json
 
-    if not data or "id" not in data or "pw" not in data:
-        return jsonify({"error": "Invalid input"}), 400
+RANGE_EXPORT_COLUMNS = [
+    "date",
+    "food_index",
+    "food_name",
+    "protein",
+    "fat",
+    "carbohydrates",
+    "calories",
+]
+RANGE_EXPORT_CHUNK_ROWS = 500  # 한 번에 서버 커서에서 읽어올 행 수
 
-    connection = create_db_connection()
-    if connection is None:
-        return jsonify({"error": "Database connection failed"}), 500
 
+def _parse_export_date(value):
     try:
-        cursor = connection.cursor()
-
-        if request.method == "PUT":
-            query_user = """UPDATE USER SET PASSWORD=%s, BODY_WEIGHT=%s, HEIGHT=%s, AGE=%s, ACTIVITY=%s WHERE ID=%s"""
-            values_user = (
-                data["pw"],
-                data["bodyweight"],
-                data["height"],
-                data["age"],
-                data["activity"],
-                data["id"],
-            )
-            cursor.execute(query_user, values_user)
-
-            query_nt = """UPDATE USER_NT SET RD_PROTEIN=%s, RD_CARBO=%s, RD_FAT=%s WHERE ID=%s"""
-            values_nt = (
-                data["rd_protein"],
-                data["rd_carbo"],
-                data["rd_fat"],
-                data["id"],
-            )
-            cursor.execute(query_nt, values_nt)
-        else:  # POST
-            query_user = """INSERT INTO USER (ID, PASSWORD, BODY_WEIGHT, HEIGHT, AGE, GENDER, ACTIVITY, RDI) 
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"""
-            values_user = (
-                data["id"],
-                data["pw"],
-                data["bodyweight"],
-                data["height"],
-                data["age"],
-                data["gender"],
-                data["activity"],
-                None,  # RDI 값을 기본값으로 설정 (필요에 따라 계산 후 설정 가능)
-            )
-            cursor.execute(query_user, values_user)
-
-        connection.commit()
-        return jsonify({"message": "User registered successfully"}), 201
-    except Error as e:
-        print(f"Database query error: {e}")
-        return jsonify({"error": "Database query failed"}), 500
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
-
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
 
-# 특정 음식을 삭제하는 엔드포인트
-@app.route("/api/delete_food", methods=["DELETE"])
-def delete_food():
-    user_id = request.args.get("ID")
-    date = request.args.get("DATE")
-    food_index = request.args.get("FOOD_INDEX")
 
-    if not user_id or not date or not food_index:
-        return jsonify({"error": "필수 정보가 누락되었습니다."}), 400
+def _export_value(value):
+    if isinstance(value, (datetime, date_type)):
+        return value.isoformat()
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    return str(value)  # Decimal 등
 
-    connection = create_db_connection()
-    if connection is None:
-        return jsonify({"error": "데이터베이스 연결 실패"}), 500
 
-    try:
-        cursor = connection.cursor()
-        delete_query = """
-        DELETE FROM FOOD
-        WHERE ID = %s AND DATE = %s AND FOOD_INDEX = %s
-        """
-        cursor.execute(delete_query, (user_id, date, food_index))
-        connection.commit()
+RANGE_EXPORT_SQL = """
+    SELECT DATE, FOOD_INDEX, FOOD_NAME, FOOD_PT, FOOD_FAT, FOOD_CH, FOOD_KCAL
+    FROM FOOD
+    WHERE ID = %s AND DATE >= %s AND DATE < %s
+    ORDER BY DATE, FOOD_INDEX
+"""
 
-        if cursor.rowcount == 0:
-            return jsonify({"message": "삭제할 데이터가 없습니다."}), 404
 
-        return jsonify({"message": "음식이 성공적으로 삭제되었습니다."}), 200
+def _export_chunks(rows):
+    for i in range(0, len(rows), RANGE_EXPORT_CHUNK_ROWS):
+        yield [[_export_value(value) for value in row] for row in rows[i : i + RANGE_EXPORT_CHUNK_ROWS]]
 
-    except Error as e:
-        return jsonify({"error": str(e)}), 500
 
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
+def _stream_food(cursor, user_id, start, end):
+    cursor.execute(RANGE_EXPORT_SQL, (user_id, start, end))
+    while True:
+        rows = cursor.fetchmany(RANGE_EXPORT_CHUNK_ROWS)
+        if not rows:
+            break
+        yield [[_export_value(value) for value in row] for row in rows]
 
 
-@app.route("/api/monthly", methods=["POST"])
-def get_monthly_food():
-    data = request.json
-    year = data.get("year")
-    month = data.get("month")
-    UID = data.get("UID")
-    if not year or not month:
-        return jsonify({"error": "Year and month are required"}), 400
-
-    connection = create_db_connection()
+def iter_food_range(user_id, start, end):
+    # SSCursor는 결과를 클라이언트에 버퍼링하지 않으므로, 기간이 길어도 메모리가 일정하다.
+    # archive.py가 Parquet로 옮긴 달은 그 달만 파일의 행과 FOOD에 남은 행을 합쳐 정렬한다
+    end = end + timedelta(days=1)
+    connection = db.connect(cursorclass=pymysql.cursors.SSCursor)
     try:
         with connection.cursor() as cursor:
-            sql = """
-                SELECT DATE, FOOD_INDEX, FOOD_NAME, FOOD_PT, FOOD_FAT, FOOD_CH, FOOD_KCAL
-                FROM FOOD
-                WHERE YEAR(DATE) = %s AND MONTH(DATE) = %s
-                AND ID = %s
-                ORDER BY DATE
-            """
-            cursor.execute(sql, (year, month, UID))
-            results = cursor.fetchall()
-            monthly_data = {}
-
-            for row in results:
-                day = row[0].day
-                food_info = {
-                    "food_index": row[1],
-                    "food_name": row[2],
-                    "protein": row[3],
-                    "fat": row[4],
-                    "carbohydrates": row[5],
-                    "calories": row[6],
-                }
-
-                # Ensuring the output order
-                food_info_ordered = {
-                    "food_index": food_info["food_index"],
-                    "food_name": food_info["food_name"],
-                    "protein": food_info["protein"],
-                    "fat": food_info["fat"],
-                    "carbohydrates": food_info["carbohydrates"],
-                    "calories": food_info["calories"],
-                }
-
-                if day not in monthly_data:
-                    monthly_data[day] = []
-
-                monthly_data[day].append(food_info_ordered)
-
-            # Create a list of 31 days, each day is a list of food items (which may be empty)
-            grouped_data = [monthly_data.get(day, []) for day in range(1, 32)]
-
-            return jsonify(grouped_data)
+            archived = archive.archived_months(cursor)
+            position = start
+            for key in archive.months_between(archived, start, end):
+                month_start, month_end = advice.month_bounds(*key)
+                month_start, month_end = max(month_start, start), min(month_end, end)
+                if position < month_start:
+                    yield from _stream_food(cursor, user_id, position, month_start)
+                rows = [
+                    row for row in archive.read_file(archived[key], user_id)
+                    if month_start <= row[0] < month_end
+                ]
+                cursor.execute(RANGE_EXPORT_SQL, (user_id, month_start, month_end))
+                rows = sorted(rows + list(cursor.fetchall()), key=lambda row: (row[0], row[1]))
+                yield from _export_chunks(rows)
+                position = month_end
+            if position < end:
+                yield from _stream_food(cursor, user_id, position, end)
     finally:
         connection.close()
 
 
-def get_user_nutritional_needs(user_id):
-    connection = pymysql.connect(**db_config)
-    try:
-        with connection.cursor() as cursor:
-            sql = "SELECT BODY_WEIGHT, RDI FROM USER WHERE ID = %s"
-            cursor.execute(sql, (user_id,))
-            result = cursor.fetchone()
-            if result:
-                body_weight, rdi = result
-                return body_weight, rdi
-            else:
-                return None
-    except pymysql.MySQLError as e:
-        logging.error(f"Database error: {e}")
-        return None
-    finally:
-        connection.close()
+def _ndjson_chunks(row_chunks):
+    for rows in row_chunks:
+        yield "".join(
+            json.dumps(dict(zip(RANGE_EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n"
+            for row in rows
+        )
 
 
-def get_daily_totals(user_id, date):
-    connection = pymysql.connect(**db_config)
-    try:
-        with connection.cursor() as cursor:
-            sql = "SELECT CARBO, PROTEIN, FAT, RD_CARBO, RD_PROTEIN, RD_FAT FROM USER_NT WHERE ID = %s AND DATE = %s"
-            cursor.execute(sql, (user_id, date))
-            result = cursor.fetchone()
-            if result:
-                return result
-            else:
-                return None
-    except pymysql.MySQLError as e:
-        logging.error(f"Database error: {e}")
-        return None
-    finally:
-        connection.close()
+def _csv_chunks(row_chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(RANGE_EXPORT_COLUMNS)
+    for rows in row_chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
+
 
+# 임의 기간의 식단 기록을 NDJSON 또는 CSV로 스트리밍
+@mysql_route("/api/food/range", methods=["GET"])
+def export_food_range():
+    user_id = request.args.get("ID")
+    start = _parse_export_date(request.args.get("start"))
+    end = _parse_export_date(request.args.get("end"))
+    export_format = request.args.get("format", "ndjson").lower()
+
+    if not user_id or start is None or end is None:
+        return jsonify({"error": "ID, start and end (YYYY-MM-DD) are required"}), 400
+    if start > end:
+        return jsonify({"error": "start must not be after end"}), 400
+    if export_format not in ("ndjson", "csv"):
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+
+    row_chunks = iter_food_range(user_id, start, end)
+    if export_format == "csv":
+        body = _csv_chunks(row_chunks)
+        mimetype = "text/csv"
+    else:
+        body = _ndjson_chunks(row_chunks)
+        mimetype = "application/x-ndjson"
+
+    filename = f"food_{user_id}_{start.isoformat()}_{end.isoformat()}.{export_format}"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+# 다른 앱에서 옮겨오는 식단 기록 일괄 등록 (영양 정보가 이미 계산된 CSV/JSON)
+@mysql_route("/api/food/import", methods=["POST"])
+def import_food():
+    user_id = request.args.get("ID")
+    if not user_id:
+        return jsonify({"error": "ID is required"}), 400
+
+    csv_file = request.files.get("file")
+    if csv_file is not None:
+        raw = csv_file.stream
+        fmt = request.args.get("format") or food_import.detect_format(
+            csv_file.filename, csv_file.mimetype
+        )
+    else:
+        raw = request.stream
+        fmt = request.args.get("format") or food_import.detect_format(
+            None, request.mimetype
+        )
+    if fmt not in ("csv", "json", "ndjson"):
+        return jsonify({"error": "format must be csv, json or ndjson"}), 400
 
-def get_monthly_data(year, month, user_id):
-    connection = pymysql.connect(**db_config)
+    stream = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
     try:
-        with connection.cursor() as cursor:
-            sql = """
-                SELECT DATE, FOOD_INDEX, FOOD_NAME, FOOD_PT, FOOD_FAT, FOOD_CH, FOOD_KCAL
-                FROM FOOD
-                WHERE YEAR(DATE) = %s AND MONTH(DATE) = %s AND ID = %s
-                ORDER BY DATE
-            """
-            cursor.execute(sql, (year, month, user_id))
-            results = cursor.fetchall()
-
-            num_days = calendar.monthrange(year, month)[1]  # 해당 월의 일수 계산
-            foods_list = [[] for _ in range(num_days)]  # 각 날짜별 음식 리스트
-            percentages_list = [{} for _ in range(num_days)]  # 각 날짜별 백분율 리스트
-
-            for row in results:
-                day = row[0].day - 1  # 0-based index for lists
-                food_info = {
-                    "food_index": row[1],
-                    "food_name": row[2],
-                    "protein": row[3],
-                    "fat": row[4],
-                    "carbohydrates": row[5],
-                    "calories": row[6],
-                }
-                foods_list[day].append(food_info)
-
-            # Add daily percentages
-            for day in range(num_days):
-                date_str = f"{year}-{str(month).zfill(2)}-{str(day+1).zfill(2)}"  # 1-based day for dates
-                daily_totals = get_daily_totals(user_id, date_str)
-                if daily_totals:
-                    (
-                        carb_total,
-                        protein_total,
-                        fat_total,
-                        rd_carb,
-                        rd_protein,
-                        rd_fat,
-                    ) = daily_totals
-                    percentages_list[day] = {
-                        "carbohydrates_percentage": (
-                            round((carb_total / rd_carb) * 100, 1) if rd_carb > 0 else 0
-                        ),
-                        "protein_percentage": (
-                            round((protein_total / rd_protein) * 100, 1)
-                            if rd_protein > 0
-                            else 0
-                        ),
-                        "fat_percentage": (
-                            round((fat_total / rd_fat) * 100, 1) if rd_fat > 0 else 0
-                        ),
-                    }
-
-            return {"foods": foods_list, "percentages": percentages_list}
+        result = food_import.import_records(
+            user_id, food_import.parse_records(stream, fmt)
+        )
+    except (ValueError, csv.Error) as e:
+        return jsonify({"error": f"Invalid import file: {e}"}), 400
     except pymysql.MySQLError as e:
-        logging.error(f"Database error: {e}")
-        return {"error": "Database error"}
-    finally:
-        connection.close()
+        return jsonify({"error": str(e)}), 500
 
+    return jsonify(result), 201
 
-@app.route("/api/food/quarterly", methods=["POST"])
-def get_quarterly_food():
-    data = request.json
-    year = data.get("year")
-    start_month = data.get("month")
-    user_id = data.get("UID")
 
-    if not year or not start_month or not user_id:
-        return jsonify({"error": "Year, start month, and user_id are required"}), 400
+# 작업별 LLM 배포의 호출 수, 지연 시간, 토큰 사용량
+@app.route("/api/llm/stats", methods=["GET"])
+def get_llm_stats():
+    stats = llm.route_stats()
+    transport = llm_pool.shared_transport()
+    if transport is not None:
+        stats["pool"] = transport.stats()
+    recorder = cassette.active()
+    if recorder is not None:
+        stats["cassette"] = recorder.stats()
+    return jsonify(stats), 200
 
-    try:
-        year = int(year)
-        start_month = int(start_month)
-        if start_month < 1 or start_month > 12:
-            return (
-                jsonify(
-                    {"error": "Invalid month. Please enter a value between 1 and 12."}
-                ),
-                400,
-            )
-    except ValueError:
-        return jsonify({"error": "Year and month must be integers."}), 400
-
-    quarterly_data = {}
-    for i in range(-1, 2):  # 이전 달, 현재 달, 다음 달 순서로 데이터를 가져오기
-        month = (start_month + i - 1) % 12 + 1
-        current_year = year + (start_month + i - 1) // 12
-        monthly_data = get_monthly_data(current_year, month, user_id)
-        quarterly_data[f"{current_year}-{str(month).zfill(2)}"] = monthly_data
-
-    return jsonify(quarterly_data)
+
+@app.route("/api/db/stats", methods=["GET"])
+def get_db_stats():
+    return jsonify({"replicas": db.replica_stats()}), 200
+
+
+# 지난달 조언을 미리 만들어 두는 백그라운드 작업 (cron 대신 앱에서 돌릴 때)
+if os.getenv("ADVICE_PRECOMPUTE") == "1":
+    advice.start_precompute_thread()
+
+# /api/send2 쓰기 지연 큐를 MySQL로 옮기는 스레드
+if write_behind.ENABLED:
+    write_behind.start()
+
+# 식사 기록에 쓰이지 않은 업로드 사진 정리 (cron으로 `python upload.py sweep`을 돌리면 끈다)
+if os.getenv("UPLOAD_SWEEPER", "1") == "1":
+    upload.start_sweeper()
 
 
 if __name__ == "__main__":
     print("Starting Flask application")  # 디버깅 메시지
-    # insert_test_data()  # 애플리케이션 시작 시 테스트 데이터 삽입
+    # 테스트 사용자 추가: python login.py
     app.run(host="0.0.0.0", port=5000)
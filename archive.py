@@ -0,0 +1,361 @@
+# archive.py
+# 보존 기간이 지난 FOOD 달을 월별 Parquet 파일(콜드 스토리지)로 옮기고 DB에서 지운다.
+# 옮긴 달은 FOOD_ARCHIVE_MONTHS에 기록되고, 월간/하루 조회(monthly, /api/calendar), 조언, 기간 롤업과
+# /api/food/range가 그 달을 파일의 행과 그 뒤에 FOOD에 추가된 행을 합쳐 읽는다.
+# USER_NT 하루 합계는 옮기기 전 값 그대로 남긴다.
+# 기록과 FOOD 삭제는 그 달 범위를 잠근 한 트랜잭션이라, 파일을 쓰는 동안 바뀐 행이 있으면 지우지 않는다.
+# FOOD_ARCHIVE_MONTHS는 몇십 행짜리라 프로세스 캐시 없이 매번 읽는다 (다른 워커가 옮긴 달도 바로 보인다).
+#
+#   python archive.py run                      # FOOD_RETENTION_MONTHS(기본 24)보다 오래된 달
+#   python archive.py run --before 2023-01     # 2022-12까지
+#   python archive.py partitions --ahead 3     # 다음 달 파티션 미리 만들기 (월 1회 cron)
+
+import argparse
+import logging
+import os
+import time
+from datetime import date
+
+import pymysql
+import pymysql.cursors
+
+import db
+from advice import month_bounds
+
+ARCHIVE_DIR = os.getenv("FOOD_ARCHIVE_DIR", "archive")
+RETENTION_MONTHS = int(os.getenv("FOOD_RETENTION_MONTHS", "24"))
+WRITE_BATCH_ROWS = 50000
+ROW_GROUP_ROWS = 100000  # ID 순으로 정렬되어 있어 행 그룹 통계로 다른 사용자 그룹을 건너뛴다
+
+COLUMNS = ("ID", "DATE", "FOOD_INDEX", "FOOD_NAME", "FOOD_PT", "FOOD_FAT", "FOOD_CH", "FOOD_KCAL")
+
+def _schema():
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("ID", pa.string()),
+            ("DATE", pa.date32()),
+            ("FOOD_INDEX", pa.int32()),
+            ("FOOD_NAME", pa.string()),
+            ("FOOD_PT", pa.float64()),
+            ("FOOD_FAT", pa.float64()),
+            ("FOOD_CH", pa.float64()),
+            ("FOOD_KCAL", pa.float64()),
+        ]
+    )
+
+
+def _number(value):
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def month_path(year, month):
+    # 다시 옮길 때마다 새 파일: 기록이 커밋되기 전까지 읽는 쪽은 예전 파일을 그대로 본다
+    return os.path.join(ARCHIVE_DIR, "FOOD", f"{year}-{month:02d}.{time.time_ns()}.parquet")
+
+
+def _query_months(cursor):
+    try:
+        cursor.execute("SELECT YEAR, MONTH, PATH FROM FOOD_ARCHIVE_MONTHS")
+        return {(year, month): path for year, month, path in cursor.fetchall()}
+    except pymysql.MySQLError as e:
+        # 마이그레이션 전이면 아카이브가 없는 것으로 본다
+        logging.warning(f"FOOD_ARCHIVE_MONTHS unavailable: {e}")
+        return {}
+
+
+def archived_months(cursor=None):
+    # {(year, month): path}. 요청 중에 연결을 이미 잡고 있으면 그 커서를 넘긴다 (풀에서 두 번째 연결을 잡지 않도록)
+    if cursor is not None:
+        return _query_months(cursor)
+    connection = db.get_connection()
+    try:
+        with connection.cursor() as own_cursor:
+            return _query_months(own_cursor)
+    finally:
+        connection.close()
+
+
+def months_between(months, start, end):
+    # [start, end)와 겹치는 옮긴 달을 날짜순으로
+    return sorted(
+        key for key in months
+        if start < month_bounds(*key)[1] and month_bounds(*key)[0] < end
+    )
+
+
+def read_month(year, month, user_id=None, cursor=None):
+    # FOOD 조회와 같은 순서/형식의 행: (DATE, FOOD_INDEX, FOOD_NAME, FOOD_PT, FOOD_FAT, FOOD_CH, FOOD_KCAL)
+    return read_file(archived_months(cursor)[(int(year), int(month))], user_id)
+
+
+def max_food_index(cursor, user_id, day):
+    # 옮긴 달이면 파일에 있는 그날의 가장 높은 FOOD_INDEX (foods.next_food_index가 번호를 이어 붙인다)
+    path = archived_months(cursor).get((day.year, day.month))
+    if not path:
+        return None
+    indexes = [food_index for food_date, food_index, *_ in read_file(path, user_id) if food_date == day]
+    return max(indexes, default=None)
+
+
+def read_file(path, user_id=None):
+    import pyarrow.parquet as pq
+
+    filters = [("ID", "=", str(user_id))] if user_id is not None else None
+    table = pq.read_table(path, columns=list(COLUMNS[1:]), filters=filters)
+    table = table.sort_by([("DATE", "ascending"), ("FOOD_INDEX", "ascending")])
+    return list(zip(*(table.column(name).to_pylist() for name in COLUMNS[1:])))
+
+
+def _month_checksum(cursor, start, end, lock=False):
+    # 행이 추가/수정/삭제되면 바뀌는 (행 수, CRC 합). lock=True면 그 범위를 커밋까지 잠근다
+    cursor.execute(
+        f"""
+        SELECT COUNT(*), COALESCE(SUM(CRC32(CONCAT_WS('|', {", ".join(COLUMNS)}))), 0)
+        FROM FOOD
+        WHERE DATE >= %s AND DATE < %s
+        {"FOR UPDATE" if lock else ""}
+        """,
+        (start, end),
+    )
+    # fetchall: SSCursor에서도 결과를 끝까지 읽어야 다음 쿼리를 보낼 수 있다
+    count, checksum = cursor.fetchall()[0]
+    return int(count), int(checksum)
+
+
+def _write_parquet(year, month, previous=None):
+    # 한 달 치를 한 스냅숏에서 스트리밍으로 읽어 새 파일에 쓰고, 그 스냅숏의 체크섬을 돌려준다.
+    # previous: 이미 옮긴 달의 예전 파일. 그 뒤에 FOOD에 새로 추가된 행과 합친다
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    start, end = month_bounds(year, month)
+    path = month_path(year, month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    schema = _schema()
+    rows = 0
+    rows_kept = 0
+
+    connection = db.connect(cursorclass=pymysql.cursors.SSCursor)
+    try:
+        with connection.cursor() as cursor, pq.ParquetWriter(
+            tmp_path, schema, compression="zstd"
+        ) as writer:
+            # 체크섬과 파일에 쓰는 행이 같은 시점을 보도록 (REPEATABLE READ)
+            cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+            snapshot = _month_checksum(cursor, start, end)
+            cursor.execute(
+                f"""
+                SELECT {", ".join(COLUMNS)}
+                FROM FOOD
+                WHERE DATE >= %s AND DATE < %s
+                ORDER BY ID, DATE, FOOD_INDEX
+                """,
+                (start, end),
+            )
+            while True:
+                batch = cursor.fetchmany(WRITE_BATCH_ROWS)
+                if not batch:
+                    break
+                columns = list(zip(*batch))
+                columns[0] = [str(value) for value in columns[0]]
+                for i in range(4, 8):
+                    columns[i] = [_number(value) for value in columns[i]]
+                writer.write_table(
+                    pa.Table.from_arrays(
+                        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                        schema=schema,
+                    ),
+                    row_group_size=ROW_GROUP_ROWS,
+                )
+                rows += len(batch)
+
+            if previous:
+                old = pq.read_table(previous, schema=schema)
+                if len(old):
+                    writer.write_table(
+                        old.take(pc.sort_indices(old, [("ID", "ascending")])),
+                        row_group_size=ROW_GROUP_ROWS,
+                    )
+                rows_kept = len(old)
+        connection.rollback()
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        connection.close()
+    os.replace(tmp_path, path)
+    return path, rows, rows_kept, snapshot
+
+
+def _partition_exists(cursor, name):
+    cursor.execute(
+        """
+        SELECT COUNT(*) FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'FOOD' AND PARTITION_NAME = %s
+        """,
+        (name,),
+    )
+    return cursor.fetchone()[0] > 0
+
+
+def archive_month(year, month):
+    start, end = month_bounds(year, month)
+    partition = f"p{year}{month:02d}"
+
+    connection = db.connect()
+    try:
+        with connection.cursor() as cursor:
+            partitioned = _partition_exists(cursor, partition)
+            previous = _query_months(cursor).get((year, month))
+        connection.rollback()
+        path, rows, rows_kept, snapshot = _write_parquet(year, month, previous)
+
+        try:
+            with connection.cursor() as cursor:
+                # 그 달 범위를 잠근 뒤 파일을 쓴 스냅숏과 비교한다. 같으면 기록과 삭제를 한 트랜잭션으로
+                # 커밋하므로 그 사이에 추가/수정된 행을 잃지 않는다 (DROP PARTITION은 암묵적으로 커밋해서 쓰지 않는다)
+                current = _month_checksum(cursor, start, end, lock=True)
+                if current != snapshot:
+                    raise RuntimeError(
+                        f"{year}-{month:02d}: FOOD changed while writing {rows} rows "
+                        f"(now {current[0]}); not deleting"
+                    )
+                cursor.execute(
+                    """
+                    REPLACE INTO FOOD_ARCHIVE_MONTHS (YEAR, MONTH, PATH, ROW_COUNT)
+                    VALUES (%s, %s, %s, %s)
+                    """,
+                    (year, month, path, rows + rows_kept),
+                )
+                # FOOD 삭제 트리거가 USER_NT 하루 합계를 빼므로, 옮긴 날의 합계를 같은 트랜잭션에서 되돌려 놓는다
+                # (월간 조회/퍼센트/조언이 읽는 합계는 파일로 옮긴 음식도 포함해야 한다)
+                cursor.execute(
+                    """
+                    SELECT CARBO, PROTEIN, FAT, KCAL, ID, DATE FROM USER_NT
+                    WHERE DATE >= %s AND DATE < %s
+                    FOR UPDATE
+                    """,
+                    (start, end),
+                )
+                totals = cursor.fetchall()
+                cursor.execute("DELETE FROM FOOD WHERE DATE >= %s AND DATE < %s", (start, end))
+                if totals:
+                    cursor.executemany(
+                        """
+                        UPDATE USER_NT SET CARBO = %s, PROTEIN = %s, FAT = %s, KCAL = %s
+                        WHERE ID = %s AND DATE = %s
+                        """,
+                        totals,
+                    )
+            connection.commit()
+        except BaseException:
+            connection.rollback()
+            os.remove(path)
+            raise
+
+        if partitioned:
+            # 지운 행의 공간을 돌려받는다. REBUILD는 남아 있는(그 뒤에 추가된) 행을 그대로 둔다
+            with connection.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE FOOD REBUILD PARTITION {partition}")
+    finally:
+        connection.close()
+    if previous:
+        # 기록이 바뀌었으니 예전 파일은 더 읽히지 않는다
+        try:
+            os.remove(previous)
+        except FileNotFoundError:
+            pass
+    return rows
+
+
+def months_before(before):
+    # FOOD에 남아 있는 달 중 before(YYYY-MM-01) 이전의 달
+    connection = db.connect()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT MIN(DATE) FROM FOOD")
+            oldest = cursor.fetchone()[0]
+    finally:
+        connection.close()
+    months = []
+    if oldest is None:
+        return months
+    year, month = oldest.year, oldest.month
+    while (year, month) < (before.year, before.month):
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def retention_cutoff(today=None, retention_months=RETENTION_MONTHS):
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1 - retention_months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def ensure_partitions(ahead):
+    # pmax를 나눠 이번 달부터 ahead개월 뒤까지 파티션이 있게 한다
+    connection = db.connect()
+    created = []
+    try:
+        with connection.cursor() as cursor:
+            if not _partition_exists(cursor, "pmax"):
+                print("FOOD is not partitioned; apply migrations/005_food_partitions.sql first")
+                return created
+            today = date.today()
+            year, month = today.year, today.month
+            for _ in range(ahead + 1):
+                name = f"p{year}{month:02d}"
+                _, end = month_bounds(year, month)
+                if not _partition_exists(cursor, name):
+                    cursor.execute(
+                        f"""
+                        ALTER TABLE FOOD REORGANIZE PARTITION pmax INTO (
+                            PARTITION {name} VALUES LESS THAN ('{end.isoformat()}'),
+                            PARTITION pmax VALUES LESS THAN (MAXVALUE)
+                        )
+                        """
+                    )
+                    created.append(name)
+                year, month = end.year, end.month
+    finally:
+        connection.close()
+    return created
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FOOD partition and archive jobs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("run", help="move months past retention to Parquet")
+    p.add_argument("--before", help="archive months before YYYY-MM (default: retention window)")
+    p = sub.add_parser("partitions", help="create upcoming monthly partitions")
+    p.add_argument("--ahead", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.command == "partitions":
+        created = ensure_partitions(args.ahead)
+        print(f"Partitions created: {', '.join(created) or 'none'}")
+        return
+
+    if args.before:
+        before = date(int(args.before[:4]), int(args.before[5:7]), 1)
+    else:
+        before = retention_cutoff()
+    for year, month in months_before(before):
+        started = time.perf_counter()
+        rows = archive_month(year, month)
+        print(f"Archived {year}-{month:02d}: {rows} rows in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# autocomplete.py
+# 음식 이름 자동 완성: 사용자의 FOOD 기록 + 전체 인기 음식(FOOD_POPULARITY)으로 만든 메모리 트라이.
+# 자모 단위("떡보" -> 떡볶이, "달" -> 닭갈비)와 초성("ㄸㅂㅇ") 입력을 모두 찾는다.
+# 결과에 저장된 영양 정보가 들어 있어, 고른 음식은 /api/add_food의 NUTRITION으로 보내면 LLM을 거치지 않는다.
+#
+#   python autocomplete.py refresh        # FOOD_POPULARITY 다시 계산 (cron)
+
+import argparse
+import math
+import os
+import time
+from datetime import date as date_type
+
+from flask import Blueprint, request, jsonify
+import pymysql
+
+import cache
+import foods
+from db import get_connection
+from hangul import choseong, keystrokes, normalize
+
+bp = Blueprint("autocomplete", __name__)
+
+TOP_PER_NODE = 10  # 노드마다 미리 골라 둔 후보 수 (요청 limit의 최댓값)
+POPULAR_FOODS = int(os.getenv("AUTOCOMPLETE_POPULAR_FOODS", "5000"))
+POPULARITY_DAYS = 180
+RECENCY_HALF_LIFE_DAYS = 30
+
+# ("user", ID) / "global" -> FoodTrie. 사용자 트라이는 음식을 추가하면 invalidate()로 지운다
+trie_cache = cache.get_cache("autocomplete", maxsize=2000, ttl=600)
+
+
+class FoodTrie:
+    # 각 노드가 점수순 상위 후보를 들고 있어 조회는 입력 길이만큼만 내려가면 된다
+    def __init__(self, entries):
+        # entries: 점수 내림차순 [{food_name, calorie, carbohydrate, protein, fat, ...}]
+        self.entries = entries
+        self.root = {}
+        for position, entry in enumerate(entries):
+            name = entry["food_name"]
+            for key in {keystrokes(name), choseong(name)}:
+                node = self.root
+                for ch in key:
+                    node = node.setdefault(ch, {})
+                    top = node.setdefault("", [])
+                    if len(top) < TOP_PER_NODE and (not top or top[-1] != position):
+                        top.append(position)
+
+    def search(self, prefix, limit):
+        node = self.root
+        for ch in keystrokes(prefix):
+            node = node.get(ch)
+            if node is None:
+                return []
+        return [self.entries[position] for position in node.get("", [])[:limit]]
+
+
+def _recency_weight(last_date, today):
+    if not last_date:
+        return 1.0
+    age = max((today - date_type.fromisoformat(last_date)).days, 0)
+    return math.pow(0.5, age / RECENCY_HALF_LIFE_DAYS)
+
+
+def build_user_trie(cursor, user_id):
+    today = date_type.today()
+    history = foods.food_history(cursor, user_id)
+    history.sort(
+        key=lambda entry: entry["count"] * _recency_weight(entry["last_date"], today),
+        reverse=True,
+    )
+    return FoodTrie(history)
+
+
+def build_global_trie(cursor):
+    cursor.execute(
+        """
+        SELECT FOOD_NAME, FOOD_CH, FOOD_PT, FOOD_FAT, FOOD_KCAL, CNT, LAST_DATE
+        FROM FOOD_POPULARITY
+        ORDER BY CNT DESC
+        LIMIT %s
+        """,
+        (POPULAR_FOODS,),
+    )
+    return FoodTrie([foods.food_entry(*row) for row in cursor.fetchall()])
+
+
+def _trie(key, build):
+    trie = trie_cache.get(key)
+    if trie is not None:
+        return trie
+    epoch = trie_cache.epoch()
+    connection = get_connection()
+    try:
+        with connection.cursor() as cursor:
+            trie = build(cursor)
+    finally:
+        connection.close()
+    trie_cache.set(key, trie, epoch=epoch)
+    return trie
+
+
+def invalidate(user_id):
+    trie_cache.delete(("user", str(user_id)))
+
+
+def suggest(user_id, prefix, limit=TOP_PER_NODE):
+    # 사용자 기록을 먼저, 남는 자리는 전체 인기 음식으로 채운다
+    results = []
+    seen = set()
+    tries = [
+        (("user", str(user_id)), lambda cursor: build_user_trie(cursor, user_id), "history"),
+        ("global", build_global_trie, "popular"),
+    ]
+    for key, build, source in tries:
+        for entry in _trie(key, build).search(prefix, limit):
+            name = normalize(entry["food_name"])
+            if name not in seen:
+                seen.add(name)
+                results.append({**entry, "source": source})
+        if len(results) >= limit:
+            break
+    return results[:limit]
+
+
+@bp.route("/api/food/autocomplete", methods=["GET"])
+def autocomplete():
+    user_id = request.args.get("ID")
+    prefix = (request.args.get("q") or "").strip()
+    limit = min(request.args.get("limit", TOP_PER_NODE, type=int), TOP_PER_NODE)
+
+    if not user_id:
+        return jsonify({"error": "ID is required"}), 400
+    if not prefix:
+        return jsonify({"items": []}), 200
+
+    try:
+        items = suggest(user_id, prefix, limit)
+    except pymysql.MySQLError as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"items": items}), 200
+
+
+def refresh_popularity(days=POPULARITY_DAYS, min_count=3):
+    # 최근 days일 동안 min_count번 이상 기록된 음식의 평균 영양 정보
+    connection = get_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM FOOD_POPULARITY")
+            cursor.execute(
+                """
+                INSERT INTO FOOD_POPULARITY
+                    (FOOD_NAME, CNT, FOOD_CH, FOOD_PT, FOOD_FAT, FOOD_KCAL, LAST_DATE)
+                SELECT FOOD_NAME, COUNT(*), AVG(FOOD_CH), AVG(FOOD_PT), AVG(FOOD_FAT),
+                       AVG(FOOD_KCAL), MAX(DATE)
+                FROM FOOD
+                WHERE DATE >= CURDATE() - INTERVAL %s DAY AND FOOD_NAME IS NOT NULL
+                GROUP BY FOOD_NAME
+                HAVING COUNT(*) >= %s
+                ORDER BY COUNT(*) DESC
+                LIMIT %s
+                """,
+                (days, min_count, POPULAR_FOODS),
+            )
+            count = cursor.rowcount
+        connection.commit()
+    finally:
+        connection.close()
+    trie_cache.delete("global")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Food autocomplete jobs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("refresh", help="recompute FOOD_POPULARITY")
+    p.add_argument("--days", type=int, default=POPULARITY_DAYS)
+    p.add_argument("--min-count", type=int, default=3)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    count = refresh_popularity(args.days, args.min_count)
+    print(f"FOOD_POPULARITY refreshed: {count} foods in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# batch.py
+# 야간 배치: 모든 사용자의 마감된 달 요약(monthly.get_monthly_data 결과)을 미리 계산해 MONTHLY_SUMMARY에 쓴다.
+# 사용자 ID를 샤드 단위로 나눠 ProcessPoolExecutor에서 처리하고, 체크포인트로 중단 지점부터 재개한다.
+#
+#   python batch.py --months 3 --workers 4
+#   python batch.py --months 3 --workers 4 --resume      # 체크포인트부터 이어서
+#   python batch.py --advice                              # 지난달 조언도 함께 생성
+
+import argparse
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import db
+import summaries
+
+DEFAULT_SHARD_SIZE = 200
+DEFAULT_CHECKPOINT = "batch_checkpoint.json"
+
+
+def closed_months(count, today=None):
+    today = today or date.today()
+    year, month = today.year, today.month
+    months = []
+    for _ in range(count):
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+        months.append((year, month))
+    return months
+
+
+def iter_user_shards(after_id, shard_size):
+    # keyset 페이지네이션으로 USER.ID를 샤드 단위로 읽는다
+    connection = db.connect()
+    try:
+        while True:
+            with connection.cursor() as cursor:
+                if after_id is None:
+                    cursor.execute(
+                        "SELECT ID FROM USER ORDER BY ID LIMIT %s", (shard_size,)
+                    )
+                else:
+                    cursor.execute(
+                        "SELECT ID FROM USER WHERE ID > %s ORDER BY ID LIMIT %s",
+                        (after_id, shard_size),
+                    )
+                user_ids = [row[0] for row in cursor.fetchall()]
+            if not user_ids:
+                return
+            yield user_ids
+            after_id = user_ids[-1]
+    finally:
+        connection.close()
+
+
+def compute_shard(user_ids, months, with_advice):
+    # 워커 프로세스에서 실행된다. 요청 처리와 같은 코드(monthly.get_monthly_data)를 쓴다
+    import monthly
+    import advice
+
+    rows = []
+    failures = 0
+    advice_month = advice.previous_month()
+    for user_id in user_ids:
+        # 계산하는 사이 기록이 바뀌면 저장할 때 버린다 (summaries.save_summaries)
+        version = summaries.load_version(user_id)
+        for year, month in months:
+            payload = monthly.get_monthly_data(year, month, user_id)
+            if "error" in payload:
+                failures += 1
+                continue
+            rows.append((user_id, year, month, payload, version))
+        if with_advice:
+            try:
+                advice.get_advice(user_id, *advice_month)
+            except Exception as e:
+                failures += 1
+                logging.error(f"Advice failed for {user_id}: {e}")
+
+    connection = db.get_connection()
+    try:
+        stale = summaries.save_summaries(connection, rows)
+    finally:
+        connection.close()
+    return {
+        "users": len(user_ids),
+        "summaries": len(rows) - stale,
+        "stale": stale,
+        "failures": failures,
+    }
+
+
+def _load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f).get("last_user_id")
+
+
+def _save_checkpoint(path, last_user_id, months):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"last_user_id": last_user_id, "months": months}, f)
+    os.replace(tmp, path)
+
+
+def run(months, workers, shard_size, checkpoint, resume, with_advice):
+    after_id = _load_checkpoint(checkpoint) if resume else None
+    if after_id is not None:
+        print(f"Resuming after user {after_id}")
+
+    started = time.perf_counter()
+    totals = {"users": 0, "summaries": 0, "stale": 0, "failures": 0}
+    pending = deque()  # (샤드의 마지막 ID, future), 제출 순서대로
+
+    def drain(block):
+        # 앞쪽부터 연속으로 끝난 샤드까지만 체크포인트를 옮긴다
+        while pending and (block or pending[0][1].done()):
+            last_id, future = pending.popleft()
+            result = future.result()
+            for key in totals:
+                totals[key] += result[key]
+            _save_checkpoint(checkpoint, last_id, months)
+            elapsed = time.perf_counter() - started
+            print(
+                f"users={totals['users']} summaries={totals['summaries']} "
+                f"stale={totals['stale']} failures={totals['failures']} "
+                f"rate={totals['users'] / elapsed:.1f} users/s"
+            )
+            block = False
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for user_ids in iter_user_shards(after_id, shard_size):
+            pending.append(
+                (user_ids[-1], executor.submit(compute_shard, user_ids, months, with_advice))
+            )
+            drain(block=len(pending) >= workers * 2)
+        while pending:
+            drain(block=True)
+
+    elapsed = time.perf_counter() - started
+    result = {
+        **totals,
+        "months": months,
+        "workers": workers,
+        "seconds": round(elapsed, 1),
+        "users_per_second": round(totals["users"] / elapsed, 2) if elapsed else None,
+        "summaries_per_second": round(totals["summaries"] / elapsed, 2) if elapsed else None,
+    }
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)  # 끝까지 돌았으면 다음 실행은 처음부터
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute monthly summaries for all users")
+    parser.add_argument("--months", type=int, default=3, help="number of closed months")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--resume", action="store_true")
+    parser.add_argument("--advice", action="store_true", help="also precompute last month's advice")
+    args = parser.parse_args()
+
+    result = run(
+        closed_months(args.months),
+        args.workers,
+        args.shard_size,
+        args.checkpoint,
+        args.resume,
+        args.advice,
+    )
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
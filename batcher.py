@@ -0,0 +1,86 @@
+# batcher.py
+# 동시에 들어온 요청을 잠깐 모아 한 번에 처리하는 마이크로 배처.
+# 트래픽이 적으면 기다리지 않고 바로 보내고, 많을수록 최대 max_wait_ms까지 모은다.
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class MicroBatcher:
+    def __init__(self, process_batch, max_items=8, max_wait_ms=200, max_inflight=4):
+        # process_batch(keys) -> keys와 같은 순서의 결과 목록
+        self._process_batch = process_batch
+        self.max_items = max_items
+        self.max_wait = max_wait_ms / 1000
+        self._pending = {}  # key -> Future, 같은 입력은 한 번만 보낸다
+        self._cond = threading.Condition()
+        self._interval = None  # 요청 간 간격의 지수 이동 평균 (초)
+        self._last_arrival = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_inflight, thread_name_prefix="microbatch"
+        )
+        self.batches = 0
+        self.items = 0
+        threading.Thread(target=self._collect, name="microbatch-collector", daemon=True).start()
+
+    def submit(self, key):
+        with self._cond:
+            now = time.monotonic()
+            if self._last_arrival is not None:
+                gap = now - self._last_arrival
+                self._interval = gap if self._interval is None else 0.8 * self._interval + 0.2 * gap
+            self._last_arrival = now
+
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = Future()
+                self._cond.notify()
+        return future
+
+    def __call__(self, key, timeout=None):
+        return self.submit(key).result(timeout)
+
+    def window(self):
+        # 창 안에 다음 요청이 올 것 같지 않으면(한가할 때) 기다리지 않는다
+        if self._interval is None or self._interval >= self.max_wait:
+            return 0.0
+        return min(self.max_wait, self._interval * (self.max_items - 1))
+
+    def _collect(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = time.monotonic() + self.window()
+                while len(self._pending) < self.max_items:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                keys = list(self._pending)[: self.max_items]
+                batch = [(key, self._pending.pop(key)) for key in keys]
+            self._executor.submit(self._run, batch)
+
+    def _run(self, batch):
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            results = self._process_batch([key for key, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "average_batch_size": round(self.items / self.batches, 2) if self.batches else None,
+            "window_ms": round(self.window() * 1000, 1),
+        }
@@ -0,0 +1,576 @@
+# bench.py
+# 실제 DB(.env 설정)를 대상으로 하는 성능 측정 스크립트
+#
+#   python bench.py import --user bench_user --rows 20000
+#   python bench.py serialize --foods-per-day 4
+#   python bench.py memory
+#   python bench.py llm-pool --requests 200 --concurrency 16   (fake_azure.py 로 로컬에서)
+#   python bench.py storage --backend both --users 20 --days 60   (MySQL과 내장 SQLite에 같은 작업)
+#   python bench.py classifier --batch-sizes 1,4,8,16   (ONNX 음식 사진 분류기, CPU)
+#   python bench.py llm-replay --record   (한 번 실제 Azure로 녹화한 뒤)
+#   python bench.py llm-replay --latency none --timeout-rate 0.05 --rate-429 0.1   (오프라인 재생, cassette.py)
+
+import argparse
+import gzip
+import json
+import random
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import db
+import food_import
+import responses
+import storage
+
+BENCH_START_DATE = date(1990, 1, 1)  # 실제 기록과 겹치지 않는 기간
+BENCH_FOODS = ["김밥", "라면", "떡볶이", "비빔밥", "샐러드", "닭가슴살", "바나나", "콜라"]
+
+
+def _cleanup(user_id, start, end):
+    connection = db.connect()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM FOOD WHERE ID = %s AND DATE BETWEEN %s AND %s",
+                (user_id, start, end),
+            )
+            cursor.execute(
+                "DELETE FROM USER_NT WHERE ID = %s AND DATE BETWEEN %s AND %s",
+                (user_id, start, end),
+            )
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def bench_import(args):
+    rng = random.Random(args.seed)
+    days = max(1, args.rows // args.per_day)
+    end = BENCH_START_DATE + timedelta(days=days - 1)
+    records = [
+        {
+            "date": (BENCH_START_DATE + timedelta(days=i // args.per_day)).isoformat(),
+            "food_name": rng.choice(BENCH_FOODS),
+            "calories": rng.randint(50, 900),
+            "carbohydrates": rng.randint(0, 120),
+            "protein": rng.randint(0, 60),
+            "fat": rng.randint(0, 50),
+        }
+        for i in range(args.rows)
+    ]
+
+    _cleanup(args.user, BENCH_START_DATE, end)
+    try:
+        started = time.perf_counter()
+        result = food_import.import_records(args.user, records, args.chunk_size)
+        total = time.perf_counter() - started
+    finally:
+        if not args.keep:
+            _cleanup(args.user, BENCH_START_DATE, end)
+
+    return {
+        "benchmark": "import",
+        "rows": args.rows,
+        "chunk_size": args.chunk_size,
+        "inserted": result["inserted"],
+        "seconds": round(total, 3),
+        "rows_per_second": round(result["inserted"] / total, 1),
+    }
+
+
+def _synthetic_quarter(rng, foods_per_day):
+    quarter = {}
+    for month in ("2024-06", "2024-07", "2024-08"):
+        foods = [
+            [
+                {
+                    "food_index": i,
+                    "food_name": rng.choice(BENCH_FOODS),
+                    "protein": str(rng.randint(0, 60)),
+                    "fat": str(rng.randint(0, 50)),
+                    "carbohydrates": str(rng.randint(0, 120)),
+                    "calories": str(rng.randint(50, 900)),
+                }
+                for i in range(foods_per_day)
+            ]
+            for _ in range(31)
+        ]
+        percentages = [
+            {
+                "carbohydrates_percentage": round(rng.uniform(0, 150), 1),
+                "protein_percentage": round(rng.uniform(0, 150), 1),
+                "fat_percentage": round(rng.uniform(0, 150), 1),
+            }
+            for _ in range(31)
+        ]
+        quarter[month] = {"foods": foods, "percentages": percentages}
+    return quarter
+
+
+def _time_per_call(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - started) / repeat * 1000, result
+
+
+def bench_serialize(args):
+    import orjson
+
+    quarter = _synthetic_quarter(random.Random(args.seed), args.foods_per_day)
+
+    # jsonify 기본 설정과 같게 (ASCII 이스케이프, 키 정렬)
+    stdlib_ms, rows_json = _time_per_call(
+        lambda: json.dumps(quarter, sort_keys=True).encode(), args.repeat
+    )
+    orjson_ms, _ = _time_per_call(lambda: orjson.dumps(quarter), args.repeat)
+    columnar_ms, columnar_json = _time_per_call(
+        lambda: orjson.dumps(
+            {
+                month: {
+                    "foods": responses.columnar_days(data["foods"]),
+                    "percentages": data["percentages"],
+                }
+                for month, data in quarter.items()
+            }
+        ),
+        args.repeat,
+    )
+
+    sizes = {
+        "rows_json": len(rows_json),
+        "rows_gzip": len(gzip.compress(rows_json, responses.GZIP_LEVEL)),
+        "columnar_json": len(columnar_json),
+        "columnar_gzip": len(gzip.compress(columnar_json, responses.GZIP_LEVEL)),
+    }
+    if responses.brotli is not None:
+        sizes["columnar_br"] = len(
+            responses.brotli.compress(columnar_json, quality=responses.BROTLI_QUALITY)
+        )
+
+    return {
+        "benchmark": "serialize",
+        "foods_per_day": args.foods_per_day,
+        "ms_per_payload": {
+            "stdlib_json_rows": round(stdlib_ms, 3),
+            "orjson_rows": round(orjson_ms, 3),
+            "orjson_columnar": round(columnar_ms, 3),
+        },
+        "bytes": sizes,
+        "shrink_vs_rows_json": round(sizes["rows_json"] / min(sizes.values()), 1),
+    }
+
+
+# 통합 전 각 Flask 앱이 따로 떠 있을 때 프로세스마다 불러오던 모듈
+LEGACY_PROCESSES = {
+    "app.py": ["flask", "flask_cors", "mysql.connector", "pymysql", "langchain_openai"],
+    "login.py": ["flask", "flask_cors", "mysql.connector"],
+    "register.py": ["flask", "mysql.connector"],
+    "monthly.py": ["flask", "pymysql"],
+    "detail.py": ["flask", "mysql.connector"],
+    "delete_food.py": ["flask", "mysql.connector"],
+    "send.py": ["flask", "pymysql", "langchain_openai"],
+}
+
+
+def _process_rss(code):
+    import psutil
+
+    process = subprocess.Popen(
+        [sys.executable, "-c", code + "\nprint('ready', flush=True)\nimport sys; sys.stdin.read()"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        if process.stdout.readline().strip() != "ready":
+            raise RuntimeError(f"benchmark process failed: {code}")
+        return psutil.Process(process.pid).memory_info().rss
+    finally:
+        process.stdin.close()
+        process.wait()
+
+
+def bench_memory(args):
+    legacy = {}
+    for name, modules in LEGACY_PROCESSES.items():
+        code = "\n".join(f"import {module}" for module in modules)
+        code += "\nimport flask\nflask.Flask(__name__)"
+        legacy[name] = _process_rss(code)
+    consolidated = _process_rss("import app")
+
+    mib = 1024 * 1024
+    legacy_total = sum(legacy.values())
+    return {
+        "benchmark": "memory",
+        "legacy_rss_mib": {name: round(rss / mib, 1) for name, rss in legacy.items()},
+        "legacy_total_rss_mib": round(legacy_total / mib, 1),
+        "consolidated_rss_mib": round(consolidated / mib, 1),
+        "saved_mib": round((legacy_total - consolidated) / mib, 1),
+    }
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else None
+
+
+def _run_chat_load(client, requests, concurrency):
+    body = {"messages": [{"role": "user", "content": "떡볶이 1인분"}]}
+
+    def call(_):
+        started = time.perf_counter()
+        response = client.post(
+            "/openai/deployments/gpt-4o/chat/completions",
+            params={"api-version": "2024-06-01"},
+            json=body,
+        )
+        return response.status_code, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(call, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for status, latency in results if status == 200]
+    return {
+        "ok": len(latencies),
+        "throttled": sum(1 for status, _ in results if status == 429),
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.5) * 1000) if latencies else None,
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000) if latencies else None,
+    }
+
+
+def _fake_deployments(args):
+    import fake_azure
+
+    # 한도가 작고 빠른 배포, 한도가 크고 느린 배포
+    return [
+        fake_azure.serve(0, args.rpm, args.latency_ms),
+        fake_azure.serve(0, args.rpm * 4, args.latency_ms * 3),
+    ]
+
+
+def bench_llm_pool(args):
+    import httpx
+
+    import llm_pool
+
+    # 배포마다 한도 창이 새로 시작되도록 측정마다 가짜 엔드포인트를 새로 띄운다
+    servers = _fake_deployments(args)
+    try:
+        url = f"http://127.0.0.1:{servers[0].server_address[1]}"
+        with httpx.Client(base_url=url, timeout=30) as client:
+            single = _run_chat_load(client, args.requests, args.concurrency)
+    finally:
+        for server in servers:
+            server.shutdown()
+
+    servers = _fake_deployments(args)
+    try:
+        backends = [
+            llm_pool.Backend(f"http://127.0.0.1:{server.server_address[1]}", "fake-key")
+            for server in servers
+        ]
+        transport = llm_pool.PooledTransport(backends)
+        with httpx.Client(base_url="http://pool.invalid", transport=transport, timeout=30) as client:
+            pooled = _run_chat_load(client, args.requests, args.concurrency)
+    finally:
+        for server in servers:
+            server.shutdown()
+
+    return {
+        "benchmark": "llm-pool",
+        "requests": args.requests,
+        "single_deployment": single,
+        "pooled": pooled,
+        "backends": transport.stats(),
+    }
+
+
+def _timed_calls(fn, calls, concurrency):
+    def call(args):
+        started = time.perf_counter()
+        fn(*args)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(call, calls))
+    elapsed = time.perf_counter() - started
+    return {
+        "calls": len(latencies),
+        "ops_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.5) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 3),
+    }
+
+
+def _storage_cleanup(backend, users):
+    if backend.name != "mysql":
+        return
+    connection = db.connect()
+    try:
+        with connection.cursor() as cursor:
+            for table in ("FOOD", "USER_NT", "USER"):
+                cursor.executemany(f"DELETE FROM {table} WHERE ID = %s", [(user,) for user in users])
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def _storage_workload(backend, args):
+    # 가입 -> 하루 한 끼씩 기록 -> 로그인/하루 조회/기간 합계 -> 일부 삭제
+    rng = random.Random(args.seed)
+    users = [f"bench_storage_{i}" for i in range(args.users)]
+    days = [BENCH_START_DATE + timedelta(days=i) for i in range(args.days)]
+    end = days[-1] + timedelta(days=1)
+    meals = [
+        (
+            user,
+            day.isoformat(),
+            [
+                {
+                    "food_name": rng.choice(BENCH_FOODS),
+                    "calorie": rng.randint(50, 900),
+                    "carbohydrate": rng.randint(0, 120),
+                    "protein": rng.randint(0, 60),
+                    "fat": rng.randint(0, 50),
+                }
+                for _ in range(args.foods_per_day)
+            ],
+        )
+        for user in users
+        for day in days
+    ]
+    reads = [(rng.choice(users), rng.choice(days).isoformat()) for _ in range(args.reads)]
+
+    _storage_cleanup(backend, users)
+    try:
+        results = {
+            "create_user": _timed_calls(
+                backend.create_user,
+                [
+                    ({"id": user, "pw": "bench", "bodyweight": 70, "height": 175,
+                      "age": 30, "gender": 1, "activity": 3},)
+                    for user in users
+                ],
+                args.concurrency,
+            ),
+            "add_foods": _timed_calls(backend.add_foods, meals, args.concurrency),
+            "authenticate": _timed_calls(
+                backend.authenticate, [(user, "bench") for user in users], args.concurrency
+            ),
+            "day": _timed_calls(backend.day, reads, args.concurrency),
+            "daily_totals": _timed_calls(
+                backend.daily_totals,
+                [(user, days[0].isoformat(), end.isoformat()) for user in users],
+                args.concurrency,
+            ),
+            "delete_food": _timed_calls(
+                backend.delete_food,
+                [(user, day, 0) for user, day, _ in meals[:: max(1, len(meals) // args.reads)]],
+                args.concurrency,
+            ),
+        }
+    finally:
+        if not args.keep:
+            _storage_cleanup(backend, users)
+    return results
+
+
+def bench_storage(args):
+    result = {
+        "benchmark": "storage",
+        "users": args.users,
+        "days": args.days,
+        "foods_per_day": args.foods_per_day,
+        "concurrency": args.concurrency,
+    }
+    if args.backend in ("sqlite", "both"):
+        with tempfile.TemporaryDirectory() as directory:
+            path = args.sqlite_path or os.path.join(directory, "bench.sqlite3")
+            result["sqlite"] = _storage_workload(storage.SQLiteStorage(path), args)
+    if args.backend in ("mysql", "both"):
+        result["mysql"] = _storage_workload(storage.MySQLStorage(), args)
+    return result
+
+
+def bench_classifier(args):
+    import numpy as np
+
+    import food_classifier
+
+    classifier = food_classifier.load_classifier()
+    if classifier is None:
+        sys.exit(
+            "Classifier unavailable: install onnxruntime and run `python food_classifier.py export`"
+        )
+    cases = food_classifier.regression_set(args.dir)
+    images = [path for path, _ in cases]
+
+    # 전처리(디코딩, 리사이즈)와 추론을 나눠 잰다
+    preprocess_ms, _ = _time_per_call(
+        lambda: [classifier.preprocess(path) for path in images], args.repeat
+    )
+    pixels = [classifier.preprocess(path) for path in images]
+    classifier.embed(pixels[0][None])  # 첫 실행의 초기화 비용은 빼고 잰다
+
+    latencies = []
+    for _ in range(args.repeat):
+        for one in pixels:
+            started = time.perf_counter()
+            classifier.embed(one[None])
+            latencies.append(time.perf_counter() - started)
+
+    throughput = {}
+    for batch_size in (int(size) for size in args.batch_sizes.split(",")):
+        batch = np.stack([pixels[i % len(pixels)] for i in range(batch_size)])
+        calls = max(1, args.repeat * len(pixels) // batch_size)
+        started = time.perf_counter()
+        for _ in range(calls):
+            classifier.embed(batch)
+        elapsed = time.perf_counter() - started
+        throughput[batch_size] = {
+            "images_per_s": round(calls * batch_size / elapsed, 1),
+            "ms_per_image": round(elapsed / (calls * batch_size) * 1000, 2),
+        }
+
+    regression = food_classifier.regress(classifier, args.dir)
+    return {
+        "benchmark": "classifier",
+        "model": food_classifier.MODEL_PATH,
+        "threads": food_classifier.THREADS or "default",
+        "images": len(images),
+        "preprocess_ms_per_image": round(preprocess_ms / len(images), 2),
+        "batch1_p50_ms": round(_percentile(latencies, 0.5) * 1000, 2),
+        "batch1_p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+        "throughput": throughput,
+        "accuracy": regression["accuracy"],
+        "confident": regression["confident"],
+        "confident_wrong": regression["confident_wrong"],
+    }
+
+
+def bench_llm_replay(args):
+    import httpx
+
+    import cassette
+    import llm
+    import llm_pool
+
+    foods = args.foods.split(",")
+    if args.record:
+        transport = cassette.CassetteTransport(
+            args.cassette, "record", transport=llm_pool.shared_transport() or httpx.HTTPTransport()
+        )
+    else:
+        # 재생에는 Azure 설정이 필요 없다 (.env에 있으면 그 배포 이름으로 녹화된 것을 쓴다)
+        os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "http://cassette.invalid")
+        os.environ.setdefault("AZURE_OPENAI_API_KEY", "replay")
+        os.environ.setdefault("OPENAI_API_VERSION", "2024-06-01")
+        transport = cassette.CassetteTransport(
+            args.cassette,
+            "replay",
+            latency=args.latency,
+            latency_scale=args.latency_scale,
+            timeout_rate=args.timeout_rate,
+            rate_429=args.rate_429,
+            seed=args.seed,
+        )
+        if not transport.stats()["recordings"]:
+            sys.exit(f"No recordings in {args.cassette}: run `python bench.py llm-replay --record` first")
+    cassette.install(transport)
+
+    errors = []
+
+    def analyze(food):
+        try:
+            llm.do(food)
+        except Exception as e:  # 주입한 장애가 재시도/보조 배포로도 해결되지 않은 경우
+            errors.append(type(e).__name__)
+
+    calls = [(food,) for _ in range(args.rounds) for food in foods]
+    result = _timed_calls(analyze, calls, args.concurrency)
+    return {
+        "benchmark": "llm-replay",
+        **result,
+        "errors": len(errors),
+        "error_types": sorted(set(errors)),
+        "cassette": transport.stats(),
+        "routes": llm.route_stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WHIP backend benchmarks")
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    p = sub.add_parser("import", help="bulk import throughput (rows/s)")
+    p.add_argument("--user", required=True, help="existing USER.ID to import for")
+    p.add_argument("--rows", type=int, default=10000)
+    p.add_argument("--per-day", type=int, default=5)
+    p.add_argument("--chunk-size", type=int, default=food_import.IMPORT_CHUNK_ROWS)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--keep", action="store_true", help="keep the imported rows")
+    p.set_defaults(func=bench_import)
+
+    p = sub.add_parser("serialize", help="quarterly payload size and encode time")
+    p.add_argument("--foods-per-day", type=int, default=4)
+    p.add_argument("--repeat", type=int, default=200)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_serialize)
+
+    p = sub.add_parser("memory", help="resident memory: one app vs. separate Flask apps")
+    p.set_defaults(func=bench_memory)
+
+    p = sub.add_parser("llm-pool", help="429 rate and throughput: one deployment vs. pool (fake endpoints)")
+    p.add_argument("--requests", type=int, default=200)
+    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument("--rpm", type=int, default=50, help="request limit of the smaller fake deployment")
+    p.add_argument("--latency-ms", type=float, default=50)
+    p.set_defaults(func=bench_llm_pool)
+
+    p = sub.add_parser("storage", help="same workload against the MySQL and SQLite storage backends")
+    p.add_argument("--backend", choices=["mysql", "sqlite", "both"], default="both")
+    p.add_argument("--users", type=int, default=20)
+    p.add_argument("--days", type=int, default=60)
+    p.add_argument("--foods-per-day", type=int, default=3)
+    p.add_argument("--reads", type=int, default=2000)
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--sqlite-path", help="keep the SQLite database here instead of a temp file")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--keep", action="store_true", help="keep the MySQL bench rows")
+    p.set_defaults(func=bench_storage)
+
+    p = sub.add_parser("classifier", help="ONNX food photo classifier CPU latency and batched throughput")
+    p.add_argument("--dir", default="img", help="regression set (photos + labels.json)")
+    p.add_argument("--batch-sizes", default="1,4,8,16")
+    p.add_argument("--repeat", type=int, default=10)
+    p.set_defaults(func=bench_classifier)
+
+    p = sub.add_parser("llm-replay", help="llm.do latency and error rate against a recorded LLM cassette")
+    p.add_argument("--cassette", default="cassettes/llm.jsonl")
+    p.add_argument("--record", action="store_true", help="call Azure and record instead of replaying")
+    p.add_argument("--foods", default=",".join(BENCH_FOODS))
+    p.add_argument("--rounds", type=int, default=5)
+    p.add_argument("--concurrency", type=int, default=4)
+    p.add_argument("--latency", choices=["recorded", "sampled", "synthetic", "none"], default="recorded")
+    p.add_argument("--latency-scale", type=float, default=1.0)
+    p.add_argument("--timeout-rate", type=float, default=0.0)
+    p.add_argument("--rate-429", type=float, default=0.0)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_llm_replay)
+
+    args = parser.parse_args()
+    print(json.dumps(args.func(args), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# cache.py
+# 프로세스 안에서 blueprint들이 함께 쓰는 TTL 캐시
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = float(os.getenv("CACHE_TTL_SECONDS", "300"))
+DEFAULT_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "10000"))
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (만료 시각, 값), LRU 순서
+        self._lock = threading.Lock()
+        self._epoch = 0  # 삭제가 있을 때마다 증가
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[0] < now:
+                if entry is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def epoch(self):
+        return self._epoch
+
+    def set(self, key, value, ttl=None, epoch=None):
+        # epoch: DB에서 읽기 전에 받아 둔 epoch(). 그 사이 무효화가 있었으면 저장하지 않는다
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if epoch is not None and epoch != self._epoch:
+                return
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._epoch += 1
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        with self._lock:
+            self._epoch += 1
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL):
+    # 같은 이름이면 어느 모듈에서 불러도 같은 캐시를 돌려준다
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = TTLCache(maxsize, ttl)
+        return _caches[name]
+
+
+def stats():
+    with _caches_lock:
+        return {name: c.stats() for name, c in _caches.items()}
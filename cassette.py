@@ -0,0 +1,330 @@
+# cassette.py
+# LLM 호출 녹화/재생용 httpx 트랜스포트. llm.py의 모든 클라이언트(app.do, llm.do, jun.do)가 이걸 거친다.
+#
+#   LLM_CASSETTE_MODE=record   실제 Azure 호출의 요청(프롬프트), 응답, 토큰 수, 지연 시간을 파일에 추가
+#   LLM_CASSETTE_MODE=replay   같은 요청이면 녹화된 응답을 돌려준다 (네트워크, Azure 키 없이)
+#   LLM_CASSETTE_PATH          카세트 파일 (JSON lines, 기본 cassettes/llm.jsonl)
+#
+# 재생할 때 지연 시간 (LLM_CASSETTE_LATENCY)
+#   recorded   녹화된 그 호출의 지연 시간
+#   sampled    같은 배포의 녹화된 지연 시간들 중에서 뽑기 (원래 분포)
+#   synthetic  로그 정규 분포 (중앙값 LLM_CASSETTE_SYNTHETIC_MS, 퍼짐 LLM_CASSETTE_SYNTHETIC_SIGMA)
+#   none       기다리지 않는다
+# LLM_CASSETTE_LATENCY_SCALE로 모든 대기 시간을 늘리거나 줄인다.
+#
+# 장애 주입: LLM_CASSETTE_TIMEOUT_RATE, LLM_CASSETTE_429_RATE (0~1)
+# 무작위 선택은 (LLM_CASSETTE_SEED, 요청, 같은 요청의 몇 번째 호출)로 정해지므로
+# 스레드 순서와 상관없이 같은 실행은 같은 지연/장애를 낸다.
+#
+# 재생 모드에서도 AzureChatOpenAI를 만들려면 AZURE_OPENAI_* 값은 있어야 한다 (아무 값이나).
+#
+#   python cassette.py stats cassettes/llm.jsonl
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+
+import httpx
+
+MODE = os.getenv("LLM_CASSETTE_MODE", "")  # "" | record | replay
+PATH = os.getenv("LLM_CASSETTE_PATH", "cassettes/llm.jsonl")
+LATENCY = os.getenv("LLM_CASSETTE_LATENCY", "recorded")
+LATENCY_SCALE = float(os.getenv("LLM_CASSETTE_LATENCY_SCALE", "1"))
+SYNTHETIC_MS = float(os.getenv("LLM_CASSETTE_SYNTHETIC_MS", "800"))
+SYNTHETIC_SIGMA = float(os.getenv("LLM_CASSETTE_SYNTHETIC_SIGMA", "0.5"))
+TIMEOUT_RATE = float(os.getenv("LLM_CASSETTE_TIMEOUT_RATE", "0"))
+RATE_429 = float(os.getenv("LLM_CASSETTE_429_RATE", "0"))
+SEED = os.getenv("LLM_CASSETTE_SEED", "0")
+MAX_TIMEOUT_WAIT = float(os.getenv("LLM_CASSETTE_MAX_TIMEOUT_WAIT", "30"))  # 주입한 타임아웃은 최대 이만큼 기다린다
+RETRY_AFTER = 1
+
+MODES = ("record", "replay")
+LATENCIES = ("recorded", "sampled", "synthetic", "none")
+KEPT_HEADERS = ("content-type",)  # + x-ratelimit-*
+INLINE_DATA_LIMIT = 256  # 이보다 긴 data: URL(사진)은 파일에 해시만 남긴다
+
+
+def _canonical_body(content):
+    try:
+        return json.loads(content)
+    except (UnicodeDecodeError, ValueError):
+        return None
+
+
+def request_key(request):
+    # 호스트와 api-version은 빼고 배포 경로 + 본문으로 식별한다 (다른 엔드포인트/풀로 녹화해도 재생된다)
+    body = _canonical_body(request.content)
+    payload = json.dumps(body, sort_keys=True, ensure_ascii=False).encode() if body is not None else request.content
+    digest = hashlib.sha256(request.method.encode() + b" " + request.url.path.encode() + b"\n" + payload)
+    return digest.hexdigest()
+
+
+def _redact(value):
+    # 프롬프트는 사람이 읽을 수 있게 남기고, base64 사진은 해시와 크기로 바꾼다
+    if isinstance(value, dict):
+        return {k: _redact(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_redact(v) for v in value]
+    if isinstance(value, str) and value.startswith("data:") and len(value) > INLINE_DATA_LIMIT:
+        head = value.split(",", 1)[0]
+        return f"{head},<sha256:{hashlib.sha256(value.encode()).hexdigest()[:16]} {len(value)} chars>"
+    return value
+
+
+def _kept_headers(headers):
+    return {
+        name: value
+        for name, value in headers.items()
+        if name.lower() in KEPT_HEADERS or name.lower().startswith("x-ratelimit-")
+    }
+
+
+def load(path):
+    entries = []
+    if not os.path.exists(path):
+        return entries
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entries.append(json.loads(line))
+    return entries
+
+
+class CassetteTransport(httpx.BaseTransport):
+    def __init__(
+        self,
+        path=PATH,
+        mode="replay",
+        transport=None,
+        latency=LATENCY,
+        latency_scale=LATENCY_SCALE,
+        timeout_rate=TIMEOUT_RATE,
+        rate_429=RATE_429,
+        seed=SEED,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"cassette mode must be one of {MODES}")
+        if latency not in LATENCIES:
+            raise ValueError(f"cassette latency must be one of {LATENCIES}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self.timeout_rate = timeout_rate
+        self.rate_429 = rate_429
+        self.seed = str(seed)
+        self._transport = transport  # 녹화할 때 실제로 보내는 트랜스포트 (wrap()이 채운다)
+        self._lock = threading.Lock()
+        self._entries = defaultdict(list)  # 요청 키 -> 녹화들 (같은 요청은 차례로 돌려준다)
+        self._latencies = defaultdict(list)  # 경로(배포) -> 녹화된 지연 시간(초)
+        self._calls = defaultdict(int)
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "recorded": 0,
+            "injected_timeouts": 0,
+            "injected_429": 0,
+            "slept_s": 0.0,
+        }
+        if mode == "replay":
+            for entry in load(path):
+                self._add(entry)
+
+    def _add(self, entry):
+        self._entries[entry["key"]].append(entry)
+        self._latencies[entry["path"]].append(entry["latency_ms"] / 1000)
+
+    def _next_call(self, key):
+        with self._lock:
+            n = self._calls[key]
+            self._calls[key] += 1
+            return n
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _sleep(self, seconds):
+        seconds *= self.latency_scale
+        if seconds > 0:
+            time.sleep(seconds)
+            self._count("slept_s", seconds)
+
+    def _delay(self, entry, rng):
+        if self.latency == "recorded":
+            return entry["latency_ms"] / 1000
+        if self.latency == "sampled":
+            return rng.choice(self._latencies[entry["path"]])
+        if self.latency == "synthetic":
+            return rng.lognormvariate(math.log(SYNTHETIC_MS / 1000), SYNTHETIC_SIGMA)
+        return 0.0
+
+    def handle_request(self, request):
+        request.read()
+        key = request_key(request)
+        if self.mode == "record":
+            return self._record(request, key)
+        return self._replay(request, key)
+
+    def _record(self, request, key):
+        started = time.perf_counter()
+        response = self._transport.handle_request(request)
+        try:
+            content = response.read()
+        finally:
+            response.close()
+        latency = time.perf_counter() - started
+
+        # 실패 응답은 녹화하지 않는다 (재생할 때 필요하면 주입한다)
+        if 200 <= response.status_code < 300:
+            body = _canonical_body(content)
+            usage = (body.get("usage") if isinstance(body, dict) else None) or {}
+            entry = {
+                "key": key,
+                "method": request.method,
+                "path": request.url.path,
+                "request": _redact(_canonical_body(request.content)),
+                "status": response.status_code,
+                "headers": _kept_headers(response.headers),
+                "response": body if body is not None else content.decode("utf-8", "replace"),
+                "usage": {
+                    "prompt_tokens": usage.get("prompt_tokens", 0),
+                    "completion_tokens": usage.get("completion_tokens", 0),
+                },
+                "latency_ms": round(latency * 1000, 1),
+                "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            }
+            line = json.dumps(entry, ensure_ascii=False)
+            with self._lock:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+                self._stats["recorded"] += 1
+                self._add(entry)
+
+        # 본문은 이미 풀었으므로 인코딩/길이 헤더는 빼고 돌려준다
+        headers = [
+            (name, value)
+            for name, value in response.headers.multi_items()
+            if name.lower() not in ("content-encoding", "content-length", "transfer-encoding")
+        ]
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    def _replay(self, request, key):
+        n = self._next_call(key)
+        rng = random.Random(f"{self.seed}:{key}:{n}")
+        entries = self._entries.get(key)
+        if not entries:
+            # openai 클라이언트가 재시도하지 않도록 404로 바로 실패시킨다
+            self._count("misses")
+            logging.warning(f"LLM cassette miss {request.method} {request.url.path} ({key[:12]})")
+            return httpx.Response(
+                404,
+                json={"error": {"code": "CassetteMiss", "message": f"no recording for request {key} in {self.path}"}},
+                request=request,
+            )
+        entry = entries[n % len(entries)]
+
+        fault = rng.random()
+        if fault < self.timeout_rate:
+            self._count("injected_timeouts")
+            read_timeout = (request.extensions.get("timeout") or {}).get("read")
+            self._sleep(min(read_timeout or MAX_TIMEOUT_WAIT, MAX_TIMEOUT_WAIT))
+            raise httpx.ReadTimeout("injected by LLM cassette", request=request)
+        if fault < self.timeout_rate + self.rate_429:
+            self._count("injected_429")
+            return httpx.Response(
+                429,
+                headers={"retry-after": str(RETRY_AFTER), "x-ratelimit-remaining-requests": "0"},
+                json={"error": {"code": "429", "message": "Rate limit injected by LLM cassette"}},
+                request=request,
+            )
+
+        self._sleep(self._delay(entry, rng))
+        self._count("hits")
+        body = entry["response"]
+        content = json.dumps(body, ensure_ascii=False).encode() if not isinstance(body, str) else body.encode()
+        return httpx.Response(entry["status"], headers=entry["headers"], content=content, request=request)
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            recordings = sum(len(entries) for entries in self._entries.values())
+        stats["slept_s"] = round(stats["slept_s"], 3)
+        return {"mode": self.mode, "path": self.path, "latency": self.latency, "recordings": recordings, **stats}
+
+
+_installed = None
+_installed_lock = threading.Lock()
+
+
+def install(transport):
+    # 환경 변수 대신 코드에서 켠다 (bench.py). 이후에 만들어지는 LLM 클라이언트부터 적용된다
+    global _installed
+    with _installed_lock:
+        _installed = transport
+
+
+def active():
+    # LLM_CASSETTE_MODE가 없으면 None
+    global _installed
+    with _installed_lock:
+        if _installed is None and MODE:
+            _installed = CassetteTransport(PATH, MODE)
+        return _installed
+
+
+def wrap(transport):
+    # llm.py: 카세트가 꺼져 있으면 받은 트랜스포트(None이면 httpx 기본) 그대로
+    cassette = active()
+    if cassette is None:
+        return transport
+    if cassette.mode == "record" and cassette._transport is None:
+        # 풀(llm_pool)을 쓰면 녹화도 풀을 거친다
+        cassette._transport = transport or httpx.HTTPTransport()
+    return cassette
+
+
+def summarize(entries):
+    # 배포 경로별 호출 수, 지연 시간 분포, 토큰 합계
+    by_path = defaultdict(list)
+    for entry in entries:
+        by_path[entry["path"]].append(entry)
+    summary = {}
+    for path, rows in sorted(by_path.items()):
+        latencies = sorted(row["latency_ms"] for row in rows)
+        summary[path] = {
+            "recordings": len(rows),
+            "distinct_requests": len({row["key"] for row in rows}),
+            "p50_ms": latencies[len(latencies) // 2],
+            "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            "max_ms": latencies[-1],
+            "prompt_tokens": sum(row["usage"]["prompt_tokens"] for row in rows),
+            "completion_tokens": sum(row["usage"]["completion_tokens"] for row in rows),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM record/replay cassettes")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("stats", help="latency and token summary of a cassette")
+    p.add_argument("path", nargs="?", default=PATH)
+    args = parser.parse_args()
+
+    print(json.dumps(summarize(load(args.path)), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+# db.py
+# 모든 blueprint와 배치 스크립트가 함께 쓰는 DB 설정과 pymysql 커넥션 풀
+#
+# 읽기 복제본: DB_REPLICA_HOSTS="replica1,replica2:3307" (계정/DB 이름은 기본 DB와 같다)
+#   get_read_connection(user_id)는 복제 지연이 DB_REPLICA_MAX_LAG초 이하인 복제본을 쓰고,
+#   mark_write(user_id) 뒤 DB_PRIMARY_PIN_SECONDS초 동안은 그 사용자의 읽기를 기본 DB로 보낸다.
+#   지연은 SHOW REPLICA STATUS로 잰다 (REPLICATION CLIENT 권한 필요).
+
+import logging
+import os
+import queue
+import random
+import threading
+import time
+
+import pymysql
+import pymysql.cursors
+from dotenv import load_dotenv
+
+load_dotenv()
+
+db_config = {
+    "host": os.getenv("DB_HOST"),
+    "database": os.getenv("DB_NAME"),
+    "user": os.getenv("DB_USER"),
+    "password": os.getenv("DB_PASSWORD"),
+}
+
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+REPLICA_HOSTS = [host.strip() for host in os.getenv("DB_REPLICA_HOSTS", "").split(",") if host.strip()]
+REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+PRIMARY_PIN_SECONDS = float(os.getenv("DB_PRIMARY_PIN_SECONDS", "5"))
+LAG_CHECK_SECONDS = 2.0
+
+
+def connect(**kwargs):
+    # 풀을 거치지 않는 전용 커넥션 (SSCursor 스트리밍, 배치 작업 등)
+    return pymysql.connect(**{**db_config, **kwargs})
+
+
+class PooledConnection:
+    # close()가 실제로 끊지 않고 풀에 돌려준다. 나머지는 pymysql 커넥션과 같다
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def close(self):
+        if self._connection is not None:
+            self._pool.release(self._connection)
+            self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    def __init__(self, size=POOL_SIZE, timeout=POOL_TIMEOUT, **connect_kwargs):
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._timeout = timeout
+        self._connect_kwargs = connect_kwargs
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self._timeout):
+            raise pymysql.err.OperationalError(2013, "Connection pool exhausted")
+        try:
+            try:
+                connection = self._idle.get_nowait()
+                connection.ping(reconnect=True)
+            except queue.Empty:
+                connection = connect(**self._connect_kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        return PooledConnection(self, connection)
+
+    def release(self, connection):
+        try:
+            connection.rollback()  # 커밋하지 않은 트랜잭션은 버린다
+            self._idle.put_nowait(connection)
+        except pymysql.MySQLError:
+            connection.close()
+        finally:
+            self._slots.release()
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    # fork된 워커 프로세스(batch.py 등)는 부모의 소켓을 공유하지 않도록 새 풀을 만든다
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ConnectionPool()
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def get_connection():
+    return get_pool().acquire()
+
+
+def create_db_connection():
+    # 기존 라우트와 같이 실패하면 None을 돌려준다
+    try:
+        return get_connection()
+    except pymysql.MySQLError as e:
+        print(f"Error connecting to MySQL database: {e}")
+        return None
+
+
+class Replica:
+    def __init__(self, host):
+        name, _, port = host.partition(":")
+        self.host = host
+        self.pool = ConnectionPool(host=name, **({"port": int(port)} if port else {}))
+        self.lag = None  # 초, 잴 수 없거나 복제가 멈추면 None
+        self.checked_at = None
+
+    def healthy(self):
+        return self.lag is not None and self.lag <= REPLICA_MAX_LAG
+
+    def measure(self):
+        connection = self.pool.acquire()
+        try:
+            with connection.cursor() as cursor:
+                try:
+                    cursor.execute("SHOW REPLICA STATUS")
+                except pymysql.MySQLError:
+                    cursor.execute("SHOW SLAVE STATUS")  # MySQL 8.0.22 이전
+                row = cursor.fetchone()
+                columns = [column[0] for column in cursor.description or ()]
+        finally:
+            connection.close()
+        if row is None:
+            self.lag = None  # 복제본이 아니다
+        else:
+            status = dict(zip(columns, row))
+            lag = status.get("Seconds_Behind_Source", status.get("Seconds_Behind_Master"))
+            self.lag = float(lag) if lag is not None else None
+        self.checked_at = time.time()
+
+
+_replicas = None
+_replicas_pid = None
+_last_write = {}  # 사용자 ID -> 마지막 쓰기 시각 (monotonic)
+_last_write_lock = threading.Lock()
+
+
+def _monitor_lag(replicas):
+    while True:
+        for replica in replicas:
+            try:
+                replica.measure()
+            except pymysql.MySQLError as e:
+                replica.lag = None
+                logging.warning(f"Replica {replica.host} lag check failed: {e}")
+        time.sleep(LAG_CHECK_SECONDS)
+
+
+def get_replicas():
+    global _replicas, _replicas_pid
+    with _pool_lock:
+        if _replicas is None or _replicas_pid != os.getpid():
+            _replicas = [Replica(host) for host in REPLICA_HOSTS]
+            _replicas_pid = os.getpid()
+            if _replicas:
+                threading.Thread(
+                    target=_monitor_lag, args=(_replicas,), name="replica-lag", daemon=True
+                ).start()
+        return _replicas
+
+
+def mark_write(user_id):
+    # 이 사용자의 읽기는 잠시 기본 DB에서 한다 (자기가 쓴 것을 바로 보도록)
+    if not REPLICA_HOSTS or user_id is None:
+        return
+    now = time.monotonic()
+    with _last_write_lock:
+        _last_write[str(user_id)] = now
+        if len(_last_write) > 10000:
+            for key in [k for k, t in _last_write.items() if now - t > PRIMARY_PIN_SECONDS]:
+                del _last_write[key]
+
+
+def _pinned(user_id):
+    if user_id is None:
+        return False
+    with _last_write_lock:
+        written = _last_write.get(str(user_id))
+    return written is not None and time.monotonic() - written < PRIMARY_PIN_SECONDS
+
+
+def get_read_connection(user_id=None):
+    # 읽기 전용 조회용. 쓸 만한 복제본이 없으면 기본 DB
+    if not REPLICA_HOSTS or _pinned(user_id):
+        return get_connection()
+    candidates = [replica for replica in get_replicas() if replica.healthy()]
+    if not candidates:
+        return get_connection()
+    replica = random.choice(candidates)
+    try:
+        return replica.pool.acquire()
+    except pymysql.MySQLError as e:
+        replica.lag = None
+        logging.warning(f"Replica {replica.host} unavailable: {e}")
+        return get_connection()
+
+
+def create_db_read_connection(user_id=None):
+    try:
+        return get_read_connection(user_id)
+    except pymysql.MySQLError as e:
+        print(f"Error connecting to MySQL database: {e}")
+        return None
+
+
+def replica_stats():
+    return {
+        replica.host: {
+            "lag_seconds": replica.lag,
+            "healthy": replica.healthy(),
+            "checked_at": replica.checked_at,
+        }
+        for replica in get_replicas()
+    }
@@ -1,95 +1,85 @@
 #날짜에 따른 총섭취량, 개별 음식 영양성분 return
-from flask import Flask, request, jsonify
-import mysql.connector
-from mysql.connector import Error
-from dotenv import load_dotenv
-import os
-
-#환경변수 load
-load_dotenv()
-app = Flask(__name__)
-
-db_host = os.getenv('DB_HOST')
-db_name = os.getenv('DB_NAME')
-db_user = os.getenv('DB_USER')
-db_password = os.getenv('DB_PASSWORD')
-
-# 데이터베이스 연결 설정
-def create_db_connection():
-    try:
-        connection = mysql.connector.connect(
-            host=db_host,
-            database=db_name,
-            user=db_user,
-            password=db_password
-        )
-        return connection
-    except Error as e:
-        print(f"데이터베이스 연결 오류: {e}")
-        return None
+from flask import Blueprint, request, jsonify
+from datetime import date as date_type, datetime
+
+import cache
+import storage
+import write_behind
+from db import mark_write
+
+bp = Blueprint("detail", __name__)
+
+# (사용자 ID, "YYYY-MM-DD") -> 하루 응답. FOOD를 쓰는 곳에서 invalidate()로 지운다
+day_cache = cache.get_cache("day")
+
+
+def _day_key(user_id, food_date):
+    if isinstance(food_date, (date_type, datetime)):
+        food_date = food_date.strftime("%Y-%m-%d")
+    return (str(user_id), str(food_date)[:10])
+
+
+def invalidate(user_id, food_date):
+    # FOOD를 쓴 직후에 불린다: 이 사용자의 읽기는 잠시 복제본 대신 기본 DB에서 한다
+    mark_write(user_id)
+    day_cache.delete(_day_key(user_id, food_date))
+
+
+def invalidate_range(user_id, start, end):
+    start_key = _day_key(user_id, start)[1]
+    end_key = _day_key(user_id, end)[1]
+    mark_write(user_id)
+    user_id = str(user_id)
+    day_cache.delete_where(
+        lambda key: key[0] == user_id and start_key <= key[1] <= end_key
+    )
+
+
+def load_day(connection, user_id, date):
+    # 이미 열린 MySQL 커넥션으로 하루를 읽는다 (sync.py처럼 쓴 직후 같은 커넥션에서)
+    with connection.cursor() as cursor:
+        totals, food_rows = storage.load_day(cursor, user_id, date)
+        food_rows = storage.with_archived(cursor, user_id, date, food_rows)
+    return storage.day_result(user_id, date, totals, food_rows)
+
+
+def _day(user_id, key):
+    user_data = day_cache.get(key)
+    if user_data is not None:
+        return user_data
+
+    epoch = day_cache.epoch()
+    user_data = storage.get_storage().day(user_id, key[1])
+
+    if user_data is not None:
+        day_cache.set(key, user_data, epoch=epoch)
+    return user_data
 
 
 #REQUEST 객체에 ID, DATE 넘겨주세요
-@app.route('/api/calendar', methods=['GET'])
+@bp.route('/api/calendar', methods=['GET'])
 def get_calendar_data():
     user_id = request.args.get('ID')
     date = request.args.get('DATE')
-    connection = create_db_connection()
 
-    if connection is None:
-        return jsonify({"error": "데이터베이스 연결 실패"}), 500
+    if not user_id or not date:
+        return jsonify({"error": "필수 정보가 누락되었습니다."}), 400
 
+    key = _day_key(user_id, date)
     try:
-        cursor = connection.cursor(dictionary=True)
-        query = """
-        SELECT un.DATE,un.CARBO, un.PROTEIN, un.FAT, un.KCAL,
-               f.FOOD_INDEX, f.FOOD_NAME, f.FOOD_PT, f.FOOD_FAT, f.FOOD_CH
-        FROM USER u
-        JOIN USER_NT un ON u.ID = un.ID
-        LEFT JOIN FOOD f ON u.ID = f.ID AND un.DATE = f.DATE
-        WHERE u.ID = %s AND un.DATE = %s
-        ORDER BY f.FOOD_INDEX
-        """
-        cursor.execute(query, (user_id, date))
-        #fetchall()은 쿼리의 결과를 가져오는 method
-        results = cursor.fetchall()
-
-        if not results:
-            return jsonify({"message": "데이터가 없습니다."}), 404
-
-        # 결과 데이터 구조화
-        user_data = {
-            "id": results[0]['ID'],
-            "body_weight": results[0]['BODY_WEIGHT'],
-            "height": results[0]['HEIGHT'],
-            "nutrition": {
-                "carbo": results[0]['CARBO'],
-                "protein": results[0]['PROTEIN'],
-                "fat": results[0]['FAT'],
-                "kcal": results[0]['KCAL']
-            },
-            "foods": []
-        }
-
-        for row in results:
-            if row['FOOD_INDEX'] is not None:
-                user_data['foods'].append({
-                    "food_index": row['FOOD_INDEX'],
-                    "food_name": row['FOOD_NAME'],
-                    "food_pt": row['FOOD_PT'],
-                    "food_fat": row['FOOD_FAT'],
-                    "food_ch": row['FOOD_CH']
-                })
-
-        return jsonify(user_data), 200
-
-    except Error as e:
+        if write_behind.ENABLED:
+            # 아직 MySQL로 옮기지 않은 /api/send2 기록도 보여준다
+            start, end = write_behind.day_bounds(key[1])
+            user_data, pending = write_behind.read_with_pending(
+                user_id, start, end, lambda: _day(user_id, key)
+            )
+            user_data = write_behind.overlay_day(user_data, user_id, key[1], pending)
+        else:
+            user_data = _day(user_id, key)
+    except storage.DatabaseError as e:
         return jsonify({"error": str(e)}), 500
 
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
+    if user_data is None:
+        return jsonify({"message": "데이터가 없습니다."}), 404
 
-if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    return jsonify(user_data), 200
@@ -0,0 +1,118 @@
+# fake_azure.py
+# 로컬 테스트용 가짜 Azure OpenAI chat completions 엔드포인트.
+# 분당 요청 한도를 흉내 내어 x-ratelimit-* 헤더를 돌려주고, 한도를 넘으면 429 + Retry-After.
+#
+#   python fake_azure.py --port 8101 --rpm 60 --latency-ms 200
+#   python fake_azure.py --port 8102 --rpm 600 --latency-ms 50
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WINDOW_SECONDS = 60
+
+
+class RateLimiter:
+    def __init__(self, rpm):
+        self.rpm = rpm
+        self._calls = []
+        self._lock = threading.Lock()
+
+    def take(self):
+        # (허용 여부, 남은 요청 수, 다시 시도할 때까지 초)
+        now = time.monotonic()
+        with self._lock:
+            self._calls = [t for t in self._calls if now - t < WINDOW_SECONDS]
+            if len(self._calls) >= self.rpm:
+                return False, 0, WINDOW_SECONDS - (now - self._calls[0])
+            self._calls.append(now)
+            return True, self.rpm - len(self._calls), 0
+
+
+def make_handler(limiter, latency, name):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            allowed, remaining, retry_after = limiter.take()
+            headers = {
+                "x-ratelimit-limit-requests": str(limiter.rpm),
+                "x-ratelimit-remaining-requests": str(remaining),
+                "x-ms-region": name,
+            }
+            if not allowed:
+                headers["retry-after"] = str(max(1, round(retry_after)))
+                self._send(429, {"error": {"code": "429", "message": "Rate limit exceeded"}}, headers)
+                return
+
+            time.sleep(latency)
+            request = json.loads(body or b"{}")
+            content = json.dumps(
+                {"food_name": "테스트", "calorie": "100", "carbohydrate": "10",
+                 "protein": "5", "fat": "3"},
+                ensure_ascii=False,
+            )
+            self._send(
+                200,
+                {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model") or "fake",
+                    "choices": [
+                        {
+                            "index": 0,
+                            "finish_reason": "stop",
+                            "message": {"role": "assistant", "content": content},
+                        }
+                    ],
+                    "usage": {"prompt_tokens": 50, "completion_tokens": 20, "total_tokens": 70},
+                },
+                headers,
+            )
+
+        def _send(self, status, payload, headers):
+            data = json.dumps(payload, ensure_ascii=False).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def serve(port, rpm, latency_ms, name=None):
+    # 백그라운드 스레드에서 띄우고 서버를 돌려준다 (bench.py에서 사용)
+    limiter = RateLimiter(rpm)
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", port), make_handler(limiter, latency_ms / 1000, name or f"fake-{port}")
+    )
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Azure OpenAI endpoint")
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--rpm", type=int, default=60)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    args = parser.parse_args()
+
+    server = serve(args.port, args.rpm, args.latency_ms)
+    print(f"Fake Azure OpenAI on http://127.0.0.1:{args.port} ({args.rpm} rpm)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
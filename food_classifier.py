@@ -0,0 +1,332 @@
+# food_classifier.py
+# 비전 LLM 앞의 로컬 음식 사진 분류기: CLIP 이미지 인코더(ONNX)를 onnxruntime으로 CPU에서 돌리고,
+# 미리 계산해 둔 음식 이름 텍스트 임베딩과의 유사도로 라벨과 확신도를 낸다 (zero-shot).
+# FOOD_CLASSIFIER_ENABLED=1 이고 예측을 믿을 수 있으면(trusted) jun.py가 Azure 비전 모델을 부르지 않는다.
+# 소프트맥스 확신도는 라벨 목록 안에서의 상대값이라 목록에 없는 음식/사진에도 높게 나올 수 있으므로,
+# 1, 2등 차이(margin)와 이미지-텍스트 코사인 유사도의 절대 하한도 함께 본다.
+# 실제 가중치로 regress를 통과시키기 전까지는 기본으로 꺼 둔다.
+#
+#   python food_classifier.py export              # requirements-onnx.txt 환경에서 모델 내보내기
+#   python food_classifier.py regress             # img/ 회귀 세트 정확도 (labels.json의 null은 목록 밖 사진)
+#   python food_classifier.py predict img/pizza.jpeg
+#
+# 실행에는 onnxruntime, numpy, pillow만 필요하다 (requirements-mini.txt).
+# onnxruntime이나 모델 파일이 없으면 분류기는 꺼지고 모든 사진이 비전 모델로 간다.
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+try:
+    import onnxruntime
+except ImportError:  # onnxruntime이 없으면 비전 모델만 사용
+    onnxruntime = None
+
+MODEL_PATH = os.getenv("FOOD_CLASSIFIER_MODEL", "models/food_clip.onnx")
+LABELS_PATH = os.getenv("FOOD_CLASSIFIER_LABELS", "models/food_clip.labels.npz")
+ENABLED = os.getenv("FOOD_CLASSIFIER_ENABLED", "0") == "1"
+THRESHOLD = float(os.getenv("FOOD_CLASSIFIER_THRESHOLD", "0.6"))
+MIN_MARGIN = float(os.getenv("FOOD_CLASSIFIER_MIN_MARGIN", "0.3"))
+MIN_SIMILARITY = float(os.getenv("FOOD_CLASSIFIER_MIN_SIMILARITY", "0.25"))  # CLIP 코사인 유사도
+THREADS = int(os.getenv("FOOD_CLASSIFIER_THREADS", "0"))  # 0: onnxruntime 기본값
+REGRESSION_DIR = "img"
+REGRESSION_MIN_ACCURACY = 0.8
+
+EXPORT_MODEL = "ViT-B-32"
+EXPORT_PRETRAINED = "laion2b_s34b_b79k"
+PROMPTS = ["a photo of {}, a type of food.", "a close-up photo of {}.", "{}"]
+
+# 라벨(응답에 쓰는 한글 음식 이름) -> CLIP 텍스트 프롬프트에 넣을 영어 이름
+FOOD_LABELS = {
+    "치킨": "fried chicken",
+    "초콜릿": "chocolate",
+    "콜라": "a glass of cola",
+    "계란프라이": "a fried egg",
+    "햄버거": "a hamburger",
+    "김치": "kimchi",
+    "파스타": "pasta",
+    "피자": "pizza",
+    "샐러드": "salad",
+    "김밥": "gimbap, korean seaweed rice roll",
+    "라면": "ramen noodle soup",
+    "떡볶이": "tteokbokki, spicy korean rice cakes",
+    "비빔밥": "bibimbap",
+    "불고기": "bulgogi",
+    "삼겹살": "grilled pork belly",
+    "김치찌개": "kimchi stew",
+    "된장찌개": "doenjang soybean paste stew",
+    "냉면": "naengmyeon, korean cold noodles",
+    "짜장면": "jjajangmyeon, black bean noodles",
+    "짬뽕": "jjamppong, spicy seafood noodle soup",
+    "돈까스": "tonkatsu, breaded pork cutlet",
+    "초밥": "sushi",
+    "샌드위치": "a sandwich",
+    "바나나": "a banana",
+    "사과": "an apple",
+    "케이크": "a slice of cake",
+    "아이스크림": "ice cream",
+    "커피": "a cup of coffee",
+}
+
+
+class FoodClassifier:
+    def __init__(self, model_path=MODEL_PATH, labels_path=LABELS_PATH, threads=THREADS):
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+        meta = np.load(labels_path)
+        self.labels = [str(label) for label in meta["labels"]]
+        self.text_embeddings = meta["text_embeddings"].astype(np.float32)  # (라벨 수, 차원), 정규화됨
+        self.logit_scale = float(meta["logit_scale"])
+        self.image_size = int(meta["image_size"])
+        self.mean = meta["mean"].astype(np.float32).reshape(3, 1, 1)
+        self.std = meta["std"].astype(np.float32).reshape(3, 1, 1)
+
+    def preprocess(self, image):
+        # open_clip 전처리와 같게: 짧은 변을 image_size로 (bicubic), 가운데 자르기, 정규화. (3, H, W)
+        if not isinstance(image, Image.Image):
+            image = Image.open(image)
+        image = image.convert("RGB")
+        width, height = image.size
+        scale = self.image_size / min(width, height)
+        resized = (
+            max(self.image_size, round(width * scale)),
+            max(self.image_size, round(height * scale)),
+        )
+        image = image.resize(resized, Image.BICUBIC)
+        left = (resized[0] - self.image_size) // 2
+        top = (resized[1] - self.image_size) // 2
+        image = image.crop((left, top, left + self.image_size, top + self.image_size))
+        pixels = np.asarray(image, dtype=np.float32).transpose(2, 0, 1) / 255.0
+        return (pixels - self.mean) / self.std
+
+    def embed(self, batch):
+        # batch: (N, 3, H, W) -> 정규화된 이미지 임베딩 (N, 차원)
+        features = self.session.run(None, {self.input_name: batch})[0]
+        return features / np.linalg.norm(features, axis=1, keepdims=True)
+
+    def classify(self, images):
+        # 사진 여러 장을 한 번에 추론한다. [{"label", "confidence", "margin", "similarity"}]
+        if not images:
+            return []
+        batch = np.stack([self.preprocess(image) for image in images])
+        similarities = self.embed(batch) @ self.text_embeddings.T
+        logits = self.logit_scale * similarities
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        top = np.argsort(-probabilities, axis=1)[:, :2]
+        results = []
+        for row, similarity, (first, second) in zip(probabilities, similarities, top):
+            results.append(
+                {
+                    "label": self.labels[first],
+                    "confidence": round(float(row[first]), 4),
+                    "margin": round(float(row[first] - row[second]), 4),
+                    "similarity": round(float(similarity[first]), 4),
+                }
+            )
+        return results
+
+
+_classifier = None
+_classifier_lock = threading.Lock()
+_stats = {"local": 0, "fallback": 0}
+
+
+def trusted(prediction):
+    # 비전 모델을 건너뛰어도 되는 예측인지
+    return (
+        prediction["confidence"] >= THRESHOLD
+        and prediction["margin"] >= MIN_MARGIN
+        and prediction["similarity"] >= MIN_SIMILARITY
+    )
+
+
+def get_classifier():
+    # 꺼져 있거나 모델을 쓸 수 없으면 None
+    if not ENABLED:
+        return None
+    return load_classifier()
+
+
+def load_classifier():
+    # 모델을 쓸 수 없으면 None (한 번만 확인한다). regress/predict는 꺼져 있어도 이것으로 불러온다
+    global _classifier
+    with _classifier_lock:
+        if _classifier is None:
+            if onnxruntime is None or not os.path.exists(MODEL_PATH) or not os.path.exists(LABELS_PATH):
+                _classifier = False
+            else:
+                try:
+                    _classifier = FoodClassifier()
+                except Exception as e:  # 깨진 모델 파일 등
+                    logging.error(f"Food classifier unavailable: {e}")
+                    _classifier = False
+        return _classifier or None
+
+
+def confident_labels(images):
+    # 사진마다 확신할 수 있으면 음식 이름, 아니면 None (비전 모델로 넘긴다). 한 배치로 추론한다
+    classifier = get_classifier()
+    if classifier is None:
+        return [None] * len(images)
+    labels = [
+        prediction["label"] if trusted(prediction) else None
+        for prediction in classifier.classify(images)
+    ]
+    with _classifier_lock:
+        _stats["local"] += sum(1 for label in labels if label is not None)
+        _stats["fallback"] += sum(1 for label in labels if label is None)
+    return labels
+
+
+def confident_label(image):
+    return confident_labels([image])[0]
+
+
+def stats():
+    return {
+        "enabled": get_classifier() is not None,
+        "threshold": THRESHOLD,
+        "min_margin": MIN_MARGIN,
+        "min_similarity": MIN_SIMILARITY,
+        **_stats,
+    }
+
+
+def regression_set(directory=REGRESSION_DIR):
+    # [(사진 경로, 정답 라벨)]. 정답은 directory/labels.json, null은 라벨 목록 밖의 사진
+    # (목록에 없는 음식, 음식이 아닌 사진): 믿을 수 있는 예측이 나오면 안 된다
+    with open(os.path.join(directory, "labels.json"), encoding="utf-8") as f:
+        expected = json.load(f)
+    return [(os.path.join(directory, name), label) for name, label in sorted(expected.items())]
+
+
+def regress(classifier, directory=REGRESSION_DIR):
+    cases = regression_set(directory)
+    predictions = classifier.classify([path for path, _ in cases])
+    rows = [
+        {"image": path, "expected": label, **prediction}
+        for (path, label), prediction in zip(cases, predictions)
+    ]
+    for row in rows:
+        row["trusted"] = trusted(row)
+    known = [row for row in rows if row["expected"] is not None]
+    correct = sum(1 for row in known if row["label"] == row["expected"])
+    confident = [row for row in rows if row["trusted"]]
+    return {
+        "images": len(rows),
+        "out_of_vocabulary": len(rows) - len(known),
+        "accuracy": round(correct / len(known), 3) if known else None,
+        # 비전 모델을 건너뛰는 사진과 그중 틀린 것 (목록 밖 사진 포함, 틀리면 잘못된 음식이 기록된다)
+        "confident": len(confident),
+        "confident_wrong": sum(1 for row in confident if row["label"] != row["expected"]),
+        "results": rows,
+    }
+
+
+def export(
+    model_name=EXPORT_MODEL, pretrained=EXPORT_PRETRAINED, model_path=MODEL_PATH, labels_path=LABELS_PATH
+):
+    # open_clip 모델의 이미지 인코더를 ONNX로, 라벨 텍스트 임베딩은 npz로 저장한다
+    import open_clip
+    import torch
+
+    model, _, _ = open_clip.create_model_and_transforms(model_name, pretrained=pretrained)
+    model.eval()
+    tokenizer = open_clip.get_tokenizer(model_name)
+    image_size = model.visual.image_size
+    image_size = image_size[0] if isinstance(image_size, (tuple, list)) else image_size
+
+    with torch.no_grad():
+        embeddings = []
+        for name in FOOD_LABELS.values():
+            text = model.encode_text(tokenizer([prompt.format(name) for prompt in PROMPTS]))
+            text = text / text.norm(dim=-1, keepdim=True)
+            mean = text.mean(dim=0)
+            embeddings.append(mean / mean.norm())
+        text_embeddings = torch.stack(embeddings).numpy()
+
+        class ImageEncoder(torch.nn.Module):
+            def __init__(self, clip):
+                super().__init__()
+                self.clip = clip
+
+            def forward(self, pixels):
+                return self.clip.encode_image(pixels)
+
+        os.makedirs(os.path.dirname(model_path) or ".", exist_ok=True)
+        torch.onnx.export(
+            ImageEncoder(model),
+            torch.randn(1, 3, image_size, image_size),
+            model_path,
+            input_names=["pixels"],
+            output_names=["embedding"],
+            dynamic_axes={"pixels": {0: "batch"}, "embedding": {0: "batch"}},
+            opset_version=17,
+        )
+
+    mean = getattr(model.visual, "image_mean", None) or open_clip.OPENAI_DATASET_MEAN
+    std = getattr(model.visual, "image_std", None) or open_clip.OPENAI_DATASET_STD
+    np.savez(
+        labels_path,
+        labels=np.array(list(FOOD_LABELS)),
+        text_embeddings=text_embeddings,
+        logit_scale=np.float32(model.logit_scale.exp().item()),
+        image_size=np.int32(image_size),
+        mean=np.array(mean, dtype=np.float32),
+        std=np.array(std, dtype=np.float32),
+    )
+    return model_path, labels_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local food photo classifier")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("export", help="export an open_clip model to ONNX (needs requirements-onnx.txt)")
+    p.add_argument("--model", default=EXPORT_MODEL)
+    p.add_argument("--pretrained", default=EXPORT_PRETRAINED)
+    p = sub.add_parser("regress", help="accuracy on the img/ regression set")
+    p.add_argument("--dir", default=REGRESSION_DIR)
+    p.add_argument("--min-accuracy", type=float, default=REGRESSION_MIN_ACCURACY)
+    p = sub.add_parser("predict", help="classify photos")
+    p.add_argument("images", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        started = time.perf_counter()
+        paths = export(args.model, args.pretrained)
+        print(f"Exported {', '.join(paths)} in {time.perf_counter() - started:.1f}s")
+        return
+
+    classifier = load_classifier()
+    if classifier is None:
+        sys.exit(f"Classifier unavailable: need onnxruntime, {MODEL_PATH} and {LABELS_PATH}")
+
+    if args.command == "predict":
+        for path, prediction in zip(args.images, classifier.classify(args.images)):
+            print(json.dumps({"image": path, **prediction}, ensure_ascii=False))
+        return
+
+    result = regress(classifier, args.dir)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if (result["accuracy"] or 0) < args.min_accuracy or result["confident_wrong"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
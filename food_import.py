@@ -0,0 +1,290 @@
+# food_import.py
+# 다른 식단 앱에서 옮겨오는 식단 기록을 LLM 호출 없이 대량으로 FOOD 테이블에 넣는다.
+#
+#   python food_import.py --user admin2 history.csv
+#   python food_import.py --user admin2 --format json history.json
+
+import argparse
+import csv
+import io
+import json
+import logging
+import time
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+import pymysql
+
+import archive
+import detail
+import quick_add
+import summaries
+from db import get_connection
+
+IMPORT_CHUNK_ROWS = 1000  # 한 트랜잭션에 넣는 최대 행 수
+MAX_REPORTED_ERRORS = 100
+
+# 입력 파일에서 허용하는 컬럼 이름 (/api/food/range 내보내기 형식과 LLM 출력 형식 모두)
+FIELD_ALIASES = {
+    "date": ("date", "DATE"),
+    "food_name": ("food_name", "FOOD_NAME"),
+    "calories": ("calories", "calorie", "kcal", "FOOD_KCAL"),
+    "carbohydrates": ("carbohydrates", "carbohydrate", "FOOD_CH"),
+    "protein": ("protein", "FOOD_PT"),
+    "fat": ("fat", "FOOD_FAT"),
+}
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def parse_records(stream, fmt):
+    # stream은 텍스트 스트림, 한 행씩 dict로 돌려준다
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+    elif fmt == "ndjson":
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    elif fmt == "json":
+        data = json.load(stream)
+        if not isinstance(data, list):
+            raise ValueError("JSON input must be an array of records")
+        yield from data
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+def _field(record, name):
+    for alias in FIELD_ALIASES[name]:
+        value = record.get(alias)
+        if value not in (None, ""):
+            return value
+    raise ImportRowError(f"missing {name}")
+
+
+def _macro(record, name):
+    value = _field(record, name)
+    try:
+        amount = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ImportRowError(f"{name} is not a number: {value!r}")
+    if amount < 0 or not amount.is_finite():
+        raise ImportRowError(f"{name} must be a non-negative number")
+    return amount
+
+
+def validate_record(record):
+    if not isinstance(record, dict):
+        raise ImportRowError("record must be an object")
+    raw_date = str(_field(record, "date"))
+    try:
+        food_date = datetime.strptime(raw_date[:10], "%Y-%m-%d").date()
+    except ValueError:
+        raise ImportRowError(f"invalid date: {raw_date!r}")
+    food_name = str(_field(record, "food_name")).strip()
+    if not food_name:
+        raise ImportRowError("missing food_name")
+    return (
+        food_date,
+        food_name,
+        _macro(record, "carbohydrates"),
+        _macro(record, "protein"),
+        _macro(record, "fat"),
+        _macro(record, "calories"),
+    )
+
+
+def _chunks(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _next_indexes(cursor, user_id, dates):
+    # 청크의 날짜별 MAX(FOOD_INDEX) + 1을 한 번의 쿼리로 가져온다. foods.next_food_index처럼 FOR UPDATE로
+    # 청크를 커밋할 때까지 잠그고, 커밋하면 잠금이 풀리므로 청크마다 새로 읽는다 (그 사이 다른 추가와 겹치지 않게)
+    days = sorted(dates)
+    placeholders = ", ".join(["%s"] * len(days))
+    cursor.execute(
+        f"""
+        SELECT DATE, MAX(FOOD_INDEX) FROM FOOD
+        WHERE ID = %s AND DATE IN ({placeholders})
+        GROUP BY DATE
+        FOR UPDATE
+        """,
+        (user_id, *days),
+    )
+    next_index = {day: 0 for day in days}
+    for day, max_index in cursor.fetchall():
+        if max_index is not None:
+            next_index[day] = max_index + 1
+    # archive.py가 옮긴 달은 파일에 남은 번호 다음부터
+    months = archive.archived_months(cursor)
+    for day in days:
+        if (day.year, day.month) in months:
+            archived = archive.max_food_index(cursor, user_id, day)
+            if archived is not None:
+                next_index[day] = max(next_index[day], archived + 1)
+    return next_index
+
+
+def rebuild_daily_totals(connection, user_id, start, end):
+    # USER_NT의 하루 합계를 FOOD 기준으로 다시 계산한다 (기간 전체를 한 번에)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE USER_NT un
+            JOIN (
+                SELECT DATE AS DAY, SUM(FOOD_CH) AS CARBO, SUM(FOOD_PT) AS PROTEIN,
+                       SUM(FOOD_FAT) AS FAT, SUM(FOOD_KCAL) AS KCAL
+                FROM FOOD
+                WHERE ID = %s AND DATE >= %s AND DATE < %s + INTERVAL 1 DAY
+                GROUP BY DATE
+            ) f ON un.DATE = f.DAY
+            SET un.CARBO = f.CARBO, un.PROTEIN = f.PROTEIN, un.FAT = f.FAT, un.KCAL = f.KCAL
+            WHERE un.ID = %s
+            """,
+            (user_id, start, end, user_id),
+        )
+        # 합계 행이 없는 날짜는 사용자의 가장 최근 권장량으로 새로 만든다.
+        # USER_NT 행이 하나도 없는 사용자(첫 가져오기)는 권장량을 NULL로 두고 합계만 만든다
+        cursor.execute(
+            """
+            INSERT INTO USER_NT (ID, DATE, CARBO, PROTEIN, FAT, KCAL, RD_CARBO, RD_PROTEIN, RD_FAT)
+            SELECT %s, f.DAY, f.CARBO, f.PROTEIN, f.FAT, f.KCAL, rd.RD_CARBO, rd.RD_PROTEIN, rd.RD_FAT
+            FROM (
+                SELECT DATE AS DAY, SUM(FOOD_CH) AS CARBO, SUM(FOOD_PT) AS PROTEIN,
+                       SUM(FOOD_FAT) AS FAT, SUM(FOOD_KCAL) AS KCAL
+                FROM FOOD
+                WHERE ID = %s AND DATE >= %s AND DATE < %s + INTERVAL 1 DAY
+                GROUP BY DATE
+            ) f
+            LEFT JOIN (
+                SELECT RD_CARBO, RD_PROTEIN, RD_FAT FROM USER_NT
+                WHERE ID = %s ORDER BY DATE DESC LIMIT 1
+            ) rd ON TRUE
+            LEFT JOIN USER_NT un ON un.ID = %s AND un.DATE = f.DAY
+            WHERE un.ID IS NULL
+            """,
+            (user_id, user_id, start, end, user_id, user_id),
+        )
+        summaries.invalidate_range(cursor, user_id, start, end)
+    connection.commit()
+    detail.invalidate_range(user_id, start, end)
+    quick_add.invalidate(user_id)
+
+
+def import_records(user_id, records, chunk_size=IMPORT_CHUNK_ROWS, connection=None):
+    started = time.perf_counter()
+    own_connection = connection is None
+    if own_connection:
+        connection = get_connection()
+
+    insert_query = """
+        INSERT INTO FOOD (ID, DATE, FOOD_INDEX, FOOD_NAME, FOOD_CH, FOOD_PT, FOOD_FAT, FOOD_KCAL)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """
+    inserted = 0
+    rejected = 0
+    errors = []
+    first_date = last_date = None
+    row_number = 0
+
+    try:
+        for chunk in _chunks(records, chunk_size):
+            valid = []
+            for record in chunk:
+                row_number += 1
+                try:
+                    valid.append(validate_record(record))
+                except ImportRowError as e:
+                    rejected += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append({"row": row_number, "error": str(e)})
+            if not valid:
+                continue
+
+            try:
+                with connection.cursor() as cursor:
+                    next_index = _next_indexes(cursor, user_id, {row[0] for row in valid})
+                    values = []
+                    for food_date, food_name, carbo, protein, fat, kcal in valid:
+                        food_index = next_index[food_date]
+                        next_index[food_date] = food_index + 1
+                        values.append(
+                            (user_id, food_date, food_index, food_name, carbo, protein, fat, kcal)
+                        )
+                    cursor.executemany(insert_query, values)
+                connection.commit()
+            except pymysql.MySQLError:
+                # 이전 청크는 이미 커밋되었으므로 실패한 청크만 되돌린다
+                connection.rollback()
+                raise
+
+            inserted += len(valid)
+            chunk_first = min(row[0] for row in valid)
+            chunk_last = max(row[0] for row in valid)
+            first_date = chunk_first if first_date is None else min(first_date, chunk_first)
+            last_date = chunk_last if last_date is None else max(last_date, chunk_last)
+    except Exception:
+        # 중간 청크가 실패해도 이미 커밋된 청크의 날짜는 USER_NT를 맞춰 두고 오류를 올린다
+        if inserted:
+            try:
+                rebuild_daily_totals(connection, user_id, first_date, last_date)
+            except pymysql.MySQLError as e:
+                logging.error(f"Daily totals rebuild after failed import for {user_id} failed: {e}")
+        if own_connection:
+            connection.close()
+        raise
+
+    try:
+        if inserted:
+            rebuild_daily_totals(connection, user_id, first_date, last_date)
+    finally:
+        if own_connection:
+            connection.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "inserted": inserted,
+        "rejected": rejected,
+        "errors": errors,
+        "start": first_date.isoformat() if first_date else None,
+        "end": last_date.isoformat() if last_date else None,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(inserted / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def detect_format(filename, content_type=None):
+    name = (filename or "").lower()
+    if name.endswith(".csv") or (content_type or "").startswith("text/csv"):
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in (content_type or ""):
+        return "ndjson"
+    return "json"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import diet logs into FOOD")
+    parser.add_argument("path")
+    parser.add_argument("--user", required=True, help="USER.ID to import for")
+    parser.add_argument("--format", choices=["csv", "json", "ndjson"])
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+    with io.open(args.path, encoding="utf-8-sig", newline="") as stream:
+        result = import_records(args.user, parse_records(stream, fmt), args.chunk_size)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
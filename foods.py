@@ -0,0 +1,105 @@
+# foods.py
+# FOOD 행 읽기/쓰기 공통 함수 (add_food 등 여러 라우트에서 사용)
+
+import os
+from datetime import date as date_type
+
+import archive
+from hangul import normalize
+
+HISTORY_ROWS = int(os.getenv("FOOD_HISTORY_ROWS", "2000"))
+
+
+def next_food_index(cursor, user_id, date):
+    # 해당 날짜의 가장 높은 인덱스 + 1. 트랜잭션이 끝날 때까지 잠가 동시 추가와 겹치지 않게 한다
+    cursor.execute(
+        "SELECT MAX(FOOD_INDEX) FROM FOOD WHERE ID = %s AND DATE = %s FOR UPDATE",
+        (user_id, date),
+    )
+    max_index = cursor.fetchone()[0]
+    # archive.py가 옮긴 달은 파일에 남은 행의 번호와도 겹치지 않게 한다
+    archived = archive.max_food_index(cursor, user_id, date_type.fromisoformat(str(date)[:10]))
+    if archived is not None and (max_index is None or archived > max_index):
+        max_index = archived
+    return max_index + 1 if max_index is not None else 0
+
+
+def insert_foods(cursor, user_id, date, items):
+    # items: LLM 출력 형식 dict 목록. 연속된 FOOD_INDEX로 한 번에 넣고 추가된 행 정보를 돌려준다
+    first_index = next_food_index(cursor, user_id, date)
+    insert_query = """
+    INSERT INTO FOOD (ID, DATE, FOOD_INDEX, FOOD_NAME, FOOD_CH, FOOD_PT, FOOD_FAT, FOOD_KCAL)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """
+    cursor.executemany(
+        insert_query,
+        [
+            (
+                user_id,
+                date,
+                first_index + offset,
+                item["food_name"],
+                item["carbohydrate"],
+                item["protein"],
+                item["fat"],
+                item["calorie"],
+            )
+            for offset, item in enumerate(items)
+        ],
+    )
+    return added_foods(user_id, date, first_index, items)
+
+
+def added_foods(user_id, date, first_index, items):
+    # 추가된 행 정보 (add_food 응답 형식)
+    return [
+        {
+            "ID": user_id,
+            "DATE": date,
+            "FOOD_INDEX": first_index + offset,
+            "food_name": item["food_name"],
+            "carbohydrates": item["carbohydrate"],
+            "protein": item["protein"],
+            "fat": item["fat"],
+            "calorie": item["calorie"],
+        }
+        for offset, item in enumerate(items)
+    ]
+
+
+def food_entry(name, ch, pt, fat, kcal, count, last_date, food_index=None):
+    # LLM 출력 형식 + 기록 정보. food_index/last_date는 가장 최근 행 (quick_add의 원본)
+    return {
+        "food_name": name,
+        "calorie": kcal,
+        "carbohydrate": ch,
+        "protein": pt,
+        "fat": fat,
+        "count": count,
+        "last_date": last_date.strftime("%Y-%m-%d") if last_date else None,
+        "food_index": food_index,
+    }
+
+
+def food_history(cursor, user_id, rows=HISTORY_ROWS):
+    # 최근 rows개 행만 읽어 이름별로 모은다. 최근에 먹은 순서, 영양 정보는 가장 최근 행의 값
+    cursor.execute(
+        """
+        SELECT FOOD_NAME, FOOD_CH, FOOD_PT, FOOD_FAT, FOOD_KCAL, DATE, FOOD_INDEX
+        FROM FOOD
+        WHERE ID = %s
+        ORDER BY DATE DESC, FOOD_INDEX DESC
+        LIMIT %s
+        """,
+        (user_id, rows),
+    )
+    foods = {}
+    for name, ch, pt, fat, kcal, food_date, food_index in cursor.fetchall():
+        if not name:
+            continue
+        key = normalize(name)
+        if key in foods:
+            foods[key]["count"] += 1
+        else:
+            foods[key] = food_entry(name, ch, pt, fat, kcal, 1, food_date, food_index)
+    return list(foods.values())
@@ -0,0 +1,66 @@
+# hangul.py
+# 한글 음절을 자모로 나누는 도우미 (비슷한 음식 이름 찾기, 자동 완성에 사용)
+
+HANGUL_BASE = 0xAC00
+HANGUL_LAST = 0xD7A3
+
+CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+JUNGSEONG = "ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ"
+JONGSEONG = " ㄱㄲㄳㄴㄵㄶㄷㄹㄺㄻㄼㄽㄾㄿㅀㅁㅂㅄㅅㅆㅇㅈㅊㅋㅌㅍㅎ"
+
+# 소리 나는 대로 쓴 표기("떡뽀끼")를 맞추기 위해 된소리는 예사소리로 본다
+_TENSE = str.maketrans("ㄲㄸㅃㅆㅉ", "ㄱㄷㅂㅅㅈ")
+
+
+def decompose(text, silent_ieung=True):
+    # "떡볶이" -> "ㄸㅓㄱㅂㅗㄲㅇㅣ", 한글이 아닌 글자는 그대로 둔다
+    # silent_ieung=False 이면 소리 없는 초성 ㅇ을 뺀다
+    out = []
+    for ch in text:
+        code = ord(ch)
+        if HANGUL_BASE <= code <= HANGUL_LAST:
+            offset = code - HANGUL_BASE
+            initial = CHOSEONG[offset // 588]
+            if silent_ieung or initial != "ㅇ":
+                out.append(initial)
+            out.append(JUNGSEONG[offset % 588 // 28])
+            if offset % 28:
+                out.append(JONGSEONG[offset % 28])
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+def fold(text):
+    # "떡볶이", "떡뽀끼" -> "ㄷㅓㄱㅂㅗㄱㅣ"
+    return decompose(text, silent_ieung=False).translate(_TENSE)
+
+
+def normalize(text):
+    # 공백과 대소문자 차이는 같은 음식으로 본다
+    return "".join(text.split()).lower()
+
+
+# 자판으로 치는 순서대로 겹모음/겹받침을 나눈다 ("닭" -> ㄷㅏㄹㄱ). 입력 중인 글자("달")도 접두사가 된다
+_COMPOUND = {
+    "ㅘ": "ㅗㅏ", "ㅙ": "ㅗㅐ", "ㅚ": "ㅗㅣ", "ㅝ": "ㅜㅓ", "ㅞ": "ㅜㅔ", "ㅟ": "ㅜㅣ", "ㅢ": "ㅡㅣ",
+    "ㄳ": "ㄱㅅ", "ㄵ": "ㄴㅈ", "ㄶ": "ㄴㅎ", "ㄺ": "ㄹㄱ", "ㄻ": "ㄹㅁ", "ㄼ": "ㄹㅂ",
+    "ㄽ": "ㄹㅅ", "ㄾ": "ㄹㅌ", "ㄿ": "ㄹㅍ", "ㅀ": "ㄹㅎ", "ㅄ": "ㅂㅅ",
+}
+_KEYSTROKES = str.maketrans(_COMPOUND)
+
+
+def keystrokes(text):
+    return decompose(normalize(text)).translate(_KEYSTROKES)
+
+
+def choseong(text):
+    # "떡볶이" -> "ㄸㅂㅇ", 한글이 아닌 글자는 그대로 둔다
+    out = []
+    for ch in normalize(text):
+        code = ord(ch)
+        if HANGUL_BASE <= code <= HANGUL_LAST:
+            out.append(CHOSEONG[(code - HANGUL_BASE) // 588])
+        else:
+            out.append(ch)
+    return "".join(out)
@@ -1,25 +1,17 @@
 import base64
 from io import BytesIO
 from PIL import Image
-import os
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage
-from langchain_openai import AzureChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.pydantic_v1 import BaseModel, Field
 from langchain_core.output_parsers import JsonOutputParser
 import json
 
-load_dotenv()
+import food_classifier
+from llm import get_model  # 작업별 배포 라우팅은 llm.py에서
 
-# OpenAI 설정
-model = AzureChatOpenAI(
-    azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT"),  # gpt-4o is set by env
-    temperature=1.0,
-    openai_api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    openai_api_version=os.getenv("OPENAI_API_VERSION"),
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-)
+load_dotenv()
 
 # 영양 정보 모델 정의
 class NutritionInfo(BaseModel):
@@ -44,33 +36,53 @@ prompt_template = ChatPromptTemplate.from_template(
     """
 ).partial(format_instructions=output_parser.get_format_instructions())
 
+VISION_MAX_SIDE = 1024  # 비전 모델에 보내기 전에 긴 변을 이 크기로 줄인다
+
+
+def encode_image(image, max_side=VISION_MAX_SIDE):
+    # PIL 이미지 -> JPEG base64 (RGB로 바꾸고, 크면 줄인다)
+    image = image.convert("RGB")
+    image.thumbnail((max_side, max_side))
+    buffered = BytesIO()
+    image.save(buffered, format="JPEG")
+    return base64.b64encode(buffered.getvalue()).decode("utf-8")
+
 def convert_to_base64(image_path):
     with Image.open(image_path) as image:
-        buffered = BytesIO()
-        image.save(buffered, format="JPEG")
-        img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-    return img_str
+        return encode_image(image)
 
 def create_prompt(image_base64, text_prompt):
+    # image_base64: 한 장 또는 여러 장 (여러 장이면 보낸 순서대로 붙인다)
+    images = [image_base64] if isinstance(image_base64, str) else image_base64
     message = HumanMessage(
-        content=[
-            {"type": "text", "text": text_prompt},
+        content=[{"type": "text", "text": text_prompt}]
+        + [
             {
                 "type": "image_url", 
                 "image_url": {
-                    "url": f"data:image/jpeg;base64,{image_base64}"
+                    "url": f"data:image/jpeg;base64,{image}"
                 }
-            },
+            }
+            for image in images
         ]
     )
     return [message]
 
 def invoke_model(message):
-    result = model.invoke(message)
+    result = get_model("vision").invoke(message)
     return result
 
-def extract_food_name_from_image(image_path):
-    image_base64 = convert_to_base64(image_path)
+# 응답을 JSON 형식으로 변환
+def parse_response_to_json(response):
+    try:
+        response_text = response.content
+        print(f"Response Text: {response_text}")  # Debugging 출력 추가
+        response_json = json.loads(response_text)
+        return response_json
+    except Exception as e:
+        return {"error": str(e)}
+
+def extract_food_name(image_base64):
     text_prompt = """
     다음 이미지를 설명하세요. 음식 이름을 추출하여 JSON 형식으로 반환해주세요.
     추출할 정보:
@@ -82,16 +94,6 @@ def extract_food_name_from_image(image_path):
     """
     message = create_prompt(image_base64, text_prompt)
     response = invoke_model(message)
-    
-    # 응답을 JSON 형식으로 변환
-    def parse_response_to_json(response):
-        try:
-            response_text = response.content
-            print(f"Response Text: {response_text}")  # Debugging 출력 추가
-            response_json = json.loads(response_text)
-            return response_json
-        except Exception as e:
-            return {"error": str(e)}
 
     response_json = parse_response_to_json(response)
     if "음식" in response_json:
@@ -100,15 +102,43 @@ def extract_food_name_from_image(image_path):
         print(f"Unexpected response format: {response_json}")  # Debugging 출력 추가
         return ""
 
+def extract_food_name_from_image(image_path):
+    return extract_food_name(convert_to_base64(image_path))
+
+def extract_food_names(images_base64):
+    # 사진 여러 장을 한 번의 비전 호출로: 사진 순서대로 음식 이름 목록 (모르면 "")
+    text_prompt = f"""
+    다음 {len(images_base64)}장의 이미지는 한 끼 식사의 음식 사진입니다.
+    사진마다 음식 이름을 하나씩, 사진 순서대로 추출하여 JSON 형식으로 반환해주세요.
+    추출할 정보:
+    - 음식이름: 한글로 음식 이름 (알 수 없으면 빈 문자열)
+    반환 형식:
+    {{
+    "음식": ["첫 번째 사진의 음식 이름", "두 번째 사진의 음식 이름"]
+    }}
+    """
+    message = create_prompt(images_base64, text_prompt)
+    response = invoke_model(message)
+
+    names = parse_response_to_json(response).get("음식")
+    if not isinstance(names, list):
+        print(f"Unexpected response format: {names}")  # Debugging 출력 추가
+        names = []
+    names = [name if isinstance(name, str) else "" for name in names]
+    return (names + [""] * len(images_base64))[: len(images_base64)]
+
 def do(image_path):
-    food_name = extract_food_name_from_image(image_path)
+    # 로컬 분류기가 확신하면 비전 모델을 부르지 않고 바로 영양 정보 분석으로 간다
+    food_name = food_classifier.confident_label(image_path)
+    if food_name is None:
+        food_name = extract_food_name_from_image(image_path)
     print(f"Extracted food name: {food_name}")  # Debugging 출력 추가
     
     if not food_name:
         return {"error": "Food name could not be extracted."}
     
     prompt_value = prompt_template.invoke({"string": food_name})
-    model_output = model.invoke(prompt_value)
+    model_output = get_model("text").invoke(prompt_value)
     output = output_parser.invoke(model_output)
     output_dict = output  # 이미 딕셔너리 형태로 반환됨
     output_dict["food_name"] = food_name  # 음식 이름을 추가
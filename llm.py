@@ -5,15 +5,164 @@ from langchain_openai import AzureChatOpenAI
 from langchain_core.pydantic_v1 import BaseModel, Field
 from langchain_core.output_parsers import JsonOutputParser
 from dotenv import load_dotenv
+import json
+import logging
 import os
+import threading
+import time
 
+import httpx
+
+import cassette
+import llm_pool
 
 load_dotenv()
 
-model = AzureChatOpenAI(
-    azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT"),  # gpt-4o is set by env
-    temperature=1.0,
-)
+# 작업 종류마다 배포(deployment)와 샘플링 설정을 따로 둔다.
+#   AZURE_OPENAI_DEPLOYMENT_TEXT / _VISION / _ADVICE     (없으면 AZURE_OPENAI_DEPLOYMENT)
+#   AZURE_OPENAI_DEPLOYMENT_TEXT_FALLBACK 등              느리거나 실패할 때 쓰는 보조 배포
+#   LLM_TEXT_TEMPERATURE, LLM_TEXT_LATENCY_BUDGET(초) 등
+#   AZURE_OPENAI_POOL                                    여러 엔드포인트/키에 나눠 보내기 (llm_pool.py)
+#   LLM_CASSETTE_MODE=record|replay                      호출 녹화/오프라인 재생 (cassette.py)
+DEFAULT_TEMPERATURE = {"text": 0.0, "vision": 0.0, "advice": 0.7}
+DEFAULT_LATENCY_BUDGET = {"text": 10.0, "vision": 30.0, "advice": 60.0}
+DEGRADED_PROBE_SECONDS = 30  # 느린 기본 배포를 다시 시도해 보는 간격
+
+
+class DeploymentStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency_ewma = None
+        self.total_latency = 0.0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.last_failure = None
+
+    def record(self, latency, usage=None, failed=False):
+        self.calls += 1
+        self.total_latency += latency
+        self.latency_ewma = (
+            latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+        )
+        if failed:
+            self.errors += 1
+            self.last_failure = time.monotonic()
+        if usage:
+            self.input_tokens += usage[0]
+            self.output_tokens += usage[1]
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "latency_ewma_ms": round(self.latency_ewma * 1000) if self.latency_ewma else None,
+            "latency_avg_ms": round(self.total_latency / self.calls * 1000) if self.calls else None,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+        }
+
+
+def _token_usage(message):
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    usage = (getattr(message, "response_metadata", None) or {}).get("token_usage")
+    if usage:
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    return None
+
+
+class RoutedModel:
+    # model.invoke(...)를 그대로 쓸 수 있게 AzureChatOpenAI와 같은 invoke를 제공한다
+    def __init__(self, task):
+        key = task.upper()
+        self.task = task
+        self.primary = os.getenv(f"AZURE_OPENAI_DEPLOYMENT_{key}") or os.getenv(
+            "AZURE_OPENAI_DEPLOYMENT"
+        )
+        self.fallback = os.getenv(f"AZURE_OPENAI_DEPLOYMENT_{key}_FALLBACK")
+        self.temperature = float(
+            os.getenv(f"LLM_{key}_TEMPERATURE", DEFAULT_TEMPERATURE.get(task, 1.0))
+        )
+        self.latency_budget = float(
+            os.getenv(f"LLM_{key}_LATENCY_BUDGET", DEFAULT_LATENCY_BUDGET.get(task, 30.0))
+        )
+        self.stats = {}
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _client(self, deployment):
+        with self._lock:
+            if deployment not in self._clients:
+                options = {}
+                if self.fallback and deployment == self.primary:
+                    # 보조 배포가 있으면 기본 배포는 지연 예산을 넘기는 즉시 포기한다.
+                    # 보조 배포는 마지막 수단이라 기본 타임아웃과 재시도를 그대로 쓴다
+                    options = {"timeout": self.latency_budget, "max_retries": 0}
+                transport = cassette.wrap(llm_pool.shared_transport())
+                if transport is not None:
+                    options["http_client"] = httpx.Client(transport=transport)
+                self._clients[deployment] = AzureChatOpenAI(
+                    azure_deployment=deployment, temperature=self.temperature, **options
+                )
+                self.stats[deployment] = DeploymentStats()
+            return self._clients[deployment]
+
+    def _degraded(self):
+        stats = self.stats.get(self.primary)
+        if stats is None or stats.last_failure is None:
+            return False
+        return time.monotonic() - stats.last_failure < DEGRADED_PROBE_SECONDS
+
+    def _order(self):
+        if not self.fallback:
+            return [self.primary]
+        if self._degraded():
+            return [self.fallback, self.primary]
+        return [self.primary, self.fallback]
+
+    def invoke(self, input, **kwargs):
+        error = None
+        for deployment in self._order():
+            client = self._client(deployment)
+            stats = self.stats[deployment]
+            started = time.perf_counter()
+            try:
+                result = client.invoke(input, **kwargs)
+            except Exception as e:
+                stats.record(time.perf_counter() - started, failed=True)
+                logging.warning(f"LLM {self.task}/{deployment} failed: {e}")
+                error = e
+                continue
+            latency = time.perf_counter() - started
+            # 예산을 넘긴 응답은 쓰되, 다음 요청부터는 잠시 보조 배포를 먼저 쓴다
+            stats.record(latency, _token_usage(result), failed=latency > self.latency_budget)
+            return result
+        raise error
+
+
+_routes = {}
+_routes_lock = threading.Lock()
+
+
+def get_model(task):
+    with _routes_lock:
+        if task not in _routes:
+            _routes[task] = RoutedModel(task)
+        return _routes[task]
+
+
+def route_stats():
+    with _routes_lock:
+        routes = dict(_routes)
+    return {
+        task: {deployment: s.as_dict() for deployment, s in route.stats.items()}
+        for task, route in routes.items()
+    }
+
+
+model = get_model("text")
 
 
 class NutritionInfo(BaseModel):
@@ -48,3 +197,22 @@ def do(param):
     output_dict["food_name"] = param  # 음식 이름을 추가
     print(f"Parsed output: {output_dict}")  # Debugging 출력 추가
     return output_dict
+
+
+advice_prompt_template = ChatPromptTemplate.from_template(
+    """
+    다음은 사용자의 한 달 식단 요약이야 (JSON).
+    하루 평균 섭취량과 권장량 대비 비율, 자주 먹은 음식을 보고
+    잘한 점 한 가지와 개선할 점 두세 가지를 한국어로 5문장 이내로 조언해줘.
+
+    요약:{summary}
+    """
+)
+
+
+def advise(summary):
+    prompt_value = advice_prompt_template.invoke(
+        {"summary": json.dumps(summary, ensure_ascii=False)}
+    )
+    model_output = get_model("advice").invoke(prompt_value)
+    return model_output.content.strip()
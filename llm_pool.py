@@ -0,0 +1,225 @@
+# llm_pool.py
+# 여러 Azure OpenAI 배포/키에 호출을 나눠 보내는 httpx 트랜스포트.
+# 응답 헤더의 남은 쿼터를 추적하고, 429가 오면 동시 호출 수를 절반으로 줄인다(AIMD).
+# 지연 시간이 긴 백엔드는 덜 고른다.
+#
+#   AZURE_OPENAI_POOL='[
+#     {"endpoint": "https://eastus.openai.azure.com", "api_key": "...",
+#      "deployments": {"gpt-4o": "gpt-4o-eastus"}},
+#     {"endpoint": "https://japan.openai.azure.com", "api_key": "..."}
+#   ]'
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import httpx
+
+INITIAL_CONCURRENCY = float(os.getenv("LLM_POOL_INITIAL_CONCURRENCY", "4"))
+MAX_CONCURRENCY = float(os.getenv("LLM_POOL_MAX_CONCURRENCY", "64"))
+ACQUIRE_TIMEOUT = float(os.getenv("LLM_POOL_ACQUIRE_TIMEOUT", "30"))
+DEFAULT_RETRY_AFTER = 1.0
+
+_DEPLOYMENT_PATH = re.compile(r"(/openai/deployments/)([^/]+)(/.*)")
+
+
+def _header_number(headers, name):
+    try:
+        return float(headers[name])
+    except (KeyError, ValueError):
+        return None
+
+
+class Backend:
+    def __init__(self, endpoint, api_key, deployments=None, name=None):
+        self.url = httpx.URL(endpoint)
+        self.api_key = api_key
+        self.deployments = deployments or {}
+        self.name = name or self.url.netloc.decode("ascii")
+        self.limit = INITIAL_CONCURRENCY  # AIMD 동시 호출 한도
+        self.inflight = 0
+        self.latency_ewma = None
+        self.remaining_requests = None
+        self.limit_requests = None
+        self.remaining_tokens = None
+        self.limit_tokens = None
+        self.cooldown_until = 0.0
+        self.calls = 0
+        self.throttled = 0
+        self.errors = 0
+
+    def available(self, now):
+        return now >= self.cooldown_until and self.inflight < int(self.limit)
+
+    def headroom(self):
+        # 남은 요청/토큰 쿼터 비율 중 작은 값 (모르면 1)
+        ratios = []
+        if self.remaining_requests is not None and self.limit_requests:
+            ratios.append(self.remaining_requests / self.limit_requests)
+        if self.remaining_tokens is not None and self.limit_tokens:
+            ratios.append(self.remaining_tokens / self.limit_tokens)
+        return min(ratios) if ratios else 1.0
+
+    def score(self):
+        # 낮을수록 좋다: 느리고, 쿼터가 적고, 이미 바쁜 백엔드일수록 커진다
+        latency = self.latency_ewma if self.latency_ewma is not None else 0.5
+        return latency * (1 + self.inflight) / max(self.headroom(), 0.02)
+
+    def rewrite(self, request):
+        path = request.url.path
+        match = _DEPLOYMENT_PATH.match(path)
+        if match and match.group(2) in self.deployments:
+            path = f"{match.group(1)}{self.deployments[match.group(2)]}{match.group(3)}"
+        url = request.url.copy_with(
+            scheme=self.url.scheme, host=self.url.host, port=self.url.port, path=path
+        )
+        headers = httpx.Headers(request.headers)
+        headers["host"] = url.netloc.decode("ascii")
+        headers["api-key"] = self.api_key
+        return httpx.Request(
+            request.method, url, headers=headers, content=request.content,
+            extensions=request.extensions,
+        )
+
+    def observe(self, response, latency):
+        headers = response.headers
+        for attr, name in (
+            ("remaining_requests", "x-ratelimit-remaining-requests"),
+            ("limit_requests", "x-ratelimit-limit-requests"),
+            ("remaining_tokens", "x-ratelimit-remaining-tokens"),
+            ("limit_tokens", "x-ratelimit-limit-tokens"),
+        ):
+            value = _header_number(headers, name)
+            if value is not None:
+                setattr(self, attr, value)
+        self.latency_ewma = (
+            latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+        )
+
+    def as_dict(self):
+        return {
+            "limit": round(self.limit, 2),
+            "inflight": self.inflight,
+            "latency_ewma_ms": round(self.latency_ewma * 1000) if self.latency_ewma else None,
+            "headroom": round(self.headroom(), 3),
+            "calls": self.calls,
+            "throttled": self.throttled,
+            "errors": self.errors,
+        }
+
+
+class PooledTransport(httpx.BaseTransport):
+    def __init__(self, backends, transport=None):
+        if not backends:
+            raise ValueError("PooledTransport needs at least one backend")
+        self.backends = backends
+        self._transport = transport or httpx.HTTPTransport()
+        self._cond = threading.Condition()
+
+    def _acquire(self, exclude):
+        deadline = time.monotonic() + ACQUIRE_TIMEOUT
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                candidates = [
+                    b for b in self.backends if b not in exclude and b.available(now)
+                ]
+                if candidates:
+                    backend = min(candidates, key=Backend.score)
+                    backend.inflight += 1
+                    return backend
+                if not any(b not in exclude for b in self.backends):
+                    return None
+                # 모두 바쁘거나 쿨다운 중이면 가장 빨리 풀리는 시점까지 기다린다
+                if now >= deadline:
+                    raise httpx.PoolTimeout("No Azure OpenAI backend available")
+                wake = min(
+                    [b.cooldown_until for b in self.backends if b.cooldown_until > now]
+                    + [deadline]
+                )
+                self._cond.wait(max(wake - now, 0.01))
+
+    def _release(self, backend, status, latency, response=None, retry_after=None):
+        with self._cond:
+            backend.inflight -= 1
+            backend.calls += 1
+            if response is not None:
+                backend.observe(response, latency)
+            if status == 429:
+                # multiplicative decrease + Retry-After 동안 쉬기
+                backend.throttled += 1
+                backend.limit = max(1.0, backend.limit / 2)
+                backend.cooldown_until = time.monotonic() + (retry_after or DEFAULT_RETRY_AFTER)
+            elif status is None or status >= 500:
+                backend.errors += 1
+            else:
+                # additive increase: 한도만큼 성공하면 1 증가
+                backend.limit = min(MAX_CONCURRENCY, backend.limit + 1 / backend.limit)
+            self._cond.notify_all()
+
+    def handle_request(self, request):
+        request.read()  # 다른 백엔드로 다시 보낼 수 있게 본문을 읽어 둔다
+        tried = set()
+        response = None
+        while True:
+            backend = self._acquire(tried)
+            if backend is None:
+                return response  # 모든 백엔드가 429를 돌려줬으면 마지막 응답을 그대로
+            tried.add(backend)
+            started = time.perf_counter()
+            try:
+                response = self._transport.handle_request(backend.rewrite(request))
+            except httpx.TransportError:
+                self._release(backend, None, time.perf_counter() - started)
+                if len(tried) == len(self.backends):
+                    raise
+                continue
+            latency = time.perf_counter() - started
+            if response.status_code != 429:
+                self._release(backend, response.status_code, latency, response)
+                return response
+            retry_after = _header_number(response.headers, "retry-after")
+            response.read()
+            response.close()
+            self._release(backend, 429, latency, response, retry_after)
+            logging.warning(f"Azure OpenAI backend {backend.name} throttled (429)")
+
+    def close(self):
+        self._transport.close()
+
+    def stats(self):
+        with self._cond:
+            return {b.name: b.as_dict() for b in self.backends}
+
+
+def backends_from_env():
+    raw = os.getenv("AZURE_OPENAI_POOL")
+    if not raw:
+        return []
+    return [
+        Backend(
+            entry["endpoint"],
+            entry["api_key"],
+            entry.get("deployments"),
+            entry.get("name"),
+        )
+        for entry in json.loads(raw)
+    ]
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def shared_transport():
+    # AZURE_OPENAI_POOL이 없으면 None (기존처럼 단일 엔드포인트)
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            backends = backends_from_env()
+            if backends:
+                _transport = PooledTransport(backends)
+        return _transport
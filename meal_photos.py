@@ -0,0 +1,164 @@
+# meal_photos.py
+# 한 끼의 음식 사진 여러 장을 한 번에 올려 분석하고 한 트랜잭션으로 FOOD에 추가한다.
+#
+#   POST /api/food/photos  (multipart/form-data)
+#     ID, DATE, images=<파일> 여러 개 또는 uploads=<sha256> 여러 개 (upload.py),
+#     mode=concurrent|multi (기본 MEAL_PHOTO_MODE)
+#
+# 디코딩/리사이즈는 스레드 풀에서 동시에 하고, 로컬 분류기(food_classifier)는 한 배치로 돌린다.
+# 분류기가 확신하지 못한 사진은
+#   concurrent: 사진마다 비전 호출 -> 영양 분석을 동시에 (최대 MEAL_PHOTO_WORKERS개)
+#   multi:      비전 호출 한 번에 모든 사진, 영양 분석은 동시에
+# 으로 처리하므로 전체 시간은 사진 수의 합이 아니라 가장 느린 한 장에 가깝다.
+
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import os
+
+from flask import Blueprint, request, jsonify
+from PIL import Image, UnidentifiedImageError
+
+import detail
+import food_classifier
+import jun
+import quick_add
+import storage
+import upload
+from nutrition import do
+
+bp = Blueprint("meal_photos", __name__)
+
+MAX_IMAGES = int(os.getenv("MEAL_PHOTO_MAX_IMAGES", "8"))
+MAX_IMAGE_BYTES = int(os.getenv("MEAL_PHOTO_MAX_BYTES", str(10 * 1024 * 1024)))
+WORKERS = int(os.getenv("MEAL_PHOTO_WORKERS", "4"))
+DEFAULT_MODE = os.getenv("MEAL_PHOTO_MODE", "concurrent")
+MODES = ("concurrent", "multi")
+
+
+def _prepare(data):
+    # 바이트 -> (분류기용 RGB 이미지, 비전 모델용 JPEG base64). 이미지가 아니면 None
+    try:
+        with Image.open(BytesIO(data)) as image:
+            image = image.convert("RGB")
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        return None
+    return image, jun.encode_image(image)
+
+
+def _nutrition(name):
+    item = dict(do(name))
+    item["food_name"] = name
+    return item
+
+
+def analyze_photos(blobs, mode=DEFAULT_MODE):
+    # 사진마다 {"food_name", "source", "nutrition"} (인식하지 못하면 food_name이 "", nutrition이 None)
+    with ThreadPoolExecutor(max_workers=min(WORKERS, len(blobs))) as executor:
+        prepared = list(executor.map(_prepare, blobs))
+        bad = [index for index, entry in enumerate(prepared) if entry is None]
+        if bad:
+            raise ValueError(f"이미지를 읽을 수 없습니다: {bad}")
+
+        labels = food_classifier.confident_labels([image for image, _ in prepared])
+        results = [
+            {"food_name": label or "", "source": "classifier" if label else "vision"}
+            for label in labels
+        ]
+        pending = [index for index, label in enumerate(labels) if label is None]
+        if mode == "multi" and pending:
+            try:
+                names = jun.extract_food_names([prepared[index][1] for index in pending])
+            except Exception as e:
+                names = [""] * len(pending)
+                for index in pending:
+                    results[index]["error"] = str(e)
+            for index, name in zip(pending, names):
+                results[index]["food_name"] = name
+                results[index]["source"] = "vision_multi"
+
+        def analyze(index):
+            # concurrent: 사진마다 비전 호출 후 바로 영양 분석 (한 장이 다른 장을 기다리지 않는다)
+            result = results[index]
+            try:
+                if result["source"] == "vision":
+                    result["food_name"] = jun.extract_food_name(prepared[index][1])
+                result["nutrition"] = _nutrition(result["food_name"]) if result["food_name"] else None
+            except Exception as e:  # LLM 오류: 이 사진만 빼고 나머지는 저장한다
+                result.update(nutrition=None, error=str(e))
+
+        list(executor.map(analyze, range(len(results))))
+    return results
+
+
+@bp.route("/api/food/photos", methods=["POST"])
+def upload_meal_photos():
+    user_id = request.form.get("ID")
+    date = request.form.get("DATE")
+    mode = request.form.get("mode", DEFAULT_MODE)
+    files = request.files.getlist("images")
+    # /api/uploads로 미리 올린 사진의 sha256 (축소본을 읽는다)
+    digests = request.form.getlist("uploads")
+
+    if not user_id or not date or not (files or digests):
+        return jsonify({"error": "필수 정보가 누락되었습니다."}), 400
+    if len(files) + len(digests) > MAX_IMAGES:
+        return jsonify({"error": f"사진은 최대 {MAX_IMAGES}장까지 올릴 수 있습니다."}), 400
+    if mode not in MODES:
+        return jsonify({"error": "mode must be concurrent or multi"}), 400
+    missing = [digest for digest in digests if not upload.exists(digest)]
+    if missing:
+        return jsonify({"error": f"업로드를 찾을 수 없습니다: {missing}"}), 404
+
+    blobs = []
+    for file in files:
+        data = file.read(MAX_IMAGE_BYTES + 1)
+        if len(data) > MAX_IMAGE_BYTES:
+            return jsonify({"error": f"{file.filename}: 사진이 너무 큽니다."}), 413
+        blobs.append(data)
+    for digest in digests:
+        try:
+            with open(upload.model_path(digest), "rb") as f:
+                blobs.append(f.read())
+        except FileNotFoundError:  # exists() 뒤에 sweeper가 지웠다
+            return jsonify({"error": f"업로드를 찾을 수 없습니다: {[digest]}"}), 404
+
+    try:
+        results = analyze_photos(blobs, mode)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    items = [result["nutrition"] for result in results if result["nutrition"]]
+    images = [
+        {"index": index, **{key: value for key, value in result.items() if key != "nutrition"}}
+        for index, result in enumerate(results)
+    ]
+    if not items:
+        return jsonify({"error": "음식을 인식하지 못했습니다.", "images": images}), 422
+
+    try:
+        # 인식한 음식을 모두 한 트랜잭션에서 연속된 FOOD_INDEX로 추가
+        added_foods = storage.get_storage().add_foods(user_id, date, items)
+    except storage.DatabaseError as e:
+        return jsonify({"error": str(e)}), 500
+    detail.invalidate(user_id, date)
+    quick_add.invalidate(user_id)
+    # 기록에 쓰인 업로드를 그 FOOD 행에 연결한다 (blobs는 images 다음에 uploads 순서)
+    recognized = [index for index, result in enumerate(results) if result["nutrition"]]
+    links = [
+        (digests[index - len(files)], user_id, date, added["FOOD_INDEX"])
+        for index, added in zip(recognized, added_foods)
+        if index >= len(files)
+    ]
+    if links:
+        upload.link_foods(links)
+
+    return (
+        jsonify(
+            {
+                "message": "음식이 성공적으로 추가되었습니다.",
+                "items": added_foods,
+                "images": images,
+            }
+        ),
+        201,
+    )
@@ -0,0 +1,12 @@
+-- 한 달 요약 조언 캐시
+-- DATA_VERSION은 해당 월 FOOD 행의 지문(행 수 + CRC32 합)으로, 달라지면 조언을 다시 만든다
+CREATE TABLE IF NOT EXISTS MONTHLY_ADVICE (
+    ID VARCHAR(50) NOT NULL,
+    YEAR SMALLINT NOT NULL,
+    MONTH TINYINT NOT NULL,
+    DATA_VERSION VARCHAR(64) NOT NULL,
+    SUMMARY JSON NOT NULL,
+    ADVICE TEXT NOT NULL,
+    CREATED_AT DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (ID, YEAR, MONTH)
+);
@@ -0,0 +1,10 @@
+-- 마감된 달의 get_monthly_data 결과를 미리 계산해 둔 스냅샷 (batch.py가 채운다)
+-- 해당 월의 FOOD 행이 바뀌면 앱이 행을 지우고, 다음 요청은 직접 계산한다
+CREATE TABLE IF NOT EXISTS MONTHLY_SUMMARY (
+    ID VARCHAR(50) NOT NULL,
+    YEAR SMALLINT NOT NULL,
+    MONTH TINYINT NOT NULL,
+    PAYLOAD JSON NOT NULL,
+    COMPUTED_AT DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (ID, YEAR, MONTH)
+);
@@ -0,0 +1,4 @@
+-- 하루 조회(/api/calendar)와 기간 조회가 쓰는 인덱스
+-- FOOD의 기본 키가 이미 (ID, DATE, FOOD_INDEX)로 시작하면 첫 번째 인덱스는 만들지 않아도 된다
+CREATE INDEX IDX_FOOD_ID_DATE ON FOOD (ID, DATE, FOOD_INDEX);
+CREATE INDEX IDX_USER_NT_ID_DATE ON USER_NT (ID, DATE);
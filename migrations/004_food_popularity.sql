@@ -0,0 +1,12 @@
+-- 전체 사용자 기준 자주 먹는 음식과 평균 영양 정보 (자동 완성용, autocomplete.py refresh가 채운다)
+CREATE TABLE IF NOT EXISTS FOOD_POPULARITY (
+    FOOD_NAME VARCHAR(255) NOT NULL,
+    CNT INT NOT NULL,
+    FOOD_CH DECIMAL(10, 2),
+    FOOD_PT DECIMAL(10, 2),
+    FOOD_FAT DECIMAL(10, 2),
+    FOOD_KCAL DECIMAL(10, 2),
+    LAST_DATE DATE,
+    UPDATED_AT DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (FOOD_NAME)
+);
@@ -0,0 +1,56 @@
+-- FOOD를 월 단위 RANGE 파티션으로 나눈다. 날짜 범위 조건(DATE >= .. AND DATE < ..)이 있는 조회는
+-- 해당 달 파티션만 읽고, 보존 기간이 지난 달은 archive.py가 Parquet로 옮긴 뒤 지우고 파티션을 REBUILD해 공간을 돌려받는다.
+-- 파티션 키(DATE)는 모든 UNIQUE/PRIMARY KEY에 들어 있어야 한다: 기본 키가 (ID, DATE, FOOD_INDEX)라고 가정.
+-- 파티션 테이블은 외래 키를 지원하지 않으므로, FOOD에 외래 키가 있으면 먼저 지워야 한다.
+-- 이후 달의 파티션은 `python archive.py partitions`가 pmax를 나눠 미리 만든다.
+ALTER TABLE FOOD
+PARTITION BY RANGE COLUMNS (DATE) (
+    PARTITION p_old VALUES LESS THAN ('2024-01-01'),
+    PARTITION p202401 VALUES LESS THAN ('2024-02-01'),
+    PARTITION p202402 VALUES LESS THAN ('2024-03-01'),
+    PARTITION p202403 VALUES LESS THAN ('2024-04-01'),
+    PARTITION p202404 VALUES LESS THAN ('2024-05-01'),
+    PARTITION p202405 VALUES LESS THAN ('2024-06-01'),
+    PARTITION p202406 VALUES LESS THAN ('2024-07-01'),
+    PARTITION p202407 VALUES LESS THAN ('2024-08-01'),
+    PARTITION p202408 VALUES LESS THAN ('2024-09-01'),
+    PARTITION p202409 VALUES LESS THAN ('2024-10-01'),
+    PARTITION p202410 VALUES LESS THAN ('2024-11-01'),
+    PARTITION p202411 VALUES LESS THAN ('2024-12-01'),
+    PARTITION p202412 VALUES LESS THAN ('2025-01-01'),
+    PARTITION p202501 VALUES LESS THAN ('2025-02-01'),
+    PARTITION p202502 VALUES LESS THAN ('2025-03-01'),
+    PARTITION p202503 VALUES LESS THAN ('2025-04-01'),
+    PARTITION p202504 VALUES LESS THAN ('2025-05-01'),
+    PARTITION p202505 VALUES LESS THAN ('2025-06-01'),
+    PARTITION p202506 VALUES LESS THAN ('2025-07-01'),
+    PARTITION p202507 VALUES LESS THAN ('2025-08-01'),
+    PARTITION p202508 VALUES LESS THAN ('2025-09-01'),
+    PARTITION p202509 VALUES LESS THAN ('2025-10-01'),
+    PARTITION p202510 VALUES LESS THAN ('2025-11-01'),
+    PARTITION p202511 VALUES LESS THAN ('2025-12-01'),
+    PARTITION p202512 VALUES LESS THAN ('2026-01-01'),
+    PARTITION p202601 VALUES LESS THAN ('2026-02-01'),
+    PARTITION p202602 VALUES LESS THAN ('2026-03-01'),
+    PARTITION p202603 VALUES LESS THAN ('2026-04-01'),
+    PARTITION p202604 VALUES LESS THAN ('2026-05-01'),
+    PARTITION p202605 VALUES LESS THAN ('2026-06-01'),
+    PARTITION p202606 VALUES LESS THAN ('2026-07-01'),
+    PARTITION p202607 VALUES LESS THAN ('2026-08-01'),
+    PARTITION p202608 VALUES LESS THAN ('2026-09-01'),
+    PARTITION p202609 VALUES LESS THAN ('2026-10-01'),
+    PARTITION p202610 VALUES LESS THAN ('2026-11-01'),
+    PARTITION p202611 VALUES LESS THAN ('2026-12-01'),
+    PARTITION p202612 VALUES LESS THAN ('2027-01-01'),
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+
+-- archive.py가 Parquet로 옮긴 달. /api/monthly 등은 여기 있는 달을 파일에서 읽는다
+CREATE TABLE IF NOT EXISTS FOOD_ARCHIVE_MONTHS (
+    YEAR SMALLINT NOT NULL,
+    MONTH TINYINT NOT NULL,
+    PATH VARCHAR(512) NOT NULL,
+    ROW_COUNT INT NOT NULL,
+    ARCHIVED_AT DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (YEAR, MONTH)
+);
@@ -0,0 +1,6 @@
+-- write_behind.py: 큐(노드)마다 MySQL에 넣은 마지막 seq. FOOD INSERT와 같은 트랜잭션에서 갱신한다
+CREATE TABLE IF NOT EXISTS WRITE_BEHIND_APPLIED (
+    NODE VARCHAR(255) NOT NULL,
+    LAST_SEQ BIGINT NOT NULL,
+    PRIMARY KEY (NODE)
+);
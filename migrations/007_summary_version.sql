@@ -0,0 +1,8 @@
+-- 사용자별 MONTHLY_SUMMARY 무효화 번호. 무효화할 때마다 FOOD/USER_NT 쓰기와 같은 트랜잭션에서 1 올린다.
+-- batch.py는 계산을 시작하기 전에 읽은 번호가 저장할 때도 같을 때만 스냅샷을 쓴다
+-- (계산하는 사이 무효화되었으면 오래된 스냅샷이므로 버린다).
+CREATE TABLE IF NOT EXISTS SUMMARY_VERSION (
+    ID VARCHAR(50) NOT NULL,
+    VERSION BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (ID)
+);
@@ -1,41 +1,112 @@
 # monthly.py
+# 달력 조회: 월별/분기별 식단, 한 달 요약 조언
 
-from flask import Flask, request, jsonify
+from flask import Blueprint, request, jsonify
+import calendar
+import logging
 import pymysql
-import os
-from dotenv import load_dotenv
 
-load_dotenv()
+import advice
+import archive
+import responses
+import summaries
+import write_behind
+from db import get_read_connection
 
-app = Flask(__name__)
+bp = Blueprint("monthly", __name__)
 
-# DB Connection
-db_config = {
-    'host': os.getenv('DB_HOST'),
-    'user': os.getenv('DB_USER'),
-    'password': os.getenv('DB_PASSWORD'),
-    'database': os.getenv('DB_NAME')
-}
 
-@app.route('/api/food/monthly', methods=['GET'])
+def month_rows(cursor, year, month, user_id=None, all_users=False):
+    # (DATE, FOOD_INDEX, FOOD_NAME, FOOD_PT, FOOD_FAT, FOOD_CH, FOOD_KCAL) 날짜순.
+    # DATE 범위 조건이라 (ID, DATE) 인덱스와 그 달 파티션만 읽는다.
+    # archive.py가 Parquet로 옮긴 달은 파일의 행과 그 뒤에 추가된 행을 합친다
+    start, end = advice.month_bounds(int(year), int(month))
+    sql = """
+        SELECT DATE, FOOD_INDEX, FOOD_NAME, FOOD_PT, FOOD_FAT, FOOD_CH, FOOD_KCAL
+        FROM FOOD
+        WHERE DATE >= %s AND DATE < %s
+    """
+    params = [start, end]
+    if not all_users:
+        sql += " AND ID = %s"
+        params.append(user_id)
+
+    def read_db():
+        cursor.execute(sql + " ORDER BY DATE", params)
+        return cursor.fetchall()
+
+    if write_behind.ENABLED and not all_users:
+        # 아직 MySQL로 옮기지 않은 /api/send2 기록도 합친다
+        rows, pending = write_behind.read_with_pending(user_id, start, end, read_db)
+        rows = list(rows) + pending
+    else:
+        rows = read_db()
+
+    path = archive.archived_months(cursor).get((int(year), int(month)))
+    if path:
+        archived = archive.read_file(path, None if all_users else user_id)
+        rows = sorted(archived + list(rows), key=lambda row: (row[0], row[1]))
+    return rows
+
+
+# 전체 사용자의 월별 식단 (초기 버전 API, 테스트 스크립트에서 사용)
+@bp.route("/api/food/monthly", methods=["GET"])
+def get_all_users_monthly_food():
+    year = request.args.get("year")
+    month = request.args.get("month")
+
+    if not year or not month:
+        return jsonify({"error": "Year and month are required"}), 400
+
+    try:
+        year, month = int(year), int(month)
+    except ValueError:
+        return jsonify({"error": "Year and month must be integers."}), 400
+
+    connection = get_read_connection()
+    try:
+        with connection.cursor() as cursor:
+            results = month_rows(cursor, year, month, all_users=True)
+            monthly_data = {}
+
+            for row in results:
+                monthly_data.setdefault(row[0].day, []).append(
+                    {
+                        "food_index": row[1],
+                        "food_name": row[2],
+                        "protein": row[3],
+                        "fat": row[4],
+                        "carbohydrates": row[5],
+                        "calories": row[6],
+                    }
+                )
+
+            # Create a list of 31 days, each day is a list of food items (which may be empty)
+            grouped_data = [monthly_data.get(day, []) for day in range(1, 32)]
+
+            return jsonify(grouped_data)
+    finally:
+        connection.close()
+
+
+@bp.route("/api/monthly", methods=["POST"])
 def get_monthly_food():
-    year = request.args.get('year')
-    month = request.args.get('month')
-    
+    data = request.json
+    year = data.get("year")
+    month = data.get("month")
+    UID = data.get("UID")
     if not year or not month:
         return jsonify({"error": "Year and month are required"}), 400
 
-    connection = pymysql.connect(**db_config)
+    try:
+        year, month = int(year), int(month)
+    except ValueError:
+        return jsonify({"error": "Year and month must be integers."}), 400
+
+    connection = get_read_connection(UID)
     try:
         with connection.cursor() as cursor:
-            sql = """
-                SELECT DATE, FOOD_INDEX, FOOD_NAME, FOOD_PT, FOOD_FAT, FOOD_CH, FOOD_KCAL
-                FROM FOOD
-                WHERE YEAR(DATE) = %s AND MONTH(DATE) = %s
-                ORDER BY DATE
-            """
-            cursor.execute(sql, (year, month))
-            results = cursor.fetchall()
+            results = month_rows(cursor, year, month, UID)
             monthly_data = {}
 
             for row in results:
@@ -46,7 +117,7 @@ def get_monthly_food():
                     "protein": row[3],
                     "fat": row[4],
                     "carbohydrates": row[5],
-                    "calories": row[6]
+                    "calories": row[6],
                 }
 
                 # Ensuring the output order
@@ -56,7 +127,7 @@ def get_monthly_food():
                     "protein": food_info["protein"],
                     "fat": food_info["fat"],
                     "carbohydrates": food_info["carbohydrates"],
-                    "calories": food_info["calories"]
+                    "calories": food_info["calories"],
                 }
 
                 if day not in monthly_data:
@@ -67,9 +138,184 @@ def get_monthly_food():
             # Create a list of 31 days, each day is a list of food items (which may be empty)
             grouped_data = [monthly_data.get(day, []) for day in range(1, 32)]
 
-            return jsonify(grouped_data)
+            if responses.wants_columnar():
+                return responses.calendar_response(
+                    responses.columnar_days(grouped_data), columnar=True
+                )
+            return responses.calendar_response(grouped_data)
+    finally:
+        connection.close()
+
+
+def get_user_nutritional_needs(user_id):
+    connection = get_read_connection(user_id)
+    try:
+        with connection.cursor() as cursor:
+            sql = "SELECT BODY_WEIGHT, RDI FROM USER WHERE ID = %s"
+            cursor.execute(sql, (user_id,))
+            result = cursor.fetchone()
+            if result:
+                body_weight, rdi = result
+                return body_weight, rdi
+            else:
+                return None
+    except pymysql.MySQLError as e:
+        logging.error(f"Database error: {e}")
+        return None
     finally:
         connection.close()
 
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001)  # 다른 포트로 실행하여 send.py와 충돌 방지
\ No newline at end of file
+
+def month_totals(cursor, user_id, year, month):
+    # 그 달 USER_NT 하루 합계를 범위 조회 한 번으로: {일: (CARBO, PROTEIN, FAT, RD_CARBO, RD_PROTEIN, RD_FAT)}
+    # 이미 잡고 있는 커서를 쓴다 (날마다 풀에서 연결을 하나 더 잡으면 동시 요청끼리 풀을 다 써 버린다)
+    start, end = advice.month_bounds(year, month)
+    cursor.execute(
+        """
+        SELECT DATE, CARBO, PROTEIN, FAT, RD_CARBO, RD_PROTEIN, RD_FAT
+        FROM USER_NT
+        WHERE ID = %s AND DATE >= %s AND DATE < %s
+        """,
+        (user_id, start, end),
+    )
+    return {row[0].day: row[1:] for row in cursor.fetchall()}
+
+
+def get_monthly_data(year, month, user_id):
+    connection = get_read_connection(user_id)
+    try:
+        with connection.cursor() as cursor:
+            results = month_rows(cursor, year, month, user_id)
+
+            num_days = calendar.monthrange(year, month)[1]  # 해당 월의 일수 계산
+            foods_list = [[] for _ in range(num_days)]  # 각 날짜별 음식 리스트
+            percentages_list = [{} for _ in range(num_days)]  # 각 날짜별 백분율 리스트
+
+            for row in results:
+                day = row[0].day - 1  # 0-based index for lists
+                food_info = {
+                    "food_index": row[1],
+                    "food_name": row[2],
+                    "protein": row[3],
+                    "fat": row[4],
+                    "carbohydrates": row[5],
+                    "calories": row[6],
+                }
+                foods_list[day].append(food_info)
+
+            # Add daily percentages
+            totals = month_totals(cursor, user_id, year, month)
+            for day in range(num_days):
+                daily_totals = totals.get(day + 1)  # 1-based day for dates
+                if daily_totals:
+                    (
+                        carb_total,
+                        protein_total,
+                        fat_total,
+                        rd_carb,
+                        rd_protein,
+                        rd_fat,
+                    ) = daily_totals
+                    percentages_list[day] = {
+                        "carbohydrates_percentage": (
+                            round((carb_total / rd_carb) * 100, 1) if rd_carb > 0 else 0
+                        ),
+                        "protein_percentage": (
+                            round((protein_total / rd_protein) * 100, 1)
+                            if rd_protein > 0
+                            else 0
+                        ),
+                        "fat_percentage": (
+                            round((fat_total / rd_fat) * 100, 1) if rd_fat > 0 else 0
+                        ),
+                    }
+
+            return {"foods": foods_list, "percentages": percentages_list}
+    except pymysql.MySQLError as e:
+        logging.error(f"Database error: {e}")
+        return {"error": "Database error"}
+    finally:
+        connection.close()
+
+
+@bp.route("/api/food/quarterly", methods=["POST"])
+def get_quarterly_food():
+    data = request.json
+    year = data.get("year")
+    start_month = data.get("month")
+    user_id = data.get("UID")
+
+    if not year or not start_month or not user_id:
+        return jsonify({"error": "Year, start month, and user_id are required"}), 400
+
+    try:
+        year = int(year)
+        start_month = int(start_month)
+        if start_month < 1 or start_month > 12:
+            return (
+                jsonify(
+                    {"error": "Invalid month. Please enter a value between 1 and 12."}
+                ),
+                400,
+            )
+    except ValueError:
+        return jsonify({"error": "Year and month must be integers."}), 400
+
+    months = []
+    for i in range(-1, 2):  # 이전 달, 현재 달, 다음 달 순서로 데이터를 가져오기
+        month = (start_month + i - 1) % 12 + 1
+        current_year = year + (start_month + i - 1) // 12
+        months.append((current_year, month))
+
+    # 마감된 달은 야간 배치(batch.py)가 계산해 둔 스냅샷을 먼저 본다
+    try:
+        precomputed = summaries.load_summaries(
+            user_id, [m for m in months if summaries.is_closed_month(*m)]
+        )
+    except pymysql.MySQLError as e:
+        logging.error(f"Database error: {e}")
+        precomputed = {}
+
+    quarterly_data = {}
+    for current_year, month in months:
+        monthly_data = precomputed.get((current_year, month))
+        if monthly_data is None:
+            monthly_data = get_monthly_data(current_year, month, user_id)
+        quarterly_data[f"{current_year}-{str(month).zfill(2)}"] = monthly_data
+
+    if responses.wants_columnar():
+        for monthly_data in quarterly_data.values():
+            if "foods" in monthly_data:
+                monthly_data["foods"] = responses.columnar_days(monthly_data["foods"])
+        return responses.calendar_response(quarterly_data, columnar=True)
+    return responses.calendar_response(quarterly_data)
+
+
+# 한 달 요약 + 조언 (데이터가 바뀌지 않았으면 저장된 조언을 그대로 반환)
+@bp.route("/api/monthly/advice", methods=["POST"])
+def get_monthly_advice():
+    data = request.json
+    year = data.get("year")
+    month = data.get("month")
+    user_id = data.get("UID")
+
+    if not year or not month or not user_id:
+        return jsonify({"error": "Year, month, and UID are required"}), 400
+    try:
+        year = int(year)
+        month = int(month)
+        if month < 1 or month > 12:
+            return (
+                jsonify(
+                    {"error": "Invalid month. Please enter a value between 1 and 12."}
+                ),
+                400,
+            )
+    except ValueError:
+        return jsonify({"error": "Year and month must be integers."}), 400
+
+    try:
+        return jsonify(advice.get_advice(user_id, year, month)), 200
+    except pymysql.MySQLError as e:
+        logging.error(f"Database error: {e}")
+        return jsonify({"error": "Database error"}), 500
@@ -0,0 +1,218 @@
+# nutrition.py
+# 텍스트로 입력된 음식의 영양 정보 분석 (add_food, update_food, /api/send 에서 사용)
+# NUTRITION_BATCHING=1, SIMILAR_FOODS=1은 do()와 parse_meal()(add_food, /api/sync) 모두에 적용된다.
+
+import logging
+import os
+from typing import List
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.pydantic_v1 import BaseModel, Field
+from langchain_core.output_parsers import JsonOutputParser
+
+import similar
+from batcher import MicroBatcher
+from llm import get_model
+
+
+class NutritionInfo(BaseModel):
+    food_name: str = Field(description="The food name")
+    calorie: str = Field(description="The amount of Calories")
+    carbohydrate: str = Field(description="The amount of Carbohydrate")
+    protein: str = Field(description="The amount of Protein")
+    fat: str = Field(description="The amount of Fat")
+
+
+output_parser = JsonOutputParser(pydantic_object=NutritionInfo)
+
+prompt_template = ChatPromptTemplate.from_template(
+    """
+    음식이 입력되면 영양정보를 분석해줘
+    필수 요소는 음식 이름, 칼로리, 탄수화물, 단백질, 지방이야
+    입력: {string}
+    
+    {format_instructions}
+    """
+).partial(format_instructions=output_parser.get_format_instructions())
+
+
+def analyze(param):
+    print(f"Received input: {param}")  # Debugging 출력 추가
+    prompt_value = prompt_template.invoke({"string": param})
+    model_output = get_model("text").invoke(prompt_value)
+    output = output_parser.invoke(model_output)
+    return output
+
+
+# 여러 사용자의 입력을 한 번의 호출로 분석 (NUTRITION_BATCHING=1 일 때)
+class IndexedNutritionInfo(NutritionInfo):
+    index: int = Field(description="The number of the input this result is for")
+
+
+class NutritionBatch(BaseModel):
+    items: List[IndexedNutritionInfo] = Field(description="One entry per input, same order")
+
+
+batch_output_parser = JsonOutputParser(pydantic_object=NutritionBatch)
+
+batch_prompt_template = ChatPromptTemplate.from_template(
+    """
+    번호가 붙은 음식 입력 목록이야. 입력마다 따로 영양정보를 분석해줘
+    필수 요소는 음식 이름, 칼로리, 탄수화물, 단백질, 지방이고, index에는 입력 번호를 그대로 넣어줘
+    입력:
+    {inputs}
+
+    {format_instructions}
+    """
+).partial(format_instructions=batch_output_parser.get_format_instructions())
+
+
+def analyze_batch(params):
+    if len(params) == 1:
+        return [analyze(params[0])]
+    print(f"Received batched input: {params}")  # Debugging 출력 추가
+    inputs = "\n".join(f"{i}. {param}" for i, param in enumerate(params))
+    prompt_value = batch_prompt_template.invoke({"inputs": inputs})
+    model_output = get_model("text").invoke(prompt_value)
+    output = batch_output_parser.invoke(model_output)
+
+    by_index = {}
+    for item in output.get("items", []):
+        index = item.pop("index", None)
+        if isinstance(index, int) and 0 <= index < len(params):
+            by_index[index] = item
+    # 모델이 빠뜨린 입력은 하나씩 다시 분석한다
+    return [by_index[i] if i in by_index else analyze(param) for i, param in enumerate(params)]
+
+
+def _make_batcher(process_batch):
+    if os.getenv("NUTRITION_BATCHING") != "1":
+        return None
+    return MicroBatcher(
+        process_batch,
+        max_items=int(os.getenv("NUTRITION_BATCH_MAX_ITEMS", "8")),
+        max_wait_ms=int(os.getenv("NUTRITION_BATCH_MAX_WAIT_MS", "200")),
+    )
+
+
+_batcher = _make_batcher(analyze_batch)
+
+
+# 예전에 분석한 비슷한 이름("떡뽀끼" -> "떡볶이")이면 LLM 없이 저장된 값을 쓴다 (SIMILAR_FOODS=1)
+_similar = similar.get_index() if os.getenv("SIMILAR_FOODS") == "1" else None
+
+
+def do(param):
+    if _similar is not None:
+        stored = _similar.lookup(param)
+        if stored is not None:
+            return stored
+
+    if _batcher is None:
+        result = analyze(param)
+    else:
+        # 같은 입력을 기다리는 요청끼리 결과를 공유하므로 복사해서 돌려준다
+        result = dict(_batcher(param))
+
+    if _similar is not None:
+        try:
+            _similar.add(param, dict(result))
+        except Exception as e:
+            logging.warning(f"Similarity index update failed for {param}: {e}")
+    return result
+
+
+# 한 끼 식사("김밥 한 줄이랑 라면 하나, 콜라")를 음식별로 나눠 한 번의 호출로 분석
+class MealInfo(BaseModel):
+    items: List[NutritionInfo] = Field(description="One entry per food in the meal")
+
+
+meal_output_parser = JsonOutputParser(pydantic_object=MealInfo)
+
+meal_prompt_template = ChatPromptTemplate.from_template(
+    """
+    한 끼 식사가 입력되면 먹은 음식을 하나씩 나눠서 각각의 영양정보를 분석해줘
+    음식마다 음식 이름, 칼로리, 탄수화물, 단백질, 지방을 구하고 양(개수, 그릇 수)을 반영해줘
+    음식이 하나뿐이면 items에 하나만 넣어줘
+    입력: {string}
+
+    {format_instructions}
+    """
+).partial(format_instructions=meal_output_parser.get_format_instructions())
+
+
+def analyze_meal(param):
+    print(f"Received meal input: {param}")  # Debugging 출력 추가
+    prompt_value = meal_prompt_template.invoke({"string": param})
+    model_output = get_model("text").invoke(prompt_value)
+    output = meal_output_parser.invoke(model_output)
+    items = output.get("items", []) if isinstance(output, dict) else output
+    return [item for item in items if item.get("food_name")]
+
+
+# 여러 사용자의 식사 입력을 한 번의 호출로 (NUTRITION_BATCHING=1 일 때)
+class IndexedMealInfo(MealInfo):
+    index: int = Field(description="The number of the input this meal is for")
+
+
+class MealBatch(BaseModel):
+    meals: List[IndexedMealInfo] = Field(description="One entry per input, same order")
+
+
+meal_batch_output_parser = JsonOutputParser(pydantic_object=MealBatch)
+
+meal_batch_prompt_template = ChatPromptTemplate.from_template(
+    """
+    번호가 붙은 한 끼 식사 입력 목록이야. 입력마다 따로, 먹은 음식을 하나씩 나눠서 각각의 영양정보를 분석해줘
+    음식마다 음식 이름, 칼로리, 탄수화물, 단백질, 지방을 구하고 양(개수, 그릇 수)을 반영해줘
+    index에는 입력 번호를 그대로 넣어줘
+    입력:
+    {inputs}
+
+    {format_instructions}
+    """
+).partial(format_instructions=meal_batch_output_parser.get_format_instructions())
+
+
+def analyze_meal_batch(params):
+    if len(params) == 1:
+        return [analyze_meal(params[0])]
+    print(f"Received batched meal input: {params}")  # Debugging 출력 추가
+    inputs = "\n".join(f"{i}. {param}" for i, param in enumerate(params))
+    prompt_value = meal_batch_prompt_template.invoke({"inputs": inputs})
+    model_output = get_model("text").invoke(prompt_value)
+    output = meal_batch_output_parser.invoke(model_output)
+
+    by_index = {}
+    for meal in output.get("meals", []):
+        index = meal.get("index")
+        items = [item for item in meal.get("items", []) if item.get("food_name")]
+        if isinstance(index, int) and 0 <= index < len(params) and items:
+            by_index[index] = items
+    # 모델이 빠뜨린 입력은 하나씩 다시 분석한다
+    return [by_index[i] if i in by_index else analyze_meal(param) for i, param in enumerate(params)]
+
+
+_meal_batcher = _make_batcher(analyze_meal_batch)
+
+
+def parse_meal(param):
+    # 입력 전체가 예전에 분석한 음식 하나와 같으면 (양은 환산) LLM을 부르지 않는다
+    if _similar is not None:
+        stored = _similar.lookup(param)
+        if stored is not None:
+            return [stored]
+
+    if _meal_batcher is None:
+        items = analyze_meal(param)
+    else:
+        # 같은 입력을 기다리는 요청끼리 결과를 공유하므로 복사해서 돌려준다
+        items = [dict(item) for item in _meal_batcher(param)]
+
+    # 음식이 하나뿐이면 입력이 곧 그 음식의 이름과 양이다 (여럿이면 음식별 양을 알 수 없어 저장하지 않는다)
+    if _similar is not None and len(items) == 1:
+        try:
+            _similar.add(param, dict(items[0]))
+        except Exception as e:
+            logging.warning(f"Similarity index update failed for {param}: {e}")
+    return items
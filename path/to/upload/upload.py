@@ -1 +0,0 @@
-#안녕하세요
\ No newline at end of file
@@ -0,0 +1,246 @@
+# profiling.py
+# 요청 하나를 골라 샘플링 프로파일을 뜨고 speedscope 파일(https://www.speedscope.app)로 저장한다.
+# 요청 스레드의 스택을 PROFILE_INTERVAL_MS마다 읽는 벽시계 기준 프로파일이라
+# DB 연결/쿼리를 기다린 시간, 딕셔너리 만들기, jsonify가 모두 한 불꽃 그래프에 나온다.
+#
+# 켜는 방법 (둘 다 없으면 요청마다 설정값 확인 한 번 외에는 아무 일도 하지 않는다)
+#   X-Profile-Token 헤더    PROFILE_SECRET으로 서명한 토큰: python profiling.py token --ttl 600
+#   PROFILE_SAMPLE_EVERY=N  N번째 요청마다 하나씩
+#
+# 파일은 PROFILE_DIR/<시각>-<메서드>-<경로>-<ms>ms.speedscope.json, 최대 PROFILE_MAX_FILES개
+# (넘으면 오래된 것부터 지운다). 프로파일된 응답에는 X-Profile 헤더로 파일 이름을 붙인다.
+#
+#   GET /api/profiles              (X-Profile-Token 필요) 저장된 프로파일 목록
+#   GET /api/profiles/<name>       (X-Profile-Token 필요) 파일 받기
+
+import argparse
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from flask import Blueprint, request, jsonify, send_from_directory, g
+
+bp = Blueprint("profiling", __name__)
+
+SECRET = os.getenv("PROFILE_SECRET", "")
+SAMPLE_EVERY = int(os.getenv("PROFILE_SAMPLE_EVERY", "0"))  # 0: 샘플링 안 함
+INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "2")) / 1000
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+MAX_ACTIVE = int(os.getenv("PROFILE_MAX_ACTIVE", "2"))  # 동시에 프로파일하는 요청 수
+TOKEN_HEADER = "X-Profile-Token"
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+_requests = itertools.count(1)
+_active = threading.BoundedSemaphore(MAX_ACTIVE)
+_write_lock = threading.Lock()
+_stats = {"profiled": 0, "skipped_busy": 0, "deleted": 0}
+
+
+def make_token(ttl, secret=SECRET, now=None):
+    # "<만료 unix 시각>.<HMAC-SHA256>"
+    expires = int((now or time.time()) + ttl)
+    signature = hmac.new(secret.encode(), str(expires).encode(), hashlib.sha256).hexdigest()
+    return f"{expires}.{signature}"
+
+
+def valid_token(token, secret=SECRET, now=None):
+    if not secret or not token:
+        return False
+    expires, _, signature = token.partition(".")
+    if not expires.isdigit() or int(expires) < (now or time.time()):
+        return False
+    expected = hmac.new(secret.encode(), expires.encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(signature, expected)
+
+
+class Sampler(threading.Thread):
+    # 다른 스레드(요청 스레드)의 현재 스택을 주기적으로 읽는다
+    def __init__(self, thread_id, interval=INTERVAL):
+        super().__init__(name=f"profiler-{thread_id}", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.frames = {}  # (이름, 파일, 줄) -> speedscope 프레임 번호
+        self.samples = []
+        self.weights = []  # 샘플마다 지난 샘플 이후 흐른 시간(ms)
+        self._done = threading.Event()
+
+    def run(self):
+        last = self.started = time.perf_counter()
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                key = (code.co_qualname, code.co_filename, code.co_firstlineno)
+                stack.append(self.frames.setdefault(key, len(self.frames)))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append(stack)
+            self.weights.append(round((now - last) * 1000, 3))
+            last = now
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def speedscope(self, name):
+        frames = [{"name": n, "file": f, "line": line} for (n, f, line) in self.frames]
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "profiling.py",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": name,
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": round(sum(self.weights), 3),
+                    "samples": self.samples,
+                    "weights": self.weights,
+                }
+            ],
+        }
+
+
+def _wanted():
+    if SECRET and request.headers.get(TOKEN_HEADER):
+        return valid_token(request.headers[TOKEN_HEADER])
+    return SAMPLE_EVERY > 0 and next(_requests) % SAMPLE_EVERY == 0
+
+
+def _slug(path):
+    return re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_")[:60] or "root"
+
+
+def list_profiles(directory=PROFILE_DIR):
+    if not os.path.isdir(directory):
+        return []
+    names = [name for name in os.listdir(directory) if name.endswith(".speedscope.json")]
+    return sorted(names, key=lambda name: os.path.getmtime(os.path.join(directory, name)))
+
+
+def _save(document, filename):
+    # 파일 수 상한을 넘으면 오래된 것부터 지운다
+    with _write_lock:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(os.path.join(PROFILE_DIR, filename), "w", encoding="utf-8") as f:
+            json.dump(document, f, separators=(",", ":"))
+        _stats["profiled"] += 1
+        names = list_profiles()
+        for name in names[: max(0, len(names) - MAX_FILES)]:
+            os.remove(os.path.join(PROFILE_DIR, name))
+            _stats["deleted"] += 1
+
+
+@bp.before_app_request
+def start_profile():
+    if not (SECRET or SAMPLE_EVERY) or request.blueprint == bp.name or not _wanted():
+        return
+    # 프로파일러가 동시에 너무 많이 돌면 그 자체가 지연을 만든다
+    if not _active.acquire(blocking=False):
+        with _write_lock:
+            _stats["skipped_busy"] += 1
+        return
+    sampler = Sampler(threading.get_ident())
+    g.profiler = sampler
+    g.profile_started = time.perf_counter()
+    sampler.start()
+
+
+def _finish():
+    sampler = g.pop("profiler", None)
+    if sampler is None:
+        return None
+    try:
+        sampler.stop()
+        elapsed_ms = round((time.perf_counter() - g.pop("profile_started")) * 1000)
+        route = request.url_rule.rule if request.url_rule else request.path
+        name = f"{request.method} {route} {elapsed_ms}ms"
+        filename = (
+            f"{time.strftime('%Y%m%dT%H%M%S')}-{threading.get_ident() % 10000:04d}-"
+            f"{request.method}-{_slug(route)}-{elapsed_ms}ms.speedscope.json"
+        )
+        _save(sampler.speedscope(name), filename)
+        return filename
+    finally:
+        _active.release()
+
+
+@bp.after_app_request
+def finish_profile(response):
+    # 스트리밍 응답은 본문을 만들기 전까지만 잡힌다
+    filename = _finish()
+    if filename:
+        response.headers["X-Profile"] = filename
+    return response
+
+
+@bp.teardown_app_request
+def abandon_profile(error):
+    # after_request까지 가지 못한 요청도 샘플러는 멈춘다
+    if "profiler" in g:
+        _finish()
+
+
+def stats():
+    return {
+        "token": bool(SECRET),
+        "sample_every": SAMPLE_EVERY,
+        "stored": len(list_profiles()),
+        "max_files": MAX_FILES,
+        **_stats,
+    }
+
+
+def _authorized():
+    return valid_token(request.headers.get(TOKEN_HEADER))
+
+
+@bp.route("/api/profiles", methods=["GET"])
+def get_profiles():
+    if not _authorized():
+        return jsonify({"error": "valid X-Profile-Token required"}), 403
+    return jsonify({"profiles": list_profiles()[::-1], "stats": stats()}), 200
+
+
+@bp.route("/api/profiles/<name>", methods=["GET"])
+def get_profile(name):
+    if not _authorized():
+        return jsonify({"error": "valid X-Profile-Token required"}), 403
+    if name not in list_profiles():
+        return jsonify({"error": "profile not found"}), 404
+    return send_from_directory(os.path.abspath(PROFILE_DIR), name, mimetype="application/json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request profiling")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("token", help="print an X-Profile-Token signed with PROFILE_SECRET")
+    p.add_argument("--ttl", type=int, default=600, help="seconds the token stays valid")
+    sub.add_parser("list", help="stored profiles, oldest first")
+    args = parser.parse_args()
+
+    if args.command == "token":
+        if not SECRET:
+            sys.exit("PROFILE_SECRET is not set")
+        print(make_token(args.ttl))
+        return
+    for name in list_profiles():
+        print(os.path.join(PROFILE_DIR, name))
+
+
+if __name__ == "__main__":
+    main()
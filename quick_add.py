@@ -0,0 +1,148 @@
+# quick_add.py
+# 자주/최근 먹은 음식 목록과 빠른 추가: 예전 FOOD 행의 영양 정보를 새 날짜로 복사한다.
+# 복사는 INSERT ... SELECT 한 문장이라 LLM을 부르지 않고 DB 왕복 한 번으로 끝난다.
+
+from flask import Blueprint, request, jsonify
+import pymysql
+
+import autocomplete
+import cache
+import detail
+import foods
+import summaries
+from db import get_connection
+
+bp = Blueprint("quick_add", __name__)
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+INSERT_RETRIES = 3
+
+# ID -> {"recent": [...], "favorites": [...]}. 음식을 추가하면 invalidate()로 지운다
+quick_cache = cache.get_cache("quick_foods", maxsize=5000, ttl=600)
+
+
+def invalidate(user_id):
+    quick_cache.delete(str(user_id))
+    autocomplete.invalidate(user_id)
+
+
+def quick_foods(user_id):
+    key = str(user_id)
+    cached = quick_cache.get(key)
+    if cached is not None:
+        return cached
+    epoch = quick_cache.epoch()
+
+    connection = get_connection()
+    try:
+        with connection.cursor() as cursor:
+            history = foods.food_history(cursor, user_id)
+    finally:
+        connection.close()
+
+    # history는 최근에 먹은 순서. 자주 먹은 순서는 횟수가 같으면 최근 것이 앞에 온다
+    result = {
+        "recent": history[:MAX_LIMIT],
+        "favorites": sorted(history, key=lambda entry: entry["count"], reverse=True)[:MAX_LIMIT],
+    }
+    quick_cache.set(key, result, epoch=epoch)
+    return result
+
+
+def _list_response(kind):
+    user_id = request.args.get("ID")
+    limit = min(request.args.get("limit", DEFAULT_LIMIT, type=int), MAX_LIMIT)
+    if not user_id:
+        return jsonify({"error": "ID is required"}), 400
+    try:
+        items = quick_foods(user_id)[kind][:limit]
+    except pymysql.MySQLError as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"items": items}), 200
+
+
+@bp.route("/api/food/recent", methods=["GET"])
+def recent():
+    return _list_response("recent")
+
+
+@bp.route("/api/food/favorites", methods=["GET"])
+def favorites():
+    return _list_response("favorites")
+
+
+def copy_food(cursor, user_id, date, source_date, source_index):
+    # 새 FOOD_INDEX(그날 최댓값 + 1)를 LAST_INSERT_ID(expr)로 돌려받아 다시 조회하지 않는다
+    cursor.execute(
+        """
+        INSERT INTO FOOD (ID, DATE, FOOD_INDEX, FOOD_NAME, FOOD_CH, FOOD_PT, FOOD_FAT, FOOD_KCAL)
+        SELECT %s, %s,
+               LAST_INSERT_ID((SELECT COALESCE(MAX(F.FOOD_INDEX) + 1, 0)
+                               FROM FOOD F WHERE F.ID = %s AND F.DATE = %s)),
+               FOOD_NAME, FOOD_CH, FOOD_PT, FOOD_FAT, FOOD_KCAL
+        FROM FOOD
+        WHERE ID = %s AND DATE = %s AND FOOD_INDEX = %s
+        """,
+        (user_id, date, user_id, date, user_id, source_date, source_index),
+    )
+    if cursor.rowcount == 0:
+        return None
+    return cursor.lastrowid
+
+
+@bp.route("/api/food/quick_add", methods=["POST"])
+def quick_add():
+    data = request.json or {}
+    user_id = data.get("ID")
+    date = data.get("DATE")
+    source_date = data.get("SOURCE_DATE")
+    source_index = data.get("SOURCE_FOOD_INDEX")
+
+    if not user_id or not date or not source_date or source_index in (None, ""):
+        return jsonify({"error": "필수 정보가 누락되었습니다."}), 400
+
+    try:
+        connection = get_connection()
+    except pymysql.MySQLError as e:
+        return jsonify({"error": str(e)}), 500
+
+    try:
+        for attempt in range(INSERT_RETRIES):
+            try:
+                with connection.cursor() as cursor:
+                    food_index = copy_food(cursor, user_id, date, source_date, source_index)
+                    if food_index is None:
+                        return jsonify({"error": "복사할 음식이 없습니다."}), 404
+                    # 마감된 달만 MONTHLY_SUMMARY 스냅샷이 있다
+                    if summaries.is_closed_month(int(date[:4]), int(date[5:7])):
+                        summaries.invalidate_month(cursor, user_id, date)
+                connection.commit()
+                break
+            except pymysql.IntegrityError:
+                # 같은 날짜에 동시에 추가되어 FOOD_INDEX가 겹쳤다
+                connection.rollback()
+                if attempt == INSERT_RETRIES - 1:
+                    raise
+    except pymysql.MySQLError as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        connection.close()
+
+    detail.invalidate(user_id, date)
+    invalidate(user_id)
+    return (
+        jsonify(
+            {
+                "message": "음식이 성공적으로 추가되었습니다.",
+                "data": {
+                    "ID": user_id,
+                    "DATE": date,
+                    "FOOD_INDEX": food_index,
+                    "SOURCE_DATE": source_date,
+                    "SOURCE_FOOD_INDEX": source_index,
+                },
+            }
+        ),
+        201,
+    )
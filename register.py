@@ -1,87 +1,75 @@
-from flask import Flask, request, jsonify
-import mysql.connector
-from mysql.connector import Error
-from dotenv import load_dotenv
-import os
-
-print("Loading .env file...")
-load_dotenv()
-
-db_host = os.getenv('DB_HOST')
-db_name = os.getenv('DB_NAME')
-db_user = os.getenv('DB_USER')
-db_password = os.getenv('DB_PASS')
-
-# 환경 변수 확인을 위한 디버그 출력
-print(f"DB_HOST: {db_host}")
-print(f"DB_NAME: {db_name}")
-print(f"DB_USER: {db_user}")
-print(f"DB_PASSWORD: {db_password}")
-
-app = Flask(__name__)
-
-# 데이터베이스 연결 설정
-def create_db_connection():
-    try:
-        print("Attempting to connect to the database...")
-        connection = mysql.connector.connect(
-            host=db_host,
-            database=db_name,
-            user=db_user,
-            password=db_password
-        )
-        print("Database connection successful!")
-        return connection
-    except Error as e:
-        print(f"Error connecting to MySQL database: {e}")
-        return None
-
-@app.route('/api/register', methods=['POST'])
+from flask import Blueprint, request, jsonify
+import pymysql
+
+import cache
+import storage
+from db import create_db_connection, mark_write
+
+bp = Blueprint("register", __name__)
+
+# GET /api/register 응답 (사용자별 권장 섭취량), PUT 시 무효화
+profile_cache = cache.get_cache("profile")
+
+
+@bp.route("/api/register", methods=["GET", "POST", "PUT"])
 def register():
+    if request.method == "GET":
+        user_id = request.args.get("id")
+        if not user_id:
+            return jsonify({"error": "User ID is required"}), 400
+
+        cached = profile_cache.get(user_id)
+        if cached is not None:
+            return jsonify(cached), 200
+        epoch = profile_cache.epoch()
+
+        try:
+            nutrients_result = storage.get_storage().nutrient_targets(user_id)
+        except storage.DatabaseError as e:
+            print(f"Database query error: {e}")
+            return jsonify({"error": "Database query failed"}), 500
+        if nutrients_result is None:
+            return jsonify({"error": "User NT not found"}), 404
+
+        rd_protein, rd_carbo, rd_fat = nutrients_result
+        result = {
+            "RD_PROTEIN": rd_protein,
+            "RD_CARBO": rd_carbo,
+            "RD_FAT": rd_fat,
+        }
+        profile_cache.set(user_id, result, epoch=epoch)
+        return jsonify(result), 200
+
     data = request.json
-    
-    if not data or 'id' not in data or 'pw' not in data:
-        return jsonify({"error": "Invalid input"}), 400
 
-    connection = create_db_connection()
-    if connection is None:
-        return jsonify({"error": "Database connection failed"}), 500
+    if not data or "id" not in data or "pw" not in data:
+        return jsonify({"error": "Invalid input"}), 400
 
     try:
-        cursor = connection.cursor()
-        query = """INSERT INTO USER (ID, PASSWORD, BODY_WEIGHT, HEIGHT, AGE, GENDER, ACTIVITY, RDI) 
-                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"""
-        values = (
-            data['id'],
-            data['pw'],
-            data['bodyweight'],
-            data['height'],
-            data['age'],
-            data['gender'],
-            data['activity'],
-            None  # RDI 값을 기본값으로 설정 (필요에 따라 계산 후 설정 가능)
-        )
-        cursor.execute(query, values)
-        connection.commit()
-        return jsonify({"message": "User registered successfully"}), 201
-    except Error as e:
-        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
+        if request.method == "PUT":
+            storage.get_storage().update_user(data)
+        else:  # POST
+            storage.get_storage().create_user(data)
+    except storage.DatabaseError as e:
+        print(f"Database query error: {e}")
+        return jsonify({"error": "Database query failed"}), 500
+
+    mark_write(data["id"])
+    profile_cache.delete(data["id"])
+    return jsonify({"message": "User registered successfully"}), 201
+
 
-# 애플리케이션 시작 시 임의의 데이터 삽입
+# 임의의 테스트 사용자 삽입 (python register.py)
 def insert_test_data():
     print("Inserting test data...")
     data = {
-        'id': "admin2",
-        'pw': '2',
-        'bodyweight': 70,
-        'height': 178,
-        'age': 25,
-        'gender': 1,
-        'activity': 5
+        "id": "admin2",
+        "pw": "2",
+        "bodyweight": 70,
+        "height": 178,
+        "age": 25,
+        "gender": 1,
+        "activity": 5,
     }
 
     connection = create_db_connection()
@@ -90,30 +78,27 @@ def insert_test_data():
         return
 
     try:
-        cursor = connection.cursor()
-        query = """INSERT INTO USER (ID, PASSWORD, BODY_WEIGHT, HEIGHT, AGE, GENDER, ACTIVITY, RDI) 
-                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"""
-        values = (
-            data['id'],
-            data['pw'],
-            data['bodyweight'],
-            data['height'],
-            data['age'],
-            data['gender'],
-            data['activity'],
-            None  # RDI 값을 기본값으로 설정 (필요에 따라 계산 후 설정 가능)
-        )
-        cursor.execute(query, values)
+        with connection.cursor() as cursor:
+            query = """INSERT INTO USER (ID, PASSWORD, BODY_WEIGHT, HEIGHT, AGE, GENDER, ACTIVITY, RDI) 
+                       VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"""
+            values = (
+                data["id"],
+                data["pw"],
+                data["bodyweight"],
+                data["height"],
+                data["age"],
+                data["gender"],
+                data["activity"],
+                None,  # RDI 값을 기본값으로 설정 (필요에 따라 계산 후 설정 가능)
+            )
+            cursor.execute(query, values)
         connection.commit()
         print("Test user inserted successfully")
-    except Error as e:
+    except pymysql.MySQLError as e:
         print(f"An error occurred: {str(e)}")
     finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
-
-if __name__ == '__main__':
-    print("Starting application…")
-    insert_test_data()  # 애플리케이션 시작 시 테스트 데이터 삽입
-    app.run(debug=True)  # 기본 포트(5000)에서 실행
\ No newline at end of file
+        connection.close()
+
+
+if __name__ == "__main__":
+    insert_test_data()
@@ -0,0 +1,77 @@
+# responses.py
+# 달력 응답용 직렬화: orjson 인코딩, 컬럼형(columnar) 레이아웃, gzip/brotli 압축
+
+import gzip
+import os
+from decimal import Decimal
+
+import orjson
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # brotli가 없으면 gzip만 사용
+    brotli = None
+
+COLUMNAR_MIMETYPE = "application/vnd.whip.columnar+json"
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+FOOD_FIELDS = ["food_index", "food_name", "protein", "fat", "carbohydrates", "calories"]
+
+
+def wants_columnar():
+    if request.args.get("layout") == "columnar":
+        return True
+    # 동점이면 기존 JSON 형식을 우선한다 (*/* 를 보내는 기존 클라이언트)
+    best = request.accept_mimetypes.best_match(["application/json", COLUMNAR_MIMETYPE])
+    return best == COLUMNAR_MIMETYPE
+
+
+def columnar_days(days, fields=FOOD_FIELDS):
+    # [[{...}, {...}], [], ...] -> 필드별 배열 + 날짜별 시작 위치
+    # day i의 음식은 columns[f][day_offsets[i]:day_offsets[i + 1]]
+    columns = {field: [] for field in fields}
+    day_offsets = [0]
+    for foods in days:
+        for food in foods:
+            for field in fields:
+                columns[field].append(food.get(field))
+        day_offsets.append(day_offsets[-1] + len(foods))
+    return {"fields": fields, "columns": columns, "day_offsets": day_offsets}
+
+
+def _default(obj):
+    # Flask의 기본 JSON 변환과 같게 Decimal은 문자열로 내보낸다
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError
+
+
+def _negotiate_encoding():
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return request.accept_encodings.best_match(offered)
+
+
+def calendar_response(payload, columnar=False, status=200):
+    body = orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    response = Response(
+        body,
+        status=status,
+        mimetype=COLUMNAR_MIMETYPE if columnar else "application/json",
+    )
+    response.vary.add("Accept")
+    response.vary.add("Accept-Encoding")
+
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    encoding = _negotiate_encoding()
+    if encoding == "br":
+        response.set_data(brotli.compress(body, quality=BROTLI_QUALITY))
+    elif encoding == "gzip":
+        response.set_data(gzip.compress(body, compresslevel=GZIP_LEVEL))
+    else:
+        return response
+    response.headers["Content-Encoding"] = encoding
+    return response
@@ -0,0 +1,97 @@
+# rollups.py
+# 기간 집계: 일/ISO 주/월 버킷별 kcal, 탄수화물, 단백질, 지방의 합계와 하루 평균.
+# DB에서 GROUP BY 한 번으로 계산하므로 1년치 주간 추세도 쿼리 하나, 응답 몇 KB다.
+#
+#   GET /api/food/rollups?ID=user&start=2026-01-01&end=2026-12-31&granularity=week
+
+from datetime import datetime, timedelta
+
+from flask import Blueprint, request, jsonify
+
+import responses
+import storage
+
+bp = Blueprint("rollups", __name__)
+
+MAX_BUCKETS = 800
+NUTRIENTS = ("kcal", "carbohydrate", "protein", "fat")
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def bucket_label(start, granularity):
+    if granularity == "week":
+        year, week, _ = start.isocalendar()
+        return f"{year}-W{week:02d}"
+    if granularity == "month":
+        return start.strftime("%Y-%m")
+    return start.isoformat()
+
+
+def bucket_count(start, end, granularity):
+    # [start, end]에 걸치는 버킷 수
+    if granularity == "week":
+        first = storage.bucket_start(start, "week")
+        return (end - first).days // 7 + 1
+    if granularity == "month":
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    return (end - start).days + 1
+
+
+def rollup(user_id, start, end, granularity):
+    # start, end 모두 포함
+    buckets = []
+    rows = storage.get_storage().rollups(user_id, start, end + timedelta(days=1), granularity)
+    for bucket, days, foods, *sums in rows:
+        buckets.append(
+            {
+                "bucket": bucket_label(bucket, granularity),
+                "start": bucket.isoformat(),
+                "days": days,
+                "foods": foods,
+                "sum": {name: round(value, 1) for name, value in zip(NUTRIENTS, sums)},
+                # 기록한 날 기준 하루 평균
+                "avg": {
+                    name: round(value / days, 1) if days else None
+                    for name, value in zip(NUTRIENTS, sums)
+                },
+            }
+        )
+    return buckets
+
+
+@bp.route("/api/food/rollups", methods=["GET"])
+def get_rollups():
+    user_id = request.args.get("ID")
+    start = _parse_date(request.args.get("start"))
+    end = _parse_date(request.args.get("end"))
+    granularity = request.args.get("granularity", "day")
+
+    if not user_id or start is None or end is None:
+        return jsonify({"error": "ID, start and end (YYYY-MM-DD) are required"}), 400
+    if start > end:
+        return jsonify({"error": "start must not be after end"}), 400
+    if granularity not in storage.ROLLUP_GRANULARITIES:
+        return jsonify({"error": "granularity must be one of day, week, month"}), 400
+    if bucket_count(start, end, granularity) > MAX_BUCKETS:
+        return jsonify({"error": f"too many {granularity} buckets (max {MAX_BUCKETS})"}), 400
+
+    try:
+        buckets = rollup(user_id, start, end, granularity)
+    except storage.DatabaseError as e:
+        return jsonify({"error": str(e)}), 500
+
+    return responses.calendar_response(
+        {
+            "ID": user_id,
+            "granularity": granularity,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "buckets": buckets,
+        }
+    )
@@ -1,60 +1,52 @@
 # send.py
 
-from flask import Flask, request, jsonify
-import pymysql
-import os
-from dotenv import load_dotenv
+from flask import Blueprint, request, jsonify
 from datetime import datetime
-import llm
 
-load_dotenv()
+import detail
+import quick_add
+import storage
+import write_behind
+from nutrition import do
 
-app = Flask(__name__)
+bp = Blueprint("send", __name__)
 
-# DB Connection
-db_config = {
-    'host': os.getenv('DB_HOST'),
-    'user': os.getenv('DB_USER'),
-    'password': os.getenv('DB_PASSWORD'),
-    'database': os.getenv('DB_NAME')
-}
 
 def save_to_db(user_id, nutrition_info):
-    connection = pymysql.connect(**db_config)
-    try:
-        with connection.cursor() as cursor:
-            sql = """
-                INSERT INTO FOOD (ID, DATE, FOOD_NAME, FOOD_PT, FOOD_FAT, FOOD_CH, FOOD_KCAL)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """
-            cursor.execute(sql, (
-                user_id,
-                datetime.now(),
-                nutrition_info['food_name'],
-                nutrition_info['protein'],
-                nutrition_info['fat'],
-                nutrition_info['carbohydrate'],
-                nutrition_info['calorie']
-            ))
-            print("Data saved to database")  # Debugging 출력 추가
-        connection.commit()
-    finally:
-        connection.close()
-
-@app.route('/api/send', methods=['POST'])
+    now = datetime.now()
+    storage.get_storage().add_foods(user_id, now, [nutrition_info])
+    print("Data saved to database")  # Debugging 출력 추가
+    detail.invalidate(user_id, now)
+    quick_add.invalidate(user_id)
+
+
+@bp.route("/api/send", methods=["POST"])
 def send():
     data = request.json
-    user_id = data.get('user_id')
-    food_name = data.get('food_name')
-    
+    user_id = data.get("user_id")
+    food_name = data.get("food_name")
+
     if not user_id or not food_name:
         return jsonify({"error": "user_id and food_name are required"}), 400
 
-    nutrition_info = llm.do(food_name)
-    
-    save_to_db(user_id, nutrition_info)
-    
+    nutrition_info = do(food_name)
+
+    # 저장은 사용자가 확인한 뒤 /api/send2 로 한다
     return jsonify(nutrition_info)
 
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
+
+@bp.route("/api/send2", methods=["POST"])
+def send2():
+    data = request.json
+    user_id = data.get("user_id")
+    nutrition_info = data.get("nutrition_info")
+    print(data)
+    try:
+        if write_behind.ENABLED:
+            # 로컬 큐에 남기고 바로 응답, MySQL에는 백그라운드에서 모아서 넣는다
+            write_behind.enqueue(user_id, nutrition_info)
+        else:
+            save_to_db(user_id, nutrition_info)
+        return jsonify({"message": "good"}), 200
+    except:
+        return jsonify({"message": "DB save error"}), 500
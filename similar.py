@@ -0,0 +1,343 @@
+# similar.py
+# 이미 분석한 음식 이름을 벡터로 저장해 두고, 비슷한 이름("떡뽀끼", "국물떡볶이")이 들어오면
+# LLM 대신 저장된 영양 정보를 돌려준다 (SIMILAR_FOODS=1 일 때 nutrition.do, parse_meal에서 사용).
+#
+# 양 표현("돈까스 3개", "치킨 반마리")은 떼어 내고 음식 이름끼리만 비교한 뒤, 저장된 1단위 영양 정보에
+# 양을 곱해 돌려준다. 단위가 다르면("치킨 한마리" / "치킨 1조각") 환산할 수 없으므로 쓰지 않는다.
+#
+# 임베딩은 AZURE_OPENAI_EMBEDDING_DEPLOYMENT가 있으면 Azure 임베딩,
+# 없으면 자모 n-gram 해시 벡터(네트워크 없음)를 쓴다.
+# 검색은 NumPy 코사인 전수 탐색, 항목이 많고 hnswlib가 있으면 HNSW 인덱스.
+#
+#   python similar.py query 떡뽀끼
+#   python similar.py tune similar_pairs.csv   # "입력1,입력2,바꿔 써도 되는지(1/0)" 로 임계값 고르기
+#   python similar.py stats
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+from hangul import fold, normalize
+
+INDEX_DIR = os.getenv("SIMILAR_INDEX_DIR", "similar_index")
+# similar_pairs.csv에서 다른 음식을 같은 음식으로 보는 경우가 없는 가장 낮은 값 (자모 해시 임베딩 기준).
+# Azure 임베딩을 쓰면 `python similar.py tune similar_pairs.csv`로 다시 고른다
+THRESHOLD = float(os.getenv("SIMILAR_THRESHOLD", "0.76"))
+HASH_DIMS = 512
+NGRAM_SIZES = (2, 3)
+HNSW_MIN_ITEMS = int(os.getenv("SIMILAR_HNSW_MIN_ITEMS", "50000"))
+LOOKUP_CANDIDATES = 5  # 이름이 비슷한 항목 중 단위가 맞는 것을 찾을 때 보는 수
+
+NUMBER_WORDS = {
+    "한": 1, "하나": 1, "두": 2, "둘": 2, "세": 3, "셋": 3, "석": 3, "네": 4, "넷": 4,
+    "다섯": 5, "여섯": 6, "일곱": 7, "여덟": 8, "아홉": 9, "열": 10, "반": 0.5,
+}
+PORTION_UNITS = (
+    "인분", "그릇", "마리", "조각", "공기", "접시", "봉지", "숟가락", "큰술", "스쿱",
+    "개", "줄", "잔", "컵", "봉", "캔", "병", "장", "쪽", "판", "알", "팩", "통",
+    "kg", "g", "그램", "ml", "L",
+)
+# "돈까스 2개", "치킨 반마리", "밥 1/2공기", "김밥 한 줄 먹었어" (이름 뒤에 붙은 양만)
+_PORTION = re.compile(
+    r"\s*(?P<number>\d+/\d+|\d+(?:\.\d+)?|"
+    + "|".join(sorted(NUMBER_WORDS, key=len, reverse=True))
+    + r")\s*(?P<unit>"
+    + "|".join(PORTION_UNITS)
+    + r")(?:\s*(?:먹었어|먹었다|먹었음|먹음))?\s*$"
+)
+_LEADING_NUMBER = re.compile(r"^\s*(\d+(?:\.\d+)?)(.*)$", re.S)
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+
+def split_portion(text):
+    # "치킨 반마리" -> ("치킨", 0.5, "마리"). 양이 없으면 (이름, 1.0, None)
+    match = _PORTION.search(text)
+    if match is None or match.start() == 0:
+        return text.strip(), 1.0, None
+    number = match["number"]
+    if number in NUMBER_WORDS:
+        quantity = float(NUMBER_WORDS[number])
+    elif "/" in number:
+        numerator, denominator = number.split("/")
+        quantity = float(numerator) / float(denominator) if float(denominator) else 0.0
+    else:
+        quantity = float(number)
+    if quantity <= 0:
+        return text.strip(), 1.0, None
+    return text[: match.start()].strip(), quantity, match["unit"]
+
+
+def scale_nutrition(nutrition, factor, digits=1):
+    # 숫자나 "350kcal"처럼 숫자로 시작하는 값에 factor를 곱한다. 읽을 수 없는 값이 있으면 None
+    scaled = {}
+    for key, value in nutrition.items():
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, (int, float)):
+            scaled[key] = round(value * factor, digits)
+            continue
+        match = _LEADING_NUMBER.match(str(value))
+        if match is None:
+            return None
+        scaled[key] = f"{round(float(match[1]) * factor, digits):g}{match[2]}"
+    return scaled
+
+
+def _hash_embed(texts):
+    # 자모 단위 2/3-gram을 해시해 단위 벡터로 만든다. 오타, 된소리, 덧붙은 수식어에 강하다
+    vectors = np.zeros((len(texts), HASH_DIMS), dtype=np.float32)
+    for row, text in enumerate(texts):
+        jamo = f"^{fold(normalize(text))}$"
+        for n in NGRAM_SIZES:
+            for i in range(len(jamo) - n + 1):
+                digest = hashlib.blake2b(jamo[i : i + n].encode(), digest_size=4).digest()
+                vectors[row, int.from_bytes(digest, "little") % HASH_DIMS] += 1.0
+    return vectors
+
+
+_azure_embeddings = None
+
+
+def embed(texts):
+    global _azure_embeddings
+    deployment = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT")
+    if deployment:
+        if _azure_embeddings is None:
+            from langchain_openai import AzureOpenAIEmbeddings
+
+            _azure_embeddings = AzureOpenAIEmbeddings(azure_deployment=deployment)
+        vectors = np.asarray(_azure_embeddings.embed_documents(list(texts)), dtype=np.float32)
+    else:
+        vectors = _hash_embed(texts)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class SimilarityIndex:
+    # entries.jsonl(입력, 음식 이름, 단위, 1단위 영양 정보)과 vectors.f32(같은 순서의 이름 벡터)에 이어 쓰기만 한다
+    def __init__(self, directory=INDEX_DIR):
+        self.directory = directory
+        self._entries_path = os.path.join(directory, "entries.jsonl")
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._lock = threading.Lock()
+        self.entries = []
+        self._keys = {}  # (정규화한 이름, 단위) -> 위치
+        self.vectors = None
+        self._hnsw = None
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self._entries_path):
+            return
+        with open(self._entries_path, encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        if any("name" not in entry for entry in entries):
+            self._migrate(entries)
+            return
+        vectors = np.fromfile(self._vectors_path, dtype=np.float32)
+        if entries:
+            vectors = vectors.reshape(-1, vectors.size // len(entries))[: len(entries)]
+            self.vectors = vectors
+        self.entries = entries
+        self._keys = {(normalize(entry["name"]), entry["unit"]): i for i, entry in enumerate(entries)}
+
+    def _migrate(self, entries):
+        # 입력 전체를 임베딩하던 예전 인덱스: 양을 떼어 낸 이름으로 다시 만들어 덮어쓴다
+        migrated = []
+        for entry in entries:
+            new = self._entry(entry["text"], entry["nutrition"])
+            if new is not None:
+                migrated.append(new)
+        self.entries = []
+        self._keys = {}
+        self.vectors = None
+        os.makedirs(self.directory, exist_ok=True)
+        for path in (self._entries_path, self._vectors_path):
+            if os.path.exists(path):
+                os.replace(path, path + ".old")
+        for entry in migrated:
+            self._append(entry, embed([entry["name"]])[0])
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _search(self, vector, k):
+        if self._hnsw is None and hnswlib is not None and len(self.entries) >= HNSW_MIN_ITEMS:
+            index = hnswlib.Index(space="cosine", dim=self.vectors.shape[1])
+            index.init_index(max_elements=len(self.entries) * 2, ef_construction=200, M=16)
+            index.add_items(self.vectors, np.arange(len(self.entries)))
+            self._hnsw = index
+        if self._hnsw is not None:
+            labels, distances = self._hnsw.knn_query(vector, k=min(k, len(self.entries)))
+            return [(int(i), 1.0 - float(d)) for i, d in zip(labels[0], distances[0])]
+        scores = self.vectors @ vector
+        top = np.argsort(-scores)[:k]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def nearest(self, text, k=1):
+        # [(저장된 항목, 이름의 코사인 유사도)] 유사도가 높은 순. 양은 보지 않는다
+        name, _, unit = split_portion(text)
+        with self._lock:
+            position = self._keys.get((normalize(name), unit))
+            if not self.entries:
+                return []
+        vector = embed([name])[0]
+        with self._lock:
+            matches = [(self.entries[i], score) for i, score in self._search(vector, k)]
+        if position is not None:
+            # 이름과 단위가 그대로 같은 항목은 맨 앞에
+            exact = self.entries[position]
+            matches = [(exact, 1.0)] + [(entry, score) for entry, score in matches if entry is not exact]
+        return matches[:k]
+
+    def lookup(self, text, threshold=THRESHOLD):
+        # 이름이 비슷하고 단위가 같은 항목의 1단위 영양 정보 x 양
+        _, quantity, unit = split_portion(text)
+        for entry, score in self.nearest(text, LOOKUP_CANDIDATES):
+            if score < threshold:
+                break
+            if entry["unit"] != unit:
+                continue
+            scaled = scale_nutrition(entry["nutrition"], quantity)
+            if scaled is not None:
+                self.hits += 1
+                return {**scaled, "food_name": text}
+        self.misses += 1
+        return None
+
+    def _entry(self, text, nutrition):
+        # 1단위 영양 정보로 나눠 저장한다 (food_name은 입력마다 다르므로 빼고)
+        name, quantity, unit = split_portion(text)
+        values = {key: value for key, value in nutrition.items() if key != "food_name"}
+        per_unit = scale_nutrition(values, 1 / quantity, digits=4)
+        if per_unit is None or not name:
+            return None
+        return {"text": text, "name": name, "unit": unit, "nutrition": per_unit}
+
+    def _append(self, entry, vector):
+        # self._lock 안에서 또는 로딩 중에 호출한다
+        if self.vectors is not None and self.vectors.shape[1] != vector.size:
+            raise ValueError("embedding size changed; rebuild the similarity index")
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._vectors_path, "ab") as f:
+            f.write(vector.astype(np.float32).tobytes())
+        with open(self._entries_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._keys[(normalize(entry["name"]), entry["unit"])] = len(self.entries)
+        self.entries.append(entry)
+        self.vectors = vector[None, :] if self.vectors is None else np.vstack([self.vectors, vector])
+        if self._hnsw is not None:
+            self._hnsw.resize_index(max(self._hnsw.get_max_elements(), len(self.entries)))
+            self._hnsw.add_items(vector[None, :], [len(self.entries) - 1])
+
+    def add(self, text, nutrition):
+        entry = self._entry(text, nutrition)
+        if entry is None:
+            return
+        key = (normalize(entry["name"]), entry["unit"])
+        with self._lock:
+            if key in self._keys:
+                return
+        vector = embed([entry["name"]])[0]
+        with self._lock:
+            if key not in self._keys:
+                self._append(entry, vector)
+
+    def stats(self):
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "threshold": THRESHOLD,
+            "hnsw": self._hnsw is not None,
+        }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SimilarityIndex()
+        return _index
+
+
+def tune(pairs, thresholds):
+    # pairs: [(입력1, 입력2, 서로 바꿔 써도 되는지)] -> 임계값마다 정밀도/재현율
+    # lookup과 같은 규칙: 양을 뗀 이름끼리 비교하고, 단위가 다르면 쓰지 않는다 (같은 단위면 양은 환산)
+    left = [split_portion(a) for a, _, _ in pairs]
+    right = [split_portion(b) for _, b, _ in pairs]
+    scores = np.sum(embed([name for name, _, _ in left]) * embed([name for name, _, _ in right]), axis=1)
+    scores[[normalize(a[0]) == normalize(b[0]) for a, b in zip(left, right)]] = 1.0
+    scores[[a[2] != b[2] for a, b in zip(left, right)]] = -1.0
+    labels = np.array([same for _, _, same in pairs], dtype=bool)
+
+    results = []
+    for threshold in thresholds:
+        predicted = scores >= threshold
+        tp = int(np.sum(predicted & labels))
+        fp = int(np.sum(predicted & ~labels))
+        fn = int(np.sum(~predicted & labels))
+        precision = tp / (tp + fp) if tp + fp else 1.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        results.append(
+            {
+                "threshold": round(float(threshold), 3),
+                "precision": round(precision, 3),
+                "recall": round(recall, 3),
+                "f1": round(f1, 3),
+                "false_positives": fp,
+            }
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Food name similarity index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("query", help="show the nearest stored foods")
+    p.add_argument("text")
+    p.add_argument("-k", type=int, default=5)
+    p = sub.add_parser("tune", help="precision/recall per threshold from labelled pairs")
+    p.add_argument("pairs", help="CSV rows: input1,input2,interchangeable(1/0), e.g. similar_pairs.csv")
+    p.add_argument("--min", type=float, default=0.5)
+    p.add_argument("--max", type=float, default=0.99)
+    p.add_argument("--step", type=float, default=0.02)
+    sub.add_parser("stats", help="index size and settings")
+    args = parser.parse_args()
+
+    if args.command == "query":
+        for entry, score in get_index().nearest(args.text, args.k):
+            print(f"{score:.3f}  {entry['text']}  {json.dumps(entry['nutrition'], ensure_ascii=False)}")
+    elif args.command == "tune":
+        with open(args.pairs, encoding="utf-8") as f:
+            pairs = [(row[0], row[1], row[2].strip() == "1") for row in csv.reader(f) if len(row) >= 3]
+        results = tune(pairs, np.arange(args.min, args.max + 1e-9, args.step))
+        for result in results:
+            print(json.dumps(result))
+        # 오탐(다른 음식을 같은 음식으로 본 경우)이 없는 가장 낮은 임계값을 추천한다
+        safe = [r for r in results if r["false_positives"] == 0 and r["recall"] > 0]
+        best = safe[0] if safe else max(results, key=lambda r: r["f1"])
+        print(f"recommended SIMILAR_THRESHOLD={best['threshold']}")
+    else:
+        print(json.dumps(get_index().stats(), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
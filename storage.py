@@ -0,0 +1,579 @@
+# storage.py
+# 사용자, 음식 기록, 하루 합계 저장소. STORAGE_BACKEND로 고른다.
+#
+#   mysql  (기본) db.py 커넥션 풀. 읽기는 복제본 라우팅(get_read_connection)을 따른다
+#   sqlite 단일 서버 배포용 내장 DB (STORAGE_SQLITE_PATH, WAL). 네트워크 왕복이 없어
+#          벤치마크와 테스트를 프로세스 안에서 돌릴 수 있다
+#
+# login, register, add_food, update_food, delete_food, /api/send2, /api/calendar, 식사 사진,
+# 기간 롤업이 이 모듈을 거친다. 월간 조회와 조언, 동기화, 빠른 추가/자동완성, 기간 내보내기/가져오기,
+# 쓰기 지연 큐는 아직 MySQL을 직접 쓰므로 app.py가 sqlite 백엔드에서는 등록하지 않는다.
+
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import date as date_type, timedelta
+
+import pymysql
+
+import archive
+import db
+import foods
+import summaries
+
+BACKEND = os.getenv("STORAGE_BACKEND", "mysql")
+SQLITE_PATH = os.getenv("STORAGE_SQLITE_PATH", "storage.sqlite3")
+
+# 라우트는 백엔드와 상관없이 이것만 잡으면 된다
+DatabaseError = (pymysql.MySQLError, sqlite3.Error)
+
+# MySQL 스키마와 같은 테이블/열 이름. USER_NT 하루 합계는 FOOD 트리거가 채운다
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS USER (
+    ID TEXT PRIMARY KEY,
+    PASSWORD TEXT,
+    BODY_WEIGHT REAL,
+    HEIGHT REAL,
+    AGE INTEGER,
+    GENDER INTEGER,
+    ACTIVITY INTEGER,
+    RDI REAL
+);
+CREATE TABLE IF NOT EXISTS USER_NT (
+    ID TEXT NOT NULL,
+    DATE TEXT NOT NULL,
+    CARBO REAL NOT NULL DEFAULT 0,
+    PROTEIN REAL NOT NULL DEFAULT 0,
+    FAT REAL NOT NULL DEFAULT 0,
+    KCAL REAL NOT NULL DEFAULT 0,
+    RD_CARBO REAL,
+    RD_PROTEIN REAL,
+    RD_FAT REAL,
+    PRIMARY KEY (ID, DATE)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS FOOD (
+    ID TEXT NOT NULL,
+    DATE TEXT NOT NULL,
+    FOOD_INDEX INTEGER NOT NULL,
+    FOOD_NAME TEXT,
+    FOOD_CH REAL,
+    FOOD_PT REAL,
+    FOOD_FAT REAL,
+    FOOD_KCAL REAL,
+    PRIMARY KEY (ID, DATE, FOOD_INDEX)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS FOOD_AFTER_INSERT AFTER INSERT ON FOOD BEGIN
+    -- 그날 첫 음식이면 합계 행을 만들고, 권장량은 그 사용자의 가장 최근 값을 이어 받는다
+    INSERT OR IGNORE INTO USER_NT (ID, DATE, RD_CARBO, RD_PROTEIN, RD_FAT)
+    VALUES (
+        NEW.ID,
+        NEW.DATE,
+        (SELECT RD_CARBO FROM USER_NT WHERE ID = NEW.ID ORDER BY DATE DESC LIMIT 1),
+        (SELECT RD_PROTEIN FROM USER_NT WHERE ID = NEW.ID ORDER BY DATE DESC LIMIT 1),
+        (SELECT RD_FAT FROM USER_NT WHERE ID = NEW.ID ORDER BY DATE DESC LIMIT 1)
+    );
+    UPDATE USER_NT
+    SET CARBO = CARBO + COALESCE(NEW.FOOD_CH, 0),
+        PROTEIN = PROTEIN + COALESCE(NEW.FOOD_PT, 0),
+        FAT = FAT + COALESCE(NEW.FOOD_FAT, 0),
+        KCAL = KCAL + COALESCE(NEW.FOOD_KCAL, 0)
+    WHERE ID = NEW.ID AND DATE = NEW.DATE;
+END;
+CREATE TRIGGER IF NOT EXISTS FOOD_AFTER_DELETE AFTER DELETE ON FOOD BEGIN
+    UPDATE USER_NT
+    SET CARBO = CARBO - COALESCE(OLD.FOOD_CH, 0),
+        PROTEIN = PROTEIN - COALESCE(OLD.FOOD_PT, 0),
+        FAT = FAT - COALESCE(OLD.FOOD_FAT, 0),
+        KCAL = KCAL - COALESCE(OLD.FOOD_KCAL, 0)
+    WHERE ID = OLD.ID AND DATE = OLD.DATE;
+END;
+CREATE TRIGGER IF NOT EXISTS FOOD_AFTER_UPDATE AFTER UPDATE ON FOOD BEGIN
+    UPDATE USER_NT
+    SET CARBO = CARBO - COALESCE(OLD.FOOD_CH, 0),
+        PROTEIN = PROTEIN - COALESCE(OLD.FOOD_PT, 0),
+        FAT = FAT - COALESCE(OLD.FOOD_FAT, 0),
+        KCAL = KCAL - COALESCE(OLD.FOOD_KCAL, 0)
+    WHERE ID = OLD.ID AND DATE = OLD.DATE;
+    UPDATE USER_NT
+    SET CARBO = CARBO + COALESCE(NEW.FOOD_CH, 0),
+        PROTEIN = PROTEIN + COALESCE(NEW.FOOD_PT, 0),
+        FAT = FAT + COALESCE(NEW.FOOD_FAT, 0),
+        KCAL = KCAL + COALESCE(NEW.FOOD_KCAL, 0)
+    WHERE ID = NEW.ID AND DATE = NEW.DATE;
+END;
+"""
+
+
+def day_result(user_id, date, totals, food_rows):
+    # /api/calendar 응답 형식. totals: USER_NT 행, food_rows: FOOD_INDEX 순 음식 행
+    food_list = [
+        {
+            "food_index": row[0],
+            "food_name": row[1],
+            "food_pt": row[2],
+            "food_fat": row[3],
+            "food_ch": row[4],
+            "food_kcal": row[5],
+        }
+        for row in food_rows
+    ]
+
+    if totals is None and not food_list:
+        return None
+
+    if totals is not None:
+        carbo, protein, fat, kcal, rd_carbo, rd_protein, rd_fat = totals
+    else:
+        # 합계 행이 아직 없으면 음식 목록으로 계산한다
+        carbo = sum(float(food["food_ch"] or 0) for food in food_list)
+        protein = sum(float(food["food_pt"] or 0) for food in food_list)
+        fat = sum(float(food["food_fat"] or 0) for food in food_list)
+        kcal = sum(float(food["food_kcal"] or 0) for food in food_list)
+        rd_carbo = rd_protein = rd_fat = None
+
+    return {
+        "id": user_id,
+        "date": date,
+        "nutrition": {
+            "carbo": carbo,
+            "protein": protein,
+            "fat": fat,
+            "kcal": kcal,
+            "rd_carbo": rd_carbo,
+            "rd_protein": rd_protein,
+            "rd_fat": rd_fat,
+        },
+        "foods": food_list,
+    }
+
+
+def load_day(cursor, user_id, date, sql=lambda query: query):
+    # 하루 합계 1행 + 그날 음식 목록, 둘 다 (ID, DATE) 인덱스로 찾는다
+    cursor.execute(
+        sql(
+            """
+            SELECT CARBO, PROTEIN, FAT, KCAL, RD_CARBO, RD_PROTEIN, RD_FAT
+            FROM USER_NT
+            WHERE ID = %s AND DATE = %s
+            """
+        ),
+        (user_id, date),
+    )
+    totals = cursor.fetchone()
+    cursor.execute(
+        sql(
+            """
+            SELECT FOOD_INDEX, FOOD_NAME, FOOD_PT, FOOD_FAT, FOOD_CH, FOOD_KCAL
+            FROM FOOD
+            WHERE ID = %s AND DATE = %s
+            ORDER BY FOOD_INDEX
+            """
+        ),
+        (user_id, date),
+    )
+    return totals, cursor.fetchall()
+
+
+def with_archived(cursor, user_id, date, food_rows):
+    # archive.py가 Parquet로 옮긴 달이면 그날의 파일 행을 load_day 음식 행과 같은 모양으로 합친다 (MySQL 전용)
+    day = date_type.fromisoformat(str(date)[:10])
+    path = archive.archived_months(cursor).get((day.year, day.month))
+    if not path:
+        return food_rows
+    archived = [
+        (food_index, name, pt, fat, ch, kcal)
+        for food_date, food_index, name, pt, fat, ch, kcal in archive.read_file(path, user_id)
+        if food_date == day
+    ]
+    return sorted(archived + list(food_rows), key=lambda row: row[0])
+
+
+class Storage(ABC):
+    # SQL은 한 번만 (%s 자리표시자로) 쓰고, 백엔드마다 연결/트랜잭션/방언만 다르게 한다
+    name = None
+
+    def _sql(self, query):
+        return query
+
+    def _date(self, value):
+        return value
+
+    @abstractmethod
+    def _reading(self, user_id=None, primary=False):
+        # 커서를 내주는 컨텍스트 매니저
+        ...
+
+    @abstractmethod
+    def _writing(self):
+        # 커서를 내주고, 예외 없이 끝나면 커밋하는 컨텍스트 매니저
+        ...
+
+    @abstractmethod
+    def _insert_foods(self, cursor, user_id, date, items):
+        # 연속된 FOOD_INDEX로 추가하고 foods.added_foods 형식으로 돌려준다
+        ...
+
+    def _food_changed(self, cursor, user_id, date):
+        pass
+
+    def _targets_changed(self, cursor, user_id):
+        pass
+
+    def _day_foods(self, cursor, user_id, date, food_rows):
+        return food_rows
+
+    # 사용자
+
+    def authenticate(self, user_id, password):
+        # 방금 가입한 사용자도 로그인되도록 기본 DB에서 읽는다
+        with self._reading(user_id, primary=True) as cursor:
+            cursor.execute(
+                self._sql("SELECT * FROM USER WHERE ID = %s AND PASSWORD = %s"),
+                (user_id, password),
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            user = dict(zip([column[0] for column in cursor.description], row))
+        user.pop("PASSWORD", None)
+        return user
+
+    def nutrient_targets(self, user_id):
+        # (RD_PROTEIN, RD_CARBO, RD_FAT) 또는 None
+        with self._reading(user_id) as cursor:
+            cursor.execute(
+                self._sql("SELECT RD_PROTEIN, RD_CARBO, RD_FAT FROM USER_NT WHERE ID = %s"),
+                (user_id,),
+            )
+            return cursor.fetchone()
+
+    def create_user(self, data):
+        with self._writing() as cursor:
+            cursor.execute(
+                self._sql(
+                    """
+                    INSERT INTO USER (ID, PASSWORD, BODY_WEIGHT, HEIGHT, AGE, GENDER, ACTIVITY, RDI)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    """
+                ),
+                (
+                    data["id"],
+                    data["pw"],
+                    data["bodyweight"],
+                    data["height"],
+                    data["age"],
+                    data["gender"],
+                    data["activity"],
+                    None,  # RDI 값을 기본값으로 설정 (필요에 따라 계산 후 설정 가능)
+                ),
+            )
+
+    def update_user(self, data):
+        with self._writing() as cursor:
+            cursor.execute(
+                self._sql(
+                    """
+                    UPDATE USER SET PASSWORD = %s, BODY_WEIGHT = %s, HEIGHT = %s, AGE = %s, ACTIVITY = %s
+                    WHERE ID = %s
+                    """
+                ),
+                (
+                    data["pw"],
+                    data["bodyweight"],
+                    data["height"],
+                    data["age"],
+                    data["activity"],
+                    data["id"],
+                ),
+            )
+            cursor.execute(
+                self._sql(
+                    "UPDATE USER_NT SET RD_PROTEIN = %s, RD_CARBO = %s, RD_FAT = %s WHERE ID = %s"
+                ),
+                (data["rd_protein"], data["rd_carbo"], data["rd_fat"], data["id"]),
+            )
+            self._targets_changed(cursor, data["id"])
+
+    # 음식 기록
+
+    def add_foods(self, user_id, date, items):
+        # 한 트랜잭션에서 연속된 FOOD_INDEX로 추가하고 추가된 행 정보를 돌려준다
+        with self._writing() as cursor:
+            added = self._insert_foods(cursor, user_id, self._date(date), items)
+            self._food_changed(cursor, user_id, date)
+        return added
+
+    def update_food(self, user_id, date, food_index, item):
+        # 바꾼 행 수 (0 또는 1)
+        with self._writing() as cursor:
+            cursor.execute(
+                self._sql(
+                    """
+                    UPDATE FOOD
+                    SET FOOD_NAME = %s, FOOD_CH = %s, FOOD_PT = %s, FOOD_FAT = %s, FOOD_KCAL = %s
+                    WHERE ID = %s AND DATE = %s AND FOOD_INDEX = %s
+                    """
+                ),
+                (
+                    item["food_name"],
+                    item["carbohydrate"],
+                    item["protein"],
+                    item["fat"],
+                    item["calorie"],
+                    user_id,
+                    self._date(date),
+                    food_index,
+                ),
+            )
+            updated = cursor.rowcount
+            if updated:
+                self._food_changed(cursor, user_id, date)
+        return updated
+
+    def delete_food(self, user_id, date, food_index):
+        # 지운 행 수 (0 또는 1)
+        with self._writing() as cursor:
+            cursor.execute(
+                self._sql("DELETE FROM FOOD WHERE ID = %s AND DATE = %s AND FOOD_INDEX = %s"),
+                (user_id, self._date(date), food_index),
+            )
+            deleted = cursor.rowcount
+            if deleted:
+                self._food_changed(cursor, user_id, date)
+        return deleted
+
+    def day(self, user_id, date):
+        with self._reading(user_id) as cursor:
+            totals, food_rows = load_day(cursor, user_id, self._date(date), self._sql)
+            food_rows = self._day_foods(cursor, user_id, date, food_rows)
+        return day_result(user_id, date, totals, food_rows)
+
+    # 하루 합계
+
+    def daily_totals(self, user_id, start, end):
+        # [start, end) 기간의 USER_NT: {"YYYY-MM-DD": {carbo, protein, fat, kcal, rd_carbo, ...}}
+        with self._reading(user_id) as cursor:
+            cursor.execute(
+                self._sql(
+                    """
+                    SELECT DATE, CARBO, PROTEIN, FAT, KCAL, RD_CARBO, RD_PROTEIN, RD_FAT
+                    FROM USER_NT
+                    WHERE ID = %s AND DATE >= %s AND DATE < %s
+                    ORDER BY DATE
+                    """
+                ),
+                (user_id, self._date(start), self._date(end)),
+            )
+            rows = cursor.fetchall()
+        keys = ("carbo", "protein", "fat", "kcal", "rd_carbo", "rd_protein", "rd_fat")
+        return {str(row[0])[:10]: dict(zip(keys, row[1:])) for row in rows}
+
+    def rollups(self, user_id, start, end, granularity):
+        # [start, end) 기간을 버킷별로 GROUP BY 한 번에 모은다. (ID, DATE) 인덱스 범위만 읽는다
+        # [(버킷 시작일, 기록한 날 수, 음식 수, kcal, 탄수화물, 단백질, 지방)], 버킷 순
+        bucket = self.ROLLUP_BUCKETS[granularity]
+        with self._reading(user_id) as cursor:
+            cursor.execute(
+                self._sql(
+                    f"""
+                    SELECT {bucket} AS BUCKET, COUNT(DISTINCT DATE), COUNT(*),
+                           SUM(FOOD_KCAL), SUM(FOOD_CH), SUM(FOOD_PT), SUM(FOOD_FAT)
+                    FROM FOOD
+                    WHERE ID = %s AND DATE >= %s AND DATE < %s
+                    GROUP BY BUCKET
+                    ORDER BY BUCKET
+                    """
+                ),
+                (user_id, self._date(start), self._date(end)),
+            )
+            rows = cursor.fetchall()
+        return [
+            (
+                date_type.fromisoformat(str(row[0])[:10]),
+                row[1],
+                row[2],
+                *(float(value or 0) for value in row[3:]),
+            )
+            for row in rows
+        ]
+
+
+ROLLUP_GRANULARITIES = ("day", "week", "month")
+
+
+def bucket_start(day, granularity):
+    # 버킷 시작일: 그날 / 그 주 월요일(ISO 주) / 그달 1일
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+class MySQLStorage(Storage):
+    name = "mysql"
+
+    ROLLUP_BUCKETS = {
+        "day": "DATE",
+        "week": "DATE - INTERVAL WEEKDAY(DATE) DAY",
+        "month": "DATE - INTERVAL (DAYOFMONTH(DATE) - 1) DAY",
+    }
+
+    def rollups(self, user_id, start, end, granularity):
+        rows = super().rollups(user_id, start, end, granularity)
+        # Parquet로 옮긴 달은 FOOD에 없으므로 파일에서 읽어 같은 버킷에 더한다
+        archived = archive.archived_months()
+        months = archive.months_between(archived, start, end)
+        if not months:
+            return rows
+        buckets = {row[0]: [set(), row[2], *row[3:]] for row in rows}
+        days = {row[0]: row[1] for row in rows}
+        for key in months:
+            for food_date, _, _, pt, fat, ch, kcal in archive.read_file(archived[key], user_id):
+                if not start <= food_date < end:
+                    continue
+                key = bucket_start(food_date, granularity)
+                bucket = buckets.setdefault(key, [set(), 0, 0.0, 0.0, 0.0, 0.0])
+                bucket[0].add(food_date)
+                bucket[1] += 1
+                for i, value in enumerate((kcal, ch, pt, fat), start=2):
+                    bucket[i] += value or 0
+        return [
+            (key, days.get(key, 0) + len(bucket[0]), *bucket[1:])
+            for key, bucket in sorted(buckets.items())
+        ]
+
+    @contextmanager
+    def _reading(self, user_id=None, primary=False):
+        connection = db.get_connection() if primary else db.get_read_connection(user_id)
+        try:
+            with connection.cursor() as cursor:
+                yield cursor
+        finally:
+            connection.close()
+
+    @contextmanager
+    def _writing(self):
+        connection = db.get_connection()
+        try:
+            with connection.cursor() as cursor:
+                yield cursor
+            connection.commit()
+        finally:
+            connection.close()  # 커밋하지 않은 트랜잭션은 풀이 롤백한다
+
+    def _insert_foods(self, cursor, user_id, date, items):
+        return foods.insert_foods(cursor, user_id, date, items)
+
+    def _food_changed(self, cursor, user_id, date):
+        summaries.invalidate_month(cursor, user_id, date)
+
+    def _targets_changed(self, cursor, user_id):
+        summaries.invalidate_user(cursor, user_id)
+
+    def _day_foods(self, cursor, user_id, date, food_rows):
+        return with_archived(cursor, user_id, date, food_rows)
+
+
+class SQLiteStorage(Storage):
+    name = "sqlite"
+
+    ROLLUP_BUCKETS = {
+        "day": "DATE",
+        "week": "date(DATE, '-' || ((CAST(strftime('%w', DATE) AS INTEGER) + 6) % 7) || ' days')",
+        "month": "date(DATE, 'start of month')",
+    }
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        # sqlite3 연결은 스레드마다 따로 연다
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")  # WAL에서는 커밋마다 fsync하지 않아도 깨지지 않는다
+            connection.executescript(SQLITE_SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def _sql(self, query):
+        return query.replace("%s", "?")
+
+    def _date(self, value):
+        # DATE 열은 'YYYY-MM-DD' 문자열 (datetime이 와도 날짜만)
+        return str(value)[:10]
+
+    @contextmanager
+    def _reading(self, user_id=None, primary=False):
+        # 두 번 이상 조회해도 같은 시점을 보도록 읽기 트랜잭션으로 감싼다
+        connection = self._connection()
+        cursor = connection.cursor()
+        connection.execute("BEGIN")
+        try:
+            yield cursor
+        finally:
+            connection.execute("COMMIT")
+            cursor.close()
+
+    @contextmanager
+    def _writing(self):
+        # 시작부터 쓰기 잠금을 잡아 MAX(FOOD_INDEX) + 1이 겹치지 않는다
+        connection = self._connection()
+        cursor = connection.cursor()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield cursor
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            cursor.close()
+
+    def _insert_foods(self, cursor, user_id, date, items):
+        cursor.execute(
+            "SELECT COALESCE(MAX(FOOD_INDEX) + 1, 0) FROM FOOD WHERE ID = ? AND DATE = ?",
+            (user_id, date),
+        )
+        first_index = cursor.fetchone()[0]
+        cursor.executemany(
+            """
+            INSERT INTO FOOD (ID, DATE, FOOD_INDEX, FOOD_NAME, FOOD_CH, FOOD_PT, FOOD_FAT, FOOD_KCAL)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (
+                    user_id,
+                    date,
+                    first_index + offset,
+                    item["food_name"],
+                    item["carbohydrate"],
+                    item["protein"],
+                    item["fat"],
+                    item["calorie"],
+                )
+                for offset, item in enumerate(items)
+            ],
+        )
+        return foods.added_foods(user_id, date, first_index, items)
+
+
+BACKENDS = {"mysql": MySQLStorage, "sqlite": SQLiteStorage}
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            if BACKEND not in BACKENDS:
+                raise ValueError(f"Unknown STORAGE_BACKEND: {BACKEND}")
+            _storage = BACKENDS[BACKEND]()
+        return _storage
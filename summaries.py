@@ -0,0 +1,123 @@
+# summaries.py
+# MONTHLY_SUMMARY 스냅샷 읽기/쓰기/무효화
+
+import json
+from datetime import date, datetime
+
+from db import get_read_connection
+
+
+def is_closed_month(year, month, today=None):
+    today = today or date.today()
+    return (year, month) < (today.year, today.month)
+
+
+def load_summaries(user_id, months):
+    # months: [(year, month), ...] -> {(year, month): payload}
+    if not months:
+        return {}
+    connection = get_read_connection(user_id)
+    try:
+        with connection.cursor() as cursor:
+            conditions = " OR ".join(["(YEAR = %s AND MONTH = %s)"] * len(months))
+            params = [value for pair in months for value in pair]
+            cursor.execute(
+                f"SELECT YEAR, MONTH, PAYLOAD FROM MONTHLY_SUMMARY WHERE ID = %s AND ({conditions})",
+                (user_id, *params),
+            )
+            return {(row[0], row[1]): json.loads(row[2]) for row in cursor.fetchall()}
+    finally:
+        connection.close()
+
+
+def load_version(user_id):
+    # 계산을 시작하기 전에 읽는다. 데이터와 같은 연결(복제본)에서 읽어야 복제 지연이 있어도 맞다
+    connection = get_read_connection(user_id)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT VERSION FROM SUMMARY_VERSION WHERE ID = %s", (user_id,))
+            row = cursor.fetchone()
+        connection.commit()
+        return row[0] if row else 0
+    finally:
+        connection.close()
+
+
+def save_summaries(connection, rows):
+    # rows: [(user_id, year, month, payload, version), ...] 를 한 번에 쓴다. version은 load_version 값
+    # 그 사이 무효화된 사용자의 행은 버리고, 버린 행 수를 돌려준다
+    if not rows:
+        return 0
+    user_ids = sorted({row[0] for row in rows})
+    with connection.cursor() as cursor:
+        # 사용자 번호 행을 잠가 두면 저장을 마칠 때까지 무효화가 기다린다
+        cursor.executemany(
+            "INSERT INTO SUMMARY_VERSION (ID, VERSION) VALUES (%s, 0) "
+            "ON DUPLICATE KEY UPDATE VERSION = VERSION",
+            [(user_id,) for user_id in user_ids],
+        )
+        placeholders = ", ".join(["%s"] * len(user_ids))
+        cursor.execute(
+            f"SELECT ID, VERSION FROM SUMMARY_VERSION WHERE ID IN ({placeholders}) FOR UPDATE",
+            user_ids,
+        )
+        current = dict(cursor.fetchall())
+        fresh = [row for row in rows if current.get(row[0]) == row[4]]
+        if fresh:
+            cursor.executemany(
+                """
+                INSERT INTO MONTHLY_SUMMARY (ID, YEAR, MONTH, PAYLOAD)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE PAYLOAD = VALUES(PAYLOAD), COMPUTED_AT = CURRENT_TIMESTAMP
+                """,
+                [
+                    (user_id, year, month, json.dumps(payload, ensure_ascii=False, default=str))
+                    for user_id, year, month, payload, _ in fresh
+                ],
+            )
+    connection.commit()
+    return len(rows) - len(fresh)
+
+
+def _year_month(value):
+    if isinstance(value, (date, datetime)):
+        return value.year, value.month
+    value = str(value)
+    return int(value[:4]), int(value[5:7])
+
+
+def _bump_version(cursor, user_id):
+    cursor.execute(
+        "INSERT INTO SUMMARY_VERSION (ID, VERSION) VALUES (%s, 1) "
+        "ON DUPLICATE KEY UPDATE VERSION = VERSION + 1",
+        (user_id,),
+    )
+
+
+def invalidate_month(cursor, user_id, food_date):
+    # FOOD 쓰기와 같은 트랜잭션에서 호출한다
+    year, month = _year_month(food_date)
+    _bump_version(cursor, user_id)
+    cursor.execute(
+        "DELETE FROM MONTHLY_SUMMARY WHERE ID = %s AND YEAR = %s AND MONTH = %s",
+        (user_id, year, month),
+    )
+
+
+def invalidate_range(cursor, user_id, start, end):
+    start_year, start_month = _year_month(start)
+    end_year, end_month = _year_month(end)
+    _bump_version(cursor, user_id)
+    cursor.execute(
+        """
+        DELETE FROM MONTHLY_SUMMARY
+        WHERE ID = %s AND YEAR * 100 + MONTH BETWEEN %s AND %s
+        """,
+        (user_id, start_year * 100 + start_month, end_year * 100 + end_month),
+    )
+
+
+def invalidate_user(cursor, user_id):
+    # 권장량(RD_*)이 바뀌면 모든 달의 비율이 바뀐다
+    _bump_version(cursor, user_id)
+    cursor.execute("DELETE FROM MONTHLY_SUMMARY WHERE ID = %s", (user_id,))
@@ -0,0 +1,179 @@
+# sync.py
+# 오프라인 동기화: 앱이 다시 연결되었을 때 쌓인 add/update/delete를 한 번의 요청으로 반영한다.
+# 영양 정보 조회는 동시에 하고, DB 반영은 한 트랜잭션(항목마다 SAVEPOINT)에서 순서대로 한다.
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+from flask import Blueprint, request, jsonify
+import pymysql
+
+import detail
+import foods
+import quick_add
+import summaries
+import upload
+from db import get_connection
+from nutrition import do, parse_meal
+
+bp = Blueprint("sync", __name__)
+
+SYNC_MAX_MUTATIONS = int(os.getenv("SYNC_MAX_MUTATIONS", "200"))
+SYNC_LLM_WORKERS = int(os.getenv("SYNC_LLM_WORKERS", "8"))
+
+REQUIRED_FIELDS = {
+    "add": ("DATE", "FOOD_NAME"),
+    "update": ("DATE", "FOOD_INDEX", "NEW_FOOD_NAME"),
+    "delete": ("DATE", "FOOD_INDEX"),
+}
+
+
+def _validate(mutation):
+    if not isinstance(mutation, dict):
+        return "mutation must be an object"
+    op = mutation.get("op")
+    if op not in REQUIRED_FIELDS:
+        return "op must be add, update or delete"
+    for field in REQUIRED_FIELDS[op]:
+        if mutation.get(field) in (None, ""):
+            return f"{field} is required"
+    return None
+
+
+def _lookup_nutrition(mutations):
+    # 서로 다른 입력 문자열마다 LLM을 한 번씩, 동시에 호출한다
+    jobs = {}
+    for mutation in mutations:
+        if mutation["op"] == "add":
+            jobs[("add", mutation["FOOD_NAME"])] = None
+        elif mutation["op"] == "update":
+            jobs[("update", mutation["NEW_FOOD_NAME"])] = None
+    if not jobs:
+        return {}
+
+    def run(job):
+        kind, text = job
+        try:
+            return parse_meal(text) if kind == "add" else do(text)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=min(SYNC_LLM_WORKERS, len(jobs))) as executor:
+        return dict(zip(jobs, executor.map(run, jobs)))
+
+
+def _apply(cursor, user_id, mutation, nutrition):
+    op = mutation["op"]
+    date = mutation["DATE"]
+
+    if op == "add":
+        items = nutrition[("add", mutation["FOOD_NAME"])]
+        if isinstance(items, Exception):
+            raise items
+        if not items:
+            raise ValueError("음식을 인식하지 못했습니다.")
+        return foods.insert_foods(cursor, user_id, date, items)
+
+    if op == "update":
+        info = nutrition[("update", mutation["NEW_FOOD_NAME"])]
+        if isinstance(info, Exception):
+            raise info
+        cursor.execute(
+            """
+            UPDATE FOOD
+            SET FOOD_NAME = %s, FOOD_CH = %s, FOOD_PT = %s, FOOD_FAT = %s, FOOD_KCAL = %s
+            WHERE ID = %s AND DATE = %s AND FOOD_INDEX = %s
+            """,
+            (
+                info["food_name"],
+                info["carbohydrate"],
+                info["protein"],
+                info["fat"],
+                info["calorie"],
+                user_id,
+                date,
+                mutation["FOOD_INDEX"],
+            ),
+        )
+        if cursor.rowcount == 0:
+            raise LookupError("수정할 데이터가 없습니다.")
+        return {"FOOD_INDEX": mutation["FOOD_INDEX"], **info}
+
+    cursor.execute(
+        "DELETE FROM FOOD WHERE ID = %s AND DATE = %s AND FOOD_INDEX = %s",
+        (user_id, date, mutation["FOOD_INDEX"]),
+    )
+    if cursor.rowcount == 0:
+        raise LookupError("삭제할 데이터가 없습니다.")
+    return {"FOOD_INDEX": mutation["FOOD_INDEX"]}
+
+
+@bp.route("/api/sync", methods=["POST"])
+def sync():
+    data = request.json or {}
+    user_id = data.get("ID")
+    mutations = data.get("mutations")
+
+    if not user_id or not isinstance(mutations, list):
+        return jsonify({"error": "ID and mutations are required"}), 400
+    if len(mutations) > SYNC_MAX_MUTATIONS:
+        return (
+            jsonify({"error": f"At most {SYNC_MAX_MUTATIONS} mutations per request"}),
+            413,
+        )
+
+    results = []
+    valid = []
+    for position, mutation in enumerate(mutations):
+        error = _validate(mutation)
+        op = mutation.get("op") if isinstance(mutation, dict) else None
+        result = {"index": position, "op": op}
+        if error:
+            result.update(status="error", error=error)
+        else:
+            valid.append((position, mutation))
+        results.append(result)
+
+    nutrition = _lookup_nutrition([mutation for _, mutation in valid])
+
+    affected_dates = set()
+    try:
+        connection = get_connection()
+    except pymysql.MySQLError as e:
+        return jsonify({"error": str(e)}), 500
+
+    try:
+        with connection.cursor() as cursor:
+            for position, mutation in valid:
+                result = results[position]
+                cursor.execute(f"SAVEPOINT m{position}")
+                try:
+                    result["data"] = _apply(cursor, user_id, mutation, nutrition)
+                    result["status"] = "ok"
+                    affected_dates.add(str(mutation["DATE"])[:10])
+                except Exception as e:  # DB 오류, LLM 조회 실패, 없는 행 등
+                    cursor.execute(f"ROLLBACK TO SAVEPOINT m{position}")
+                    result.update(status="error", error=str(e))
+
+            for date in affected_dates:
+                summaries.invalidate_month(cursor, user_id, date)
+        connection.commit()
+
+        for date in affected_dates:
+            detail.invalidate(user_id, date)
+        if affected_dates:
+            quick_add.invalidate(user_id)
+        # 지우거나 다른 음식으로 바꾼 행의 사진 연결을 푼다
+        for position, mutation in valid:
+            if mutation["op"] in ("update", "delete") and results[position]["status"] == "ok":
+                upload.release_food(user_id, mutation["DATE"], mutation["FOOD_INDEX"])
+        days = {
+            date: detail.load_day(connection, user_id, date)
+            for date in sorted(affected_dates)
+        }
+    except pymysql.MySQLError as e:
+        return jsonify({"error": str(e), "results": results}), 500
+    finally:
+        connection.close()
+
+    return jsonify({"results": results, "days": days}), 200
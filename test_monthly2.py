@@ -3,7 +3,7 @@
 import requests
 
 def test_get_monthly_food(year, month):
-    url = f"http://localhost:5001/api/food/monthly?year={year}&month={month}"
+    url = f"http://localhost:5000/api/food/monthly?year={year}&month={month}"
     response = requests.get(url)
     if response.status_code == 200:
         data = response.json()
@@ -0,0 +1,171 @@
+# tests/conftest.py
+# MySQL 없이 DB 경로를 돌려 보는 테스트용 연결: 파일 SQLite 위에서 이 저장소가 쓰는 MySQL 문법
+# (%s 자리표시자, FOR UPDATE, ON DUPLICATE KEY UPDATE, CRC32/CONCAT_WS, ALTER TABLE)만 옮겨 실행한다.
+# 스키마는 storage.SQLITE_SCHEMA (FOOD 트리거가 USER_NT 하루 합계를 채운다) + migrations의 나머지 테이블.
+
+import re
+import sqlite3
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+import storage
+
+EXTRA_SCHEMA = """
+CREATE TABLE IF NOT EXISTS WRITE_BEHIND_APPLIED (NODE TEXT PRIMARY KEY, LAST_SEQ INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS SUMMARY_VERSION (ID TEXT PRIMARY KEY, VERSION INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS MONTHLY_SUMMARY (
+    ID TEXT NOT NULL,
+    YEAR INTEGER NOT NULL,
+    MONTH INTEGER NOT NULL,
+    PAYLOAD TEXT NOT NULL,
+    COMPUTED_AT TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (ID, YEAR, MONTH)
+);
+CREATE TABLE IF NOT EXISTS MONTHLY_ADVICE (
+    ID TEXT NOT NULL,
+    YEAR INTEGER NOT NULL,
+    MONTH INTEGER NOT NULL,
+    DATA_VERSION TEXT NOT NULL,
+    SUMMARY TEXT NOT NULL,
+    ADVICE TEXT NOT NULL,
+    CREATED_AT TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (ID, YEAR, MONTH)
+);
+CREATE TABLE IF NOT EXISTS FOOD_ARCHIVE_MONTHS (
+    YEAR INTEGER NOT NULL,
+    MONTH INTEGER NOT NULL,
+    PATH TEXT NOT NULL,
+    ROW_COUNT INTEGER NOT NULL,
+    ARCHIVED_AT TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (YEAR, MONTH)
+);
+"""
+
+_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def _param(value):
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _value(value):
+    # MySQL DATE 열처럼 date로 돌려준다
+    if isinstance(value, str) and _DATE.match(value):
+        return date.fromisoformat(value)
+    return value
+
+
+def _translate(sql):
+    sql = sql.replace("%s", "?").replace("FOR UPDATE", "")
+    sql = re.sub(r"ON DUPLICATE KEY UPDATE", "ON CONFLICT DO UPDATE SET", sql)
+    sql = re.sub(r"VALUES\((\w+)\)", r"excluded.\1", sql)
+    return sql
+
+
+class Cursor:
+    def __init__(self, connection):
+        self._connection = connection
+        self._cursor = connection.cursor()
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, sql, params=()):
+        stripped = sql.strip()
+        if stripped.startswith("ALTER TABLE"):
+            self._rows = []
+            return 0
+        if "information_schema" in stripped:
+            self._rows = [(0,)]  # 파티션 없는 FOOD
+            return 1
+        if stripped.startswith("START TRANSACTION"):
+            if not self._connection.in_transaction:
+                self._connection.execute("BEGIN")
+            self._rows = []
+            return 0
+        self._cursor.execute(_translate(sql), [_param(value) for value in params or ()])
+        self._rows = [tuple(_value(value) for value in row) for row in self._cursor.fetchall()]
+        return self._cursor.rowcount
+
+    def executemany(self, sql, seq):
+        self._cursor.executemany(_translate(sql), [[_param(value) for value in row] for row in seq])
+        self._rows = []
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+
+class Connection:
+    def __init__(self, path):
+        self._connection = sqlite3.connect(path, timeout=10)
+        self._connection.create_function("CRC32", 1, lambda text: zlib.crc32(str(text).encode()))
+        self._connection.create_function(
+            "CONCAT_WS", -1, lambda sep, *args: sep.join(str(arg) for arg in args if arg is not None)
+        )
+
+    def cursor(self, *args):
+        return Cursor(self._connection)
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def close(self):
+        self._connection.close()
+
+
+@pytest.fixture
+def mysql(tmp_path, monkeypatch):
+    # db.get_connection/connect와 그것을 직접 import한 모듈이 SQLite 파일을 쓰게 한다. connect()를 돌려준다
+    path = str(tmp_path / "mysql.sqlite3")
+    setup = sqlite3.connect(path)
+    setup.executescript(storage.SQLITE_SCHEMA + EXTRA_SCHEMA)
+    setup.close()
+
+    def connect(**kwargs):
+        return Connection(path)
+
+    import advice
+    import db
+    import food_import
+    import summaries
+    import write_behind
+
+    monkeypatch.setattr(db, "connect", connect)
+    monkeypatch.setattr(db, "get_connection", connect)
+    monkeypatch.setattr(db, "get_read_connection", lambda user_id=None: connect())
+    for module in (advice, food_import, write_behind):
+        monkeypatch.setattr(module, "get_connection", connect)
+    monkeypatch.setattr(summaries, "get_read_connection", lambda user_id=None: connect())
+    return connect
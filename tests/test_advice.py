@@ -0,0 +1,44 @@
+# tests/test_advice.py
+
+from datetime import date
+
+import advice
+import llm
+import storage
+
+
+def test_advice_calls_llm_without_holding_a_connection(mysql, monkeypatch):
+    opened = []
+
+    def connect(**kwargs):
+        connection = mysql()
+        opened.append(connection)
+        close = connection.close
+
+        def tracked_close():
+            opened.remove(connection)
+            close()
+
+        connection.close = tracked_close
+        return connection
+
+    monkeypatch.setattr(advice, "get_connection", connect)
+    calls = []
+
+    def advise(summary):
+        calls.append(len(opened))
+        return "채소를 더 드세요"
+
+    monkeypatch.setattr(llm, "advise", advise)
+    storage.MySQLStorage().add_foods(
+        "u1", date(2024, 3, 5), [{"food_name": "밥", "protein": 5, "fat": 1, "carbohydrate": 60, "calorie": 300}]
+    )
+
+    first = advice.get_advice("u1", 2024, 3)
+    assert first["advice"] == "채소를 더 드세요" and not first["cached"]
+    assert calls == [0]
+    assert opened == []
+
+    second = advice.get_advice("u1", 2024, 3)
+    assert second["cached"] and second["advice"] == "채소를 더 드세요"
+    assert calls == [0]
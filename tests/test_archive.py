@@ -0,0 +1,69 @@
+# tests/test_archive.py
+
+from datetime import date
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import archive
+import detail
+import storage
+
+
+def _item(name, calorie):
+    return {"food_name": name, "protein": 10, "fat": 5, "carbohydrate": 30, "calorie": calorie}
+
+
+def _totals(connect):
+    connection = connect()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT ID, DATE, CARBO, PROTEIN, FAT, KCAL FROM USER_NT ORDER BY ID, DATE")
+            return cursor.fetchall()
+    finally:
+        connection.close()
+
+
+@pytest.fixture
+def archived(mysql, tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    db = storage.MySQLStorage()
+    db.add_foods("u1", date(2023, 1, 5), [_item("밥", 300), _item("김치", 20)])
+    db.add_foods("u1", date(2023, 1, 9), [_item("라면", 500)])
+    db.add_foods("u2", date(2023, 1, 5), [_item("샐러드", 150)])
+    db.add_foods("u1", date(2023, 2, 1), [_item("피자", 700)])
+    before = _totals(mysql)
+    assert archive.archive_month(2023, 1) == 4
+    return db, before
+
+
+def test_archive_keeps_daily_totals(mysql, archived):
+    _, before = archived
+    assert _totals(mysql) == before
+
+
+def test_archive_moves_rows_out_of_food(mysql, archived):
+    connection = mysql()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT DATE, FOOD_NAME FROM FOOD ORDER BY DATE")
+            assert cursor.fetchall() == [(date(2023, 2, 1), "피자")]
+    finally:
+        connection.close()
+
+
+def test_day_view_reads_archived_rows(mysql, archived):
+    db, _ = archived
+    day = db.day("u1", "2023-01-05")
+    assert [(food["food_index"], food["food_name"]) for food in day["foods"]] == [(0, "밥"), (1, "김치")]
+    assert day["nutrition"]["kcal"] == 320
+
+    # 옮긴 뒤에 추가한 행은 파일의 행 다음 번호로 붙고 함께 보인다
+    db.add_foods("u1", date(2023, 1, 5), [_item("사과", 50)])
+    connection = mysql()
+    try:
+        day = detail.load_day(connection, "u1", "2023-01-05")
+    finally:
+        connection.close()
+    assert [food["food_name"] for food in day["foods"]] == ["밥", "김치", "사과"]
@@ -0,0 +1,32 @@
+# tests/test_food_import.py
+
+from datetime import date
+
+import food_import
+import storage
+
+
+def _record(name, calories):
+    return {"date": "2024-03-05", "food_name": name, "carbohydrates": 10, "protein": 5, "fat": 1, "calories": calories}
+
+
+def test_import_continues_food_index_per_chunk(mysql, monkeypatch):
+    # USER_NT 재계산은 MySQL의 UPDATE ... JOIN이라 여기서는 건너뛴다
+    monkeypatch.setattr(food_import, "rebuild_daily_totals", lambda *args: None)
+    db = storage.MySQLStorage()
+    db.add_foods(
+        "u1", date(2024, 3, 5), [{"food_name": "밥", "protein": 5, "fat": 1, "carbohydrate": 60, "calorie": 300}]
+    )
+
+    result = food_import.import_records(
+        "u1", [_record("김치", 20), _record("계란", 80), _record("사과", 50)], chunk_size=2
+    )
+    assert result["inserted"] == 3
+
+    day = db.day("u1", date(2024, 3, 5))
+    assert [(food["food_index"], food["food_name"]) for food in day["foods"]] == [
+        (0, "밥"),
+        (1, "김치"),
+        (2, "계란"),
+        (3, "사과"),
+    ]
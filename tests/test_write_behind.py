@@ -0,0 +1,37 @@
+# tests/test_write_behind.py
+
+import threading
+from datetime import date
+
+import storage
+import write_behind
+
+
+def _item(name, calorie):
+    return {"food_name": name, "protein": 1, "fat": 2, "carbohydrate": 3, "calorie": calorie}
+
+
+def test_flush_assigns_food_index_and_rows_can_be_deleted(mysql, tmp_path, monkeypatch):
+    monkeypatch.setattr(write_behind, "QUEUE_PATH", str(tmp_path / "queue.sqlite3"))
+    monkeypatch.setattr(write_behind, "_local", threading.local())
+    db = storage.MySQLStorage()
+    today = date.today()
+    db.add_foods("u1", today, [_item("밥", 300)])
+
+    write_behind.enqueue("u1", _item("김치", 20))
+    write_behind.enqueue("u1", _item("된장찌개", 150))
+    assert write_behind.flush() == 2
+
+    day = db.day("u1", today)
+    assert [(food["food_index"], food["food_name"]) for food in day["foods"]] == [
+        (0, "밥"),
+        (1, "김치"),
+        (2, "된장찌개"),
+    ]
+    assert day["nutrition"]["kcal"] == 470
+
+    assert db.delete_food("u1", today, 1) == 1
+    day = db.day("u1", today)
+    assert [food["food_name"] for food in day["foods"]] == ["밥", "된장찌개"]
+    assert day["nutrition"]["kcal"] == 450
+    assert write_behind.stats()["pending"] == 0
@@ -0,0 +1,474 @@
+# upload.py
+# 음식 사진 업로드 저장소: 내용 주소(SHA-256) 기반, 같은 사진은 한 번만 저장한다.
+#
+#   POST /api/uploads            multipart, images=<파일> 여러 개 -> [{sha256, size, mime, ...}]
+#   GET  /api/uploads/<sha256>   원본 (?variant=model 이면 모델용 축소본)
+#
+# - multipart 본문을 메모리에 모으지 않고 조각 단위로 임시 파일에 쓰면서 해시를 계산한다.
+# - Content-Length와 파일별 크기, 첫 바이트(매직 넘버)로 형식을 본문을 다 읽기 전에 확인한다.
+# - 저장 위치: UPLOAD_DIR/blobs/<앞 2자리>/<sha256>, 비전 모델용 축소본은 <sha256>.model.jpg
+# - 식사 기록(/api/food/photos uploads=...)에 쓰인 사진은 그 FOOD 행(ID, DATE, FOOD_INDEX)과의 연결로
+#   참조를 센다. 행을 지우거나 다른 음식으로 바꾸면(delete_food, update_food, /api/sync) 연결을 풀고,
+#   참조가 없는 사진은 UPLOAD_UNREFERENCED_TTL초 뒤에 sweeper가 지운다.
+#
+#   python upload.py sweep        # 한 번 정리 (cron 대신 앱에서는 start_sweeper())
+
+import argparse
+import fcntl
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+from flask import Blueprint, request, jsonify, send_file
+from PIL import Image, ImageOps, UnidentifiedImageError
+from werkzeug.formparser import parse_form_data
+
+bp = Blueprint("upload", __name__)
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+MAX_FILE_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+MAX_FILES = int(os.getenv("UPLOAD_MAX_FILES", "8"))
+MAX_PIXELS = 40_000_000  # 압축 폭탄 방지
+DERIVATIVE_SIDE = int(os.getenv("UPLOAD_DERIVATIVE_SIDE", "1024"))
+DERIVATIVE_QUALITY = 85
+UNREFERENCED_TTL = int(os.getenv("UPLOAD_UNREFERENCED_TTL", str(24 * 3600)))
+SWEEP_SECONDS = int(os.getenv("UPLOAD_SWEEP_SECONDS", "600"))
+TMP_TTL = 3600  # 이보다 오래된 임시 파일은 중단된 업로드
+
+# 첫 바이트 -> MIME. 이 형식만 받는다
+SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+SNIFF_BYTES = 12
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+
+_local = threading.local()
+_sweeper_started = False
+_sweeper_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _sniff(head):
+    for signature, mime in SIGNATURES:
+        if head.startswith(signature):
+            return mime
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def blob_path(digest):
+    return os.path.join(UPLOAD_DIR, "blobs", digest[:2], digest)
+
+
+def model_path(digest):
+    # jun.do(image_path)에 그대로 넘길 수 있는 축소본 경로
+    return blob_path(digest) + ".model.jpg"
+
+
+def _tmp_dir():
+    path = os.path.join(UPLOAD_DIR, "tmp")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class HashingFile:
+    # werkzeug multipart 파서가 파일 조각을 쓰는 대상: 임시 파일에 쓰면서 SHA-256과 크기를 센다
+    def __init__(self, declared_type=None):
+        if declared_type and not (
+            declared_type.startswith("image/") or declared_type == "application/octet-stream"
+        ):
+            raise UploadError(f"unsupported type {declared_type}", 415)
+        self.file = tempfile.NamedTemporaryFile(dir=_tmp_dir(), delete=False)
+        self.path = self.file.name
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.mime = None
+        self._head = b""
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > MAX_FILE_BYTES:
+            raise UploadError(f"file exceeds {MAX_FILE_BYTES} bytes", 413)
+        if self.mime is None:
+            self._head += data[:SNIFF_BYTES]
+            if len(self._head) >= SNIFF_BYTES:
+                self._check_type()
+        self.sha256.update(data)
+        return self.file.write(data)
+
+    def _check_type(self):
+        self.mime = _sniff(self._head)
+        if self.mime is None:
+            raise UploadError("not a JPEG, PNG, GIF or WebP image", 415)
+
+    def finish(self):
+        if self.mime is None:
+            self._check_type()
+        self.file.close()
+        return self.sha256.hexdigest()
+
+    # FileStorage가 쓰는 나머지 파일 메서드
+    def seek(self, *args):
+        return self.file.seek(*args)
+
+    def tell(self):
+        return self.file.tell()
+
+    def read(self, *args):
+        return self.file.read(*args)
+
+    def close(self):
+        self.file.close()
+
+    def discard(self):
+        self.file.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _index():
+    # 업로드 목록 (로컬 SQLite, 스레드마다 연결)
+    connection = getattr(_local, "connection", None)
+    if connection is None:
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        connection = sqlite3.connect(
+            os.path.join(UPLOAD_DIR, "index.sqlite3"), timeout=10, isolation_level=None
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha256 TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mime TEXT NOT NULL,
+                width INTEGER,
+                height INTEGER,
+                refs INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_seen_at REAL NOT NULL
+            )
+            """
+        )
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS food_refs (
+                user_id TEXT NOT NULL,
+                food_date TEXT NOT NULL,
+                food_index INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                PRIMARY KEY (user_id, food_date, food_index, sha256)
+            )
+            """
+        )
+        _local.connection = connection
+    return connection
+
+
+def _make_derivative(source):
+    # EXIF 회전을 적용하고 긴 변을 DERIVATIVE_SIDE로 줄인 JPEG 임시 파일. 이미지로 열리지 않으면 UploadError
+    try:
+        with Image.open(source) as image:
+            image = ImageOps.exif_transpose(image).convert("RGB")
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise UploadError(f"image could not be decoded: {e}", 415)
+    width, height = image.size
+    image.thumbnail((DERIVATIVE_SIDE, DERIVATIVE_SIDE))
+    with tempfile.NamedTemporaryFile(dir=_tmp_dir(), suffix=".jpg", delete=False) as f:
+        image.save(f, format="JPEG", quality=DERIVATIVE_QUALITY)
+    return f.name, width, height
+
+
+def commit(upload):
+    # 임시 파일을 내용 주소로 옮긴다. 이미 있으면 임시 파일만 지운다 (중복 제거).
+    # 파일 이동과 목록 갱신은 BEGIN IMMEDIATE 안에서 해 sweeper의 삭제와 엇갈리지 않는다
+    digest = upload.finish()
+    index = _index()
+    index.execute("BEGIN IMMEDIATE")
+    try:
+        row = index.execute(
+            "SELECT size, mime, width, height FROM blobs WHERE sha256 = ?", (digest,)
+        ).fetchone()
+        stored = row is not None and os.path.exists(blob_path(digest)) and os.path.exists(model_path(digest))
+        if stored:
+            index.execute("UPDATE blobs SET last_seen_at = ? WHERE sha256 = ?", (time.time(), digest))
+    except BaseException:
+        index.execute("ROLLBACK")
+        raise
+    index.execute("COMMIT")
+    if stored:
+        upload.discard()
+        size, mime, width, height = row
+        return {
+            "sha256": digest,
+            "size": size,
+            "mime": mime,
+            "width": width,
+            "height": height,
+            "deduplicated": True,
+        }
+
+    # 축소본 만들기는 느리므로 잠금 밖에서
+    try:
+        derivative, width, height = _make_derivative(upload.path)
+    except UploadError:
+        upload.discard()
+        raise
+
+    target = blob_path(digest)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    now = time.time()
+    index.execute("BEGIN IMMEDIATE")
+    try:
+        os.replace(upload.path, target)
+        os.replace(derivative, model_path(digest))
+        index.execute(
+            """
+            INSERT INTO blobs (sha256, size, mime, width, height, created_at, last_seen_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (sha256) DO UPDATE SET last_seen_at = excluded.last_seen_at
+            """,
+            (digest, upload.size, upload.mime, width, height, now, now),
+        )
+        index.execute("COMMIT")
+    except BaseException:
+        index.execute("ROLLBACK")
+        raise
+    return {
+        "sha256": digest,
+        "size": upload.size,
+        "mime": upload.mime,
+        "width": width,
+        "height": height,
+        "deduplicated": False,
+    }
+
+
+def exists(digest):
+    return bool(SHA256_RE.match(digest or "")) and os.path.exists(model_path(digest))
+
+
+def _food_key(user_id, food_date, food_index):
+    return str(user_id), str(food_date)[:10], int(food_index)
+
+
+def link_foods(links):
+    # [(sha256, ID, DATE, FOOD_INDEX)]: 식사 기록에 쓰인 사진은 연결이 남아 있는 동안 sweeper가 지우지 않는다
+    index = _index()
+    try:
+        index.execute("BEGIN IMMEDIATE")
+        try:
+            for digest, user_id, food_date, food_index in links:
+                cursor = index.execute(
+                    """
+                    INSERT OR IGNORE INTO food_refs (user_id, food_date, food_index, sha256)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    (*_food_key(user_id, food_date, food_index), digest),
+                )
+                if cursor.rowcount:
+                    index.execute("UPDATE blobs SET refs = refs + 1 WHERE sha256 = ?", (digest,))
+            index.execute("COMMIT")
+        except BaseException:
+            index.execute("ROLLBACK")
+            raise
+    except sqlite3.Error as e:
+        # FOOD에는 이미 추가됐다: 응답은 그대로 하고, 사진은 참조 없이 TTL 뒤에 지워질 수 있다
+        logging.error(f"Upload link failed for {links}: {e}")
+
+
+def release_food(user_id, food_date, food_index):
+    # FOOD 행을 지우거나 다른 음식으로 바꾼 뒤에 불린다. 연결이 풀린 사진은 TTL 뒤에 sweeper가 지운다
+    key = _food_key(user_id, food_date, food_index)
+    index = _index()
+    try:
+        index.execute("BEGIN IMMEDIATE")
+        try:
+            digests = [
+                digest
+                for (digest,) in index.execute(
+                    "SELECT sha256 FROM food_refs WHERE user_id = ? AND food_date = ? AND food_index = ?",
+                    key,
+                ).fetchall()
+            ]
+            index.execute(
+                "DELETE FROM food_refs WHERE user_id = ? AND food_date = ? AND food_index = ?", key
+            )
+            for digest in digests:
+                release(digest)
+            index.execute("COMMIT")
+        except BaseException:
+            index.execute("ROLLBACK")
+            raise
+    except sqlite3.Error as e:
+        # FOOD는 이미 바뀌었다: 응답은 그대로 하고 사진은 참조가 남은 채로 둔다
+        logging.error(f"Upload release failed for {key}: {e}")
+
+
+def release(digest):
+    _index().execute(
+        "UPDATE blobs SET refs = MAX(refs - 1, 0), last_seen_at = ? WHERE sha256 = ?",
+        (time.time(), digest),
+    )
+
+
+def receive(environ, content_length):
+    # multipart 본문을 스트리밍으로 받아 저장한다. [{sha256, ...}]
+    if content_length is None:
+        raise UploadError("Content-Length is required", 411)
+    # 본문 전체 크기로 먼저 거른다 (multipart 경계/헤더 여유 64KB)
+    if content_length > MAX_FILES * MAX_FILE_BYTES + 65536:
+        raise UploadError("request body too large", 413)
+
+    uploads = []
+
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        if len(uploads) >= MAX_FILES:
+            raise UploadError(f"at most {MAX_FILES} files", 400)
+        if content_length is not None and content_length > MAX_FILE_BYTES:
+            raise UploadError(f"file exceeds {MAX_FILE_BYTES} bytes", 413)
+        upload = HashingFile(content_type)
+        uploads.append(upload)
+        return upload
+
+    try:
+        _, _, files = parse_form_data(
+            environ, stream_factory=stream_factory, silent=False, max_form_parts=MAX_FILES + 16
+        )
+        if not files.getlist("images"):
+            raise UploadError("images are required", 400)
+        results = []
+        for upload in uploads:
+            results.append(commit(upload))
+        return results
+    finally:
+        for upload in uploads:
+            if os.path.exists(upload.path):
+                upload.discard()
+
+
+@bp.route("/api/uploads", methods=["POST"])
+def upload_images():
+    try:
+        results = receive(request.environ, request.content_length)
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status
+    except ValueError as e:  # 잘못된 multipart 본문
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"uploads": results}), 201
+
+
+@bp.route("/api/uploads/<digest>", methods=["GET"])
+def get_image(digest):
+    if not exists(digest):
+        return jsonify({"error": "not found"}), 404
+    if request.args.get("variant") == "model":
+        return send_file(model_path(digest), mimetype="image/jpeg", max_age=31536000)
+    row = _index().execute("SELECT mime FROM blobs WHERE sha256 = ?", (digest,)).fetchone()
+    mimetype = row[0] if row else "application/octet-stream"
+    # 내용 주소이므로 바뀌지 않는다
+    return send_file(blob_path(digest), mimetype=mimetype, max_age=31536000)
+
+
+def sweep(now=None):
+    # 참조되지 않고 UNREFERENCED_TTL이 지난 사진, 중단된 업로드의 임시 파일을 지운다
+    now = now or time.time()
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    removed = {"blobs": 0, "tmp": 0}
+    with open(os.path.join(UPLOAD_DIR, "sweep.lock"), "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return removed  # 다른 프로세스가 정리 중
+        index = _index()
+        cutoff = now - UNREFERENCED_TTL
+        expired = [
+            digest
+            for (digest,) in index.execute(
+                "SELECT sha256 FROM blobs WHERE refs = 0 AND last_seen_at < ?", (cutoff,)
+            ).fetchall()
+        ]
+        for digest in expired:
+            # 조건을 다시 확인하고 같은 트랜잭션에서 파일을 지운다: 그사이 다시 올라오거나 참조된 사진은 남긴다
+            index.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = index.execute(
+                    "DELETE FROM blobs WHERE sha256 = ? AND refs = 0 AND last_seen_at < ?",
+                    (digest, cutoff),
+                )
+                if cursor.rowcount:
+                    for path in (blob_path(digest), model_path(digest)):
+                        try:
+                            os.unlink(path)
+                        except FileNotFoundError:
+                            pass
+                    removed["blobs"] += 1
+                index.execute("COMMIT")
+            except BaseException:
+                index.execute("ROLLBACK")
+                raise
+
+        for entry in os.scandir(_tmp_dir()):
+            if entry.is_file() and entry.stat().st_mtime < now - TMP_TTL:
+                os.unlink(entry.path)
+                removed["tmp"] += 1
+    return removed
+
+
+def _sweep_loop():
+    while True:
+        time.sleep(SWEEP_SECONDS)
+        try:
+            removed = sweep()
+            if removed["blobs"] or removed["tmp"]:
+                logging.info(f"Upload sweep removed {removed}")
+        except (OSError, sqlite3.Error) as e:
+            logging.error(f"Upload sweep failed: {e}")
+
+
+def start_sweeper():
+    global _sweeper_started
+    with _sweeper_lock:
+        if not _sweeper_started:
+            threading.Thread(target=_sweep_loop, name="upload-sweeper", daemon=True).start()
+            _sweeper_started = True
+
+
+def stats():
+    count, size, referenced = _index().execute(
+        "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(refs > 0), 0) FROM blobs"
+    ).fetchone()
+    return {"blobs": count, "bytes": size, "referenced": referenced}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Image upload store jobs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("sweep", help="delete expired unreferenced uploads")
+    sub.add_parser("stats", help="stored uploads")
+    args = parser.parse_args()
+    if args.command == "sweep":
+        print(sweep())
+    else:
+        print(stats())
+
+
+if __name__ == "__main__":
+    main()
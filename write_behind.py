@@ -0,0 +1,340 @@
+# write_behind.py
+# /api/send2 쓰기 지연(WRITE_BEHIND=1): 확인된 음식을 로컬 SQLite 큐에 기록(fsync)하고 바로 응답한다.
+# 백그라운드 스레드가 WRITE_BEHIND_FLUSH_SECONDS마다, 또는 WRITE_BEHIND_BATCH개가 쌓이면
+# 여러 행 INSERT 한 번으로 MySQL에 옮긴다.
+#
+# - 옮긴 마지막 seq를 같은 MySQL 트랜잭션에서 WRITE_BEHIND_APPLIED에 적으므로,
+#   커밋 뒤 큐에서 지우기 전에 죽어도 다시 넣지 않는다.
+# - 옮길 때 (ID, DATE)마다 그날의 FOOD_INDEX 다음 번호부터 차례로 붙인다 (foods.next_food_index로 잠근다).
+# - 아직 옮기지 않은 행은 그 사용자의 달력 조회(detail, monthly)에 합쳐 보여준다.
+#   그 행은 FOOD_INDEX가 없어(food_index None, pending True) 옮겨지기 전에는 수정/삭제/사진 연결을 할 수 없다.
+#   옮기는 동안에는 generation이 홀수라, 읽는 쪽은 짝수이고 전후가 같을 때만 결과를 쓴다.
+# - 같은 큐 파일을 쓰는 워커 프로세스가 여럿이어도 옮기는 건 한 곳이다. 옮긴 (사용자, 날짜)를
+#   새 generation과 함께 flushed에 남기고, 다른 프로세스는 읽기 전에 자기가 마지막으로 본
+#   generation 이후의 것을 자기 캐시(detail, quick_add)에서 지운다.
+
+import fcntl
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import pymysql
+
+import detail
+import foods
+import quick_add
+import summaries
+from db import get_connection
+
+ENABLED = os.getenv("WRITE_BEHIND") == "1"
+QUEUE_PATH = os.getenv("WRITE_BEHIND_PATH", "write_behind.sqlite3")
+FLUSH_SECONDS = float(os.getenv("WRITE_BEHIND_FLUSH_SECONDS", "1.0"))
+BATCH_ROWS = int(os.getenv("WRITE_BEHIND_BATCH", "200"))
+NODE = os.getenv("WRITE_BEHIND_NODE") or f"{socket.gethostname()}:{os.path.abspath(QUEUE_PATH)}"
+READ_RETRIES = 5
+FLUSHED_KEEP = 10000  # flushed에 남겨 두는 generation 수. 이보다 뒤처진 프로세스는 캐시를 통째로 지운다
+
+_local = threading.local()
+_wakeup = threading.Event()
+_started = False
+_start_lock = threading.Lock()
+_seen_generation = None  # 이 프로세스가 캐시에 반영한 마지막 generation
+_seen_lock = threading.Lock()
+
+
+def _db():
+    # sqlite3 연결은 스레드마다 따로 연다
+    connection = getattr(_local, "connection", None)
+    if connection is None:
+        connection = sqlite3.connect(QUEUE_PATH, timeout=10, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=FULL")  # 응답 전에 디스크에 남긴다
+        connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS pending (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                food_date TEXT NOT NULL,
+                food_name TEXT,
+                protein TEXT,
+                fat TEXT,
+                carbohydrate TEXT,
+                calorie TEXT
+            );
+            CREATE INDEX IF NOT EXISTS pending_user_date ON pending (user_id, food_date);
+            CREATE TABLE IF NOT EXISTS flushed (
+                generation INTEGER NOT NULL,
+                user_id TEXT NOT NULL,
+                food_date TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS flushed_generation ON flushed (generation);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            INSERT OR IGNORE INTO meta VALUES ('generation', 0);
+            """
+        )
+        _local.connection = connection
+    return connection
+
+
+def _generation(connection):
+    return connection.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+
+def _set_generation(connection, odd):
+    connection.execute(
+        "UPDATE meta SET value = value + 1 WHERE key = 'generation' AND value % 2 != ?",
+        (1 if odd else 0,),
+    )
+
+
+def enqueue(user_id, nutrition_info):
+    now = datetime.now()
+    connection = _db()
+    cursor = connection.execute(
+        """
+        INSERT INTO pending (user_id, food_date, food_name, protein, fat, carbohydrate, calorie)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            str(user_id),
+            now.strftime("%Y-%m-%d %H:%M:%S"),
+            nutrition_info["food_name"],
+            str(nutrition_info["protein"]),
+            str(nutrition_info["fat"]),
+            str(nutrition_info["carbohydrate"]),
+            str(nutrition_info["calorie"]),
+        ),
+    )
+    if cursor.lastrowid % BATCH_ROWS == 0:
+        _wakeup.set()
+    return cursor.lastrowid
+
+
+def _pending(connection, user_id, start, end):
+    # FOOD 조회와 같은 형식: (DATE, FOOD_INDEX, FOOD_NAME, FOOD_PT, FOOD_FAT, FOOD_CH, FOOD_KCAL)
+    rows = connection.execute(
+        """
+        SELECT food_date, food_name, protein, fat, carbohydrate, calorie
+        FROM pending
+        WHERE user_id = ? AND food_date >= ? AND food_date < ?
+        ORDER BY seq
+        """,
+        (str(user_id), start.isoformat(), end.isoformat()),
+    ).fetchall()
+    return [
+        (datetime.strptime(food_date, "%Y-%m-%d %H:%M:%S"), None, name, pt, fat, ch, kcal)
+        for food_date, name, pt, fat, ch, kcal in rows
+    ]
+
+
+def _apply_flushed(connection, generation):
+    # 다른 프로세스가 옮긴 행의 캐시를 지운다 (읽기 트랜잭션 안에서, generation이 짝수일 때)
+    global _seen_generation
+    with _seen_lock:
+        if _seen_generation is None:
+            # 막 시작한 프로세스는 캐시가 비어 있다
+            _seen_generation = generation
+            return
+        if generation <= _seen_generation:
+            return
+        oldest = connection.execute("SELECT MIN(generation) FROM flushed").fetchone()[0]
+        if oldest is not None and oldest > _seen_generation + 2:
+            # 지운 기록까지 뒤처졌다
+            detail.day_cache.clear()
+            quick_add.quick_cache.clear()
+        else:
+            rows = connection.execute(
+                "SELECT DISTINCT user_id, food_date FROM flushed WHERE generation > ? AND generation <= ?",
+                (_seen_generation, generation),
+            ).fetchall()
+            for flushed_user, food_date in rows:
+                detail.invalidate(flushed_user, food_date)
+            for flushed_user in {row[0] for row in rows}:
+                quick_add.invalidate(flushed_user)
+        _seen_generation = generation
+
+
+def read_with_pending(user_id, start, end, read_db):
+    # read_db() 결과와 [start, end) 사이의 아직 옮기지 않은 행을 같은 시점 기준으로 돌려준다
+    connection = _db()
+    for _ in range(READ_RETRIES):
+        connection.execute("BEGIN")
+        try:
+            before = _generation(connection)
+            if before % 2 == 0:
+                _apply_flushed(connection, before)
+            pending = _pending(connection, user_id, start, end)
+        finally:
+            connection.execute("COMMIT")
+        if before % 2 == 0:
+            result = read_db()
+            if _generation(connection) == before:
+                return result, pending
+        time.sleep(0.005)
+    # 옮기는 중이 길어지면 그대로 돌려준다 (중복 또는 누락이 잠깐 보일 수 있다)
+    return read_db(), _pending(connection, user_id, start, end)
+
+
+def overlay_day(user_data, user_id, food_date, pending):
+    # detail.load_day 결과에 아직 옮기지 않은 음식을 더한다
+    if not pending:
+        return user_data
+    if user_data is None:
+        user_data = {
+            "id": user_id,
+            "date": food_date,
+            "nutrition": {
+                "carbo": 0, "protein": 0, "fat": 0, "kcal": 0,
+                "rd_carbo": None, "rd_protein": None, "rd_fat": None,
+            },
+            "foods": [],
+        }
+    nutrition = dict(user_data["nutrition"])
+    foods = list(user_data["foods"])
+    for _, _, name, pt, fat, ch, kcal in pending:
+        foods.append(
+            {
+                "food_index": None,  # 옮긴 뒤에 정해진다: 그 전에는 수정/삭제할 수 없다
+                "food_name": name,
+                "food_pt": pt,
+                "food_fat": fat,
+                "food_ch": ch,
+                "food_kcal": kcal,
+                "pending": True,
+            }
+        )
+        for key, value in (("carbo", ch), ("protein", pt), ("fat", fat), ("kcal", kcal)):
+            try:
+                nutrition[key] = float(nutrition[key] or 0) + float(value or 0)
+            except (TypeError, ValueError):
+                pass
+    return {**user_data, "nutrition": nutrition, "foods": foods}
+
+
+def day_bounds(food_date):
+    day = date.fromisoformat(str(food_date)[:10])
+    return day, day + timedelta(days=1)
+
+
+def flush():
+    # 다른 프로세스가 같은 큐를 옮기고 있으면 이번에는 건너뛴다
+    with open(QUEUE_PATH + ".lock", "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return 0
+        return _flush_locked()
+
+
+def _indexed(cursor, rows):
+    # 큐 순서대로 (ID, DATE)마다 연속된 FOOD_INDEX를 붙인 INSERT 값. 잠그는 순서를 정해 교착을 피한다
+    days = sorted({(row[1], row[2][:10]) for row in rows})
+    next_index = {day: foods.next_food_index(cursor, *day) for day in days}
+    values = []
+    for _, user_id, food_date, name, protein, fat, carbohydrate, calorie in rows:
+        day = (user_id, food_date[:10])
+        values.append((user_id, day[1], next_index[day], name, protein, fat, carbohydrate, calorie))
+        next_index[day] += 1
+    return values
+
+
+def _flush_locked():
+    connection = _db()
+    rows = connection.execute(
+        """
+        SELECT seq, user_id, food_date, food_name, protein, fat, carbohydrate, calorie
+        FROM pending ORDER BY seq LIMIT ?
+        """,
+        (BATCH_ROWS,),
+    ).fetchall()
+    if not rows:
+        _set_generation(connection, odd=False)  # 지난번에 옮기다 죽었으면 짝수로 되돌린다
+        return 0
+
+    _set_generation(connection, odd=True)
+    applied = None
+    inserted = []
+    try:
+        mysql = get_connection()
+        try:
+            with mysql.cursor() as cursor:
+                cursor.execute(
+                    "SELECT LAST_SEQ FROM WRITE_BEHIND_APPLIED WHERE NODE = %s FOR UPDATE",
+                    (NODE,),
+                )
+                row = cursor.fetchone()
+                last_seq = row[0] if row else 0
+                inserted = [row for row in rows if row[0] > last_seq]
+                if inserted:
+                    cursor.executemany(
+                        """
+                        INSERT INTO FOOD (ID, DATE, FOOD_INDEX, FOOD_NAME, FOOD_PT, FOOD_FAT, FOOD_CH, FOOD_KCAL)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                        """,
+                        _indexed(cursor, inserted),
+                    )
+                    for user_id, month in {(row[1], row[2][:7]) for row in inserted}:
+                        summaries.invalidate_month(cursor, user_id, month)
+                cursor.execute(
+                    """
+                    INSERT INTO WRITE_BEHIND_APPLIED (NODE, LAST_SEQ) VALUES (%s, %s)
+                    ON DUPLICATE KEY UPDATE LAST_SEQ = VALUES(LAST_SEQ)
+                    """,
+                    (NODE, rows[-1][0]),
+                )
+            mysql.commit()
+            applied = rows[-1][0]
+        finally:
+            mysql.close()
+        # generation이 홀수인 동안 캐시를 지워야 읽는 쪽이 옛 캐시와 빈 큐를 함께 보지 않는다
+        for user_id, food_date in {(row[1], row[2][:10]) for row in inserted}:
+            detail.invalidate(user_id, food_date)
+        for user_id in {row[1] for row in inserted}:
+            quick_add.invalidate(user_id)
+    finally:
+        connection.execute("BEGIN IMMEDIATE")
+        if applied is not None:
+            connection.execute("DELETE FROM pending WHERE seq <= ?", (applied,))
+            # 다른 프로세스의 캐시를 위해: 짝수로 올린 뒤의 generation에 옮긴 날짜를 남긴다
+            generation = _generation(connection) + 1
+            connection.executemany(
+                "INSERT INTO flushed (generation, user_id, food_date) VALUES (?, ?, ?)",
+                sorted({(generation, row[1], row[2][:10]) for row in inserted}),
+            )
+            connection.execute(
+                "DELETE FROM flushed WHERE generation <= ?", (generation - FLUSHED_KEEP,)
+            )
+        _set_generation(connection, odd=False)
+        connection.execute("COMMIT")
+    return len(inserted)
+
+
+def _flush_loop():
+    while True:
+        _wakeup.wait(FLUSH_SECONDS)
+        _wakeup.clear()
+        try:
+            while flush() >= BATCH_ROWS:
+                pass
+        except (pymysql.MySQLError, sqlite3.Error) as e:
+            logging.error(f"Write-behind flush failed: {e}")
+
+
+def start():
+    global _started
+    with _start_lock:
+        if not _started:
+            threading.Thread(target=_flush_loop, name="write-behind", daemon=True).start()
+            _started = True
+
+
+def stats():
+    connection = _db()
+    return {
+        "pending": connection.execute("SELECT COUNT(*) FROM pending").fetchone()[0],
+        "generation": _generation(connection),
+    }